@@ -18,8 +18,16 @@ async def detect_conflicts():
     return manager.detect_conflicts()
 
 @router.post("/workflows", response_model=MultiAgentWorkflow)
-async def create_workflow(name: str, tasks: List[TaskPacket]):
-    return manager.create_workflow(name, tasks)
+async def create_workflow(name: str, tasks: List[TaskPacket], run: bool = False):
+    workflow = manager.create_workflow(name, tasks)
+    if run:
+        # Hand the graph to the engine, which runs each level as soon as it is ready
+        from fog.core.engine import orchestration_engine
+        try:
+            await orchestration_engine.submit_graph(tasks)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    return workflow
 
 @router.post("/merge-outputs")
 async def merge_outputs(task_ids: List[str]):
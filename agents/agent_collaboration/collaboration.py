@@ -39,12 +39,11 @@ class CollaborationManager:
 
     def detect_conflicts(self) -> List[TaskConflict]:
         state = state_store.get_state()
-        tasks = state.get("tasks", {})
 
         # Simple resource detection: looking for overlapping project_path or file_path in payload
         resource_map = {} # resource -> list of task_ids
 
-        pending_tasks = [t for t in tasks.values() if t.get("status") == TaskStatus.PENDING]
+        pending_tasks = state_store.tasks_by_status(TaskStatus.PENDING)
 
         for task in pending_tasks:
             payload = task.get("payload", {})
@@ -6,6 +6,7 @@ from datetime import datetime
 from agents.deployment_automation.models import (
     DeploymentReport, DeploymentStatus, DeploymentAction, DeploymentManifest
 )
+from agents.deployment_automation.registry import deployment_registry
 from fog.core.state import state_store
 from fog.core.logging import logger
 
@@ -70,8 +71,7 @@ class DeploymentAutomation:
         return report
 
     async def rollback(self, deployment_id: str) -> DeploymentReport:
-        state = state_store.get_state()
-        report_data = state.get("deployments", {}).get(deployment_id)
+        report_data = deployment_registry.get(deployment_id)
         if not report_data:
             raise ValueError(f"Deployment {deployment_id} not found")
 
@@ -107,9 +107,7 @@ class DeploymentAutomation:
         return action
 
     def _save_report(self, report: DeploymentReport):
-        state = state_store.get_state()
-        state["deployments"][report.deployment_id] = report.model_dump(mode='json')
-        state_store._save()
+        deployment_registry.record(report.model_dump(mode='json'))
 
     def generate_manifest(self, service_name: str, image_tag: str) -> DeploymentManifest:
         # Heuristic to generate a default manifest
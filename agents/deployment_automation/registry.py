@@ -0,0 +1,58 @@
+from typing import Any, Dict, List, Optional
+from fog.core.listing import FieldIndex
+from fog.core.state import state_store
+
+class DeploymentRegistry:
+    """
+    Indexes state["deployments"] by status and project path, so filtered
+    deployment listings read only the matching reports rather than every
+    deployment ever run.
+    """
+    def __init__(self, store: Any = state_store):
+        self.store = store
+        self._indexed: Optional[Dict[str, Any]] = None
+        self._indexed_count = 0
+        self._fields = FieldIndex()
+
+    def _deployments(self) -> Dict[str, Any]:
+        return self.store.get_state().setdefault("deployments", {})
+
+    def _sync(self) -> Dict[str, Any]:
+        deployments = self._deployments()
+        if deployments is self._indexed and len(deployments) == self._indexed_count:
+            return deployments
+        # Deployments were loaded or replaced wholesale
+        self._indexed = deployments
+        self._fields.clear()
+        for deployment_id, report_data in deployments.items():
+            self._index(deployment_id, report_data)
+        self._indexed_count = len(deployments)
+        return deployments
+
+    def _index(self, deployment_id: str, report_data: Dict[str, Any]):
+        self._fields.add(deployment_id, report_data.get("status"), report_data.get("project_path"))
+
+    def record(self, report_data: Dict[str, Any]):
+        """
+        Stores a new or updated deployment report and persists the state.
+        """
+        with self.store.lock:
+            deployments = self._sync()
+            deployments[report_data["deployment_id"]] = report_data
+            self._index(report_data["deployment_id"], report_data)
+            self._indexed_count = len(deployments)
+            self.store._save()
+
+    def get(self, deployment_id: str) -> Optional[Dict[str, Any]]:
+        return self._deployments().get(deployment_id)
+
+    def query(self, status: Optional[str] = None, project_path: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Returns the reports matching the given status and project path.
+        """
+        with self.store.lock:
+            deployments = self._sync()
+            return [deployments[deployment_id] for deployment_id in self._fields.ids(status, project_path)]
+
+# Global deployment registry
+deployment_registry = DeploymentRegistry()
@@ -20,25 +20,14 @@ class EvolutionCoordinator:
         Assesses agent health and performance from system state and logs.
         Returns a map of agent_name -> metrics.
         """
-        state = state_store.get_state()
-        tasks = state.get("tasks", {})
-
         agent_metrics = {}
-        for tid, task in tasks.items():
-            agent = task.get("system_name")
-            if not agent: continue
-
-            if agent not in agent_metrics:
-                agent_metrics[agent] = {"total": 0, "completed": 0, "failed": 0, "retries": 0}
-
-            agent_metrics[agent]["total"] += 1
-            status = task.get("status")
-            if status == "completed":
-                agent_metrics[agent]["completed"] += 1
-            elif status == "failed":
-                agent_metrics[agent]["failed"] += 1
-
-            agent_metrics[agent]["retries"] += task.get("retries", 0)
+        for agent, aggregate in state_store.task_aggregates().items():
+            agent_metrics[agent] = {
+                "total": aggregate["total"],
+                "completed": aggregate["statuses"].get("completed", 0),
+                "failed": aggregate["statuses"].get("failed", 0),
+                "retries": aggregate["retries"]
+            }
 
         for agent, metrics in agent_metrics.items():
             total = metrics["total"]
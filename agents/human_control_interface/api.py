@@ -2,6 +2,7 @@ from fastapi import APIRouter, HTTPException
 from typing import List, Dict, Any, Optional
 from agents.human_control_interface.control import HumanControlInterface
 from agents.human_control_interface.models import ApprovalRequest, ApprovalStatus
+from fog.core.admission import AdmissionRejected
 
 router = APIRouter(prefix="/human-control", tags=["human-control"])
 control = HumanControlInterface()
@@ -69,5 +70,7 @@ async def dispatch_task(task: Dict[str, Any]):
         task_packet = TaskPacket(**task)
         await orchestration_engine.submit_task(task_packet)
         return {"status": "success", "task_id": task_packet.task_id}
+    except AdmissionRejected as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": e.retry_after_header})
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -1,6 +1,7 @@
 from typing import Dict, List, Any, Optional
 from datetime import datetime
 from agents.human_control_interface.models import ApprovalRequest, ApprovalStatus, OrchestrationControl, AgentToggle
+from agents.human_control_interface.registry import approval_registry
 from fog.core.state import state_store
 from fog.core.logging import logger
 from fog.models.task import TaskPacket, TaskStatus
@@ -10,14 +11,18 @@ class HumanControlInterface:
         self._ensure_state_keys()
 
     def _ensure_state_keys(self):
+        # Constructed for every processed task, so only persist when a key was missing
         state = state_store.get_state()
-        if "approvals" not in state:
-            state["approvals"] = {}
-        if "controls" not in state:
-            state["controls"] = {"is_paused": False, "emergency_stop": False}
-        if "agent_toggles" not in state:
-            state["agent_toggles"] = {}
-        state_store._save()
+        defaults = {
+            "approvals": {},
+            "controls": {"is_paused": False, "emergency_stop": False},
+            "agent_toggles": {}
+        }
+        missing = [key for key in defaults if key not in state]
+        for key in missing:
+            state[key] = defaults[key]
+        if missing:
+            state_store._save()
 
     def request_approval(self, task: TaskPacket, requester: str) -> ApprovalRequest:
         request = ApprovalRequest(
@@ -25,48 +30,43 @@ class HumanControlInterface:
             requester=requester,
             details=task.model_dump(mode='json')
         )
-        state = state_store.get_state()
-        state["approvals"][request.request_id] = request.model_dump(mode='json')
-        state_store._save()
+        approval_registry.record(request.model_dump(mode='json'))
         logger.info("APPROVAL_REQUESTED", {"request_id": request.request_id, "task_id": task.task_id})
         return request
 
     def get_pending_approvals(self) -> List[ApprovalRequest]:
-        state = state_store.get_state()
-        approvals = state.get("approvals", {})
-        return [ApprovalRequest(**a) for a in approvals.values() if a["status"] == ApprovalStatus.PENDING]
+        return [ApprovalRequest(**a) for a in approval_registry.pending()]
+
+    def get_task_approval_status(self, task_id: str) -> Optional[ApprovalStatus]:
+        return approval_registry.status_for_task(task_id)
 
     def approve_request(self, request_id: str, approver: str, reason: Optional[str] = None):
-        state = state_store.get_state()
-        if request_id not in state["approvals"]:
+        request_data = approval_registry.get(request_id)
+        if request_data is None:
             raise ValueError(f"Approval request {request_id} not found")
 
-        request_data = state["approvals"][request_id]
         request = ApprovalRequest(**request_data)
         request.status = ApprovalStatus.APPROVED
         request.approver = approver
         request.approval_timestamp = datetime.now()
         request.reason = reason
 
-        state["approvals"][request_id] = request.model_dump(mode='json')
-        state_store._save()
+        approval_registry.record(request.model_dump(mode='json'))
         logger.info("APPROVAL_GRANTED", {"request_id": request_id, "approver": approver})
         return request
 
     def reject_request(self, request_id: str, approver: str, reason: Optional[str] = None):
-        state = state_store.get_state()
-        if request_id not in state["approvals"]:
+        request_data = approval_registry.get(request_id)
+        if request_data is None:
             raise ValueError(f"Approval request {request_id} not found")
 
-        request_data = state["approvals"][request_id]
         request = ApprovalRequest(**request_data)
         request.status = ApprovalStatus.REJECTED
         request.approver = approver
         request.approval_timestamp = datetime.now()
         request.reason = reason
 
-        state["approvals"][request_id] = request.model_dump(mode='json')
-        state_store._save()
+        approval_registry.record(request.model_dump(mode='json'))
         logger.info("APPROVAL_REJECTED", {"request_id": request_id, "approver": approver})
         return request
 
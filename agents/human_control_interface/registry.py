@@ -0,0 +1,89 @@
+from typing import Any, Callable, Dict, List, Optional
+from agents.human_control_interface.models import ApprovalStatus
+from fog.core.listing import FieldIndex
+from fog.core.state import state_store
+
+class ApprovalRegistry:
+    """
+    Indexes state["approvals"] by task_id and by status and agent, so the
+    engine's approval check is O(1) and filtered approval listings read only
+    the matching requests rather than every approval ever made.
+    """
+    def __init__(self, store: Any = state_store):
+        self.store = store
+        self._indexed: Optional[Dict[str, Any]] = None
+        self._indexed_count = 0
+        self._by_task: Dict[str, str] = {}
+        self._fields = FieldIndex()
+        # Called with the request data whenever a request is approved or rejected
+        self._listeners: List[Callable[[Dict[str, Any]], None]] = []
+
+    def subscribe(self, listener: Callable[[Dict[str, Any]], None]):
+        self._listeners.append(listener)
+
+    def unsubscribe(self, listener: Callable[[Dict[str, Any]], None]):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def _approvals(self) -> Dict[str, Any]:
+        return self.store.get_state().setdefault("approvals", {})
+
+    def _sync(self) -> Dict[str, Any]:
+        approvals = self._approvals()
+        if approvals is self._indexed and len(approvals) == self._indexed_count:
+            return approvals
+        # Approvals were loaded or replaced wholesale
+        self._indexed = approvals
+        self._by_task = {}
+        self._fields.clear()
+        for request_id, request_data in approvals.items():
+            self._index(request_id, request_data)
+        self._indexed_count = len(approvals)
+        return approvals
+
+    def _index(self, request_id: str, request_data: Dict[str, Any]):
+        # The first request for a task wins, as the engine only ever asks once
+        self._by_task.setdefault(request_data["task_id"], request_id)
+        agent = request_data.get("details", {}).get("system_name")
+        self._fields.add(request_id, request_data["status"], agent)
+
+    def record(self, request_data: Dict[str, Any]):
+        """
+        Stores a new or updated approval request and persists the state.
+        """
+        with self.store.lock:
+            approvals = self._sync()
+            approvals[request_data["request_id"]] = request_data
+            self._index(request_data["request_id"], request_data)
+            self._indexed_count = len(approvals)
+            self.store._save()
+        if request_data["status"] != ApprovalStatus.PENDING:
+            for listener in list(self._listeners):
+                listener(request_data)
+
+    def get(self, request_id: str) -> Optional[Dict[str, Any]]:
+        return self._approvals().get(request_id)
+
+    def for_task(self, task_id: str) -> Optional[Dict[str, Any]]:
+        with self.store.lock:
+            approvals = self._sync()
+            request_id = self._by_task.get(task_id)
+            return None if request_id is None else approvals[request_id]
+
+    def status_for_task(self, task_id: str) -> Optional[ApprovalStatus]:
+        request_data = self.for_task(task_id)
+        return None if request_data is None else ApprovalStatus(request_data["status"])
+
+    def pending(self) -> List[Dict[str, Any]]:
+        return self.query(status=ApprovalStatus.PENDING)
+
+    def query(self, status: Optional[str] = None, agent: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Returns the requests matching the given status and requesting agent.
+        """
+        with self.store.lock:
+            approvals = self._sync()
+            return [approvals[request_id] for request_id in self._fields.ids(status, agent)]
+
+# Global approval registry
+approval_registry = ApprovalRegistry()
@@ -9,6 +9,7 @@ from agents.meta_agent_trainer.models import (
 )
 from fog.core.state import state_store
 from fog.core.logging import logger
+from fog.core.filelock import file_lock, write_json_atomic
 from agents.sandbox_simulation.simulator import SandboxSimulator, SimulationConfig
 
 class MetaAgentTrainerEngine:
@@ -29,9 +30,14 @@ class MetaAgentTrainerEngine:
             self.history = MATEHistory()
 
     def _save_history(self):
-        os.makedirs(os.path.dirname(self.history_path), exist_ok=True)
-        with open(self.history_path, "w") as f:
-            json.dump(self.history.model_dump(mode='json'), f, indent=4)
+        write_json_atomic(self.history_path, self.history.model_dump(mode='json'))
+
+    def _append_history(self, field: str, entry: Any):
+        # Reload under the file lock so entries from other worker processes are kept
+        with file_lock(self.history_path):
+            self._load_history()
+            getattr(self.history, field).append(entry)
+            self._save_history()
 
     def generate_agent_from_blueprint(self, blueprint: AgentBlueprint) -> str:
         """
@@ -105,8 +111,7 @@ if __name__ == "__main__":
             success=sim_report.verdict in ["Safe", "Risky"]
         )
 
-        self.history.training_history.append(report)
-        self._save_history()
+        self._append_history("training_history", report)
 
         return report
 
@@ -159,8 +164,7 @@ if __name__ == "__main__":
             deployed_successfully=True
         )
 
-        self.history.audit_history.append(audit)
-        self._save_history()
+        self._append_history("audit_history", audit)
 
         logger.info("TRAINER_EVOLVED", {"action": action})
         return {"status": "success", "evolved": True, "action": action}
@@ -1,14 +1,25 @@
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 from agents.meta_agent_trainer.engine import MetaAgentTrainerEngine
 from agents.meta_agent_trainer.models import AgentBlueprint
 
+_engine: Optional[MetaAgentTrainerEngine] = None
+
+def warm() -> MetaAgentTrainerEngine:
+    """
+    Builds the engine shared by all tasks, loading its history once.
+    """
+    global _engine
+    if _engine is None:
+        _engine = MetaAgentTrainerEngine()
+    return _engine
+
 async def handle_task(task_packet: Dict[str, Any]) -> Dict[str, Any]:
     """
     Orchestration handler for Meta-Agent Trainer Engine (MATE).
     """
     payload = task_packet.get("payload", {})
     action = payload.get("action")
-    engine = MetaAgentTrainerEngine()
+    engine = warm()
 
     try:
         if action == "generate":
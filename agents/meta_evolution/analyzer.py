@@ -21,29 +21,18 @@ class MetaEvolutionAnalyzer:
     def take_snapshot(self) -> EcosystemSnapshot:
         state = state_store.get_state()
         agents = state.get("agents", {})
-        tasks = state.get("tasks", {})
 
-        agent_distribution = {}
-        completed = 0
-        failed = 0
-
-        for task in tasks.values():
-            agent = task.get("system_name")
-            if agent:
-                agent_distribution[agent] = agent_distribution.get(agent, 0) + 1
-
-            status = task.get("status")
-            if status == "completed":
-                completed += 1
-            elif status == "failed":
-                failed += 1
+        totals = state_store.task_totals()
+        agent_distribution = {agent: aggregate["total"] for agent, aggregate in state_store.task_aggregates().items()}
+        completed = totals["statuses"].get("completed", 0)
+        failed = totals["statuses"].get("failed", 0)
 
         total_finished = completed + failed
         success_rate = completed / total_finished if total_finished > 0 else 1.0
 
         snapshot = EcosystemSnapshot(
             num_agents=len(agents),
-            num_tasks=len(tasks),
+            num_tasks=totals["total"],
             agent_distribution=agent_distribution,
             total_success_rate=success_rate
         )
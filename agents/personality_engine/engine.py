@@ -3,6 +3,7 @@ import json
 from typing import Dict, Optional, List
 from datetime import datetime, timezone
 from agents.personality_engine.models import StyleFingerprint, InteractionAnalysis, AdaptationParams
+from fog.core.filelock import file_lock, write_json_atomic
 
 class FingerprintManager:
     def __init__(self, storage_path: str = "storage/personality/profiles.json"):
@@ -21,8 +22,8 @@ class FingerprintManager:
             return {}
 
     def save_profiles(self):
-        with open(self.storage_path, "w") as f:
-            json.dump({uid: prof.model_dump(mode='json') for uid, prof in self.profiles.items()}, f, indent=2)
+        write_json_atomic(self.storage_path, {uid: prof.model_dump(mode='json') for uid, prof in self.profiles.items()},
+                          indent=2)
 
     def get_profile(self, user_id: str) -> StyleFingerprint:
         if user_id not in self.profiles:
@@ -30,6 +31,12 @@ class FingerprintManager:
         return self.profiles[user_id]
 
     def update_profile(self, user_id: str, analysis: InteractionAnalysis):
+        # Other worker processes may have updated profiles since we loaded them
+        with file_lock(self.storage_path):
+            self.profiles = self._load_profiles()
+            self._update_profile(user_id, analysis)
+
+    def _update_profile(self, user_id: str, analysis: InteractionAnalysis):
         profile = self.get_profile(user_id)
 
         # Incremental update (moving average)
@@ -1,6 +1,17 @@
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 from agents.sandbox_simulation.simulator import SandboxSimulator, SimulationConfig
 
+_simulator: Optional[SandboxSimulator] = None
+
+def warm() -> SandboxSimulator:
+    """
+    Builds the simulator shared by all tasks.
+    """
+    global _simulator
+    if _simulator is None:
+        _simulator = SandboxSimulator()
+    return _simulator
+
 async def handle_task(task_packet: Dict[str, Any]) -> Dict[str, Any]:
     """
     Orchestration handler for FOG.
@@ -10,8 +21,7 @@ async def handle_task(task_packet: Dict[str, Any]) -> Dict[str, Any]:
 
     try:
         config = SimulationConfig(**payload)
-        simulator = SandboxSimulator()
-        report = simulator.simulate(config)
+        report = warm().simulate(config)
 
         return {
             "status": "success",
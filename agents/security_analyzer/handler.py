@@ -68,3 +68,37 @@ async def handle_task(task_packet: Dict[str, Any]) -> Dict[str, Any]:
             return {"status": "error", "message": "Missing project_path or file_path in payload"}
     except Exception as e:
         return {"status": "error", "message": str(e)}
+
+async def handle_batch(task_packets: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Batch handler for FOG: file_path packets are scanned together by one
+    analyzer in one thread, other packets go through handle_task.
+    Results are returned in packet order.
+    """
+    analyzer = SecurityAnalyzer()
+
+    def scan_files(file_paths: List[str]) -> List[Dict[str, Any]]:
+        scans = []
+        for file_path in file_paths:
+            try:
+                report = analyzer.scan_file(file_path)
+                scans.append({"status": "success", "result": report.model_dump(mode='json')})
+            except Exception as e:
+                scans.append({"status": "error", "message": str(e)})
+        return scans
+
+    results: List[Dict[str, Any]] = [None] * len(task_packets)
+    file_indexes, others = [], []
+    for index, task_packet in enumerate(task_packets):
+        payload = task_packet.get("payload", {})
+        if payload.get("file_path") and not payload.get("project_path"):
+            file_indexes.append(index)
+        else:
+            others.append(index)
+
+    file_paths = [task_packets[index]["payload"]["file_path"] for index in file_indexes]
+    for index, result in zip(file_indexes, await asyncio.to_thread(scan_files, file_paths)):
+        results[index] = result
+    for index in others:
+        results[index] = await handle_task(task_packets[index])
+    return results
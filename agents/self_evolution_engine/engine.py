@@ -6,11 +6,16 @@ from datetime import datetime, timezone
 from agents.self_evolution_engine.models import (
     EvolutionProposal, EvolutionReport, AuditReport, EvolutionHistory
 )
+from fog.core.aggregates import LATENCY_BUCKETS
 from fog.core.state import state_store
 from fog.core.logging import logger
+from fog.core.filelock import file_lock, write_json_atomic
 from fog.core.mapper import DependencyMapper
 from agents.sandbox_simulation.simulator import SandboxSimulator, SimulationConfig
 
+# Runs finishing within this many seconds (a LATENCY_BUCKETS bound) count as on time
+LATENCY_TARGET = 10.0
+
 class SelfEvolutionEngine:
     def __init__(self, history_path: str = "storage/self_evolution_history.json"):
         self.history_path = history_path
@@ -30,34 +35,43 @@ class SelfEvolutionEngine:
             self.history = EvolutionHistory()
 
     def _save_history(self):
-        os.makedirs(os.path.dirname(self.history_path), exist_ok=True)
-        with open(self.history_path, "w") as f:
-            json.dump(self.history.model_dump(mode='json'), f, indent=4)
+        write_json_atomic(self.history_path, self.history.model_dump(mode='json'))
+
+    def _append_history(self, field: str, entry: Any):
+        # Reload under the file lock so entries from other worker processes are kept
+        with file_lock(self.history_path):
+            self._load_history()
+            getattr(self.history, field).append(entry)
+            self._save_history()
 
     def analyze_health(self) -> Dict[str, Any]:
         """
         Analyzes agent performance metrics from the state store.
         """
         state = state_store.get_state()
-        tasks = state.get("tasks", {})
         agents = state.get("agents", {})
 
+        aggregates = state_store.task_aggregates()
         metrics = {}
         for agent_name in agents:
-            agent_tasks = [t for t in tasks.values() if t.get("system_name") == agent_name]
-            total = len(agent_tasks)
-            completed = len([t for t in agent_tasks if t.get("status") == "completed"])
-            failed = len([t for t in agent_tasks if t.get("status") == "failed"])
+            aggregate = aggregates.get(agent_name)
+            total = aggregate["total"] if aggregate else 0
+            completed = aggregate["statuses"].get("completed", 0) if aggregate else 0
 
             success_rate = completed / total if total > 0 else 1.0
 
-            # Mock latency and throughput for now as they aren't explicitly in task packet
-            # In a real system, we'd calculate them from task timestamps
+            # Share of observed runs finishing within LATENCY_TARGET seconds
+            latency_score = 0.8
+            if aggregate and aggregate["latency_count"]:
+                within_target = sum(aggregate["latency_buckets"][:LATENCY_BUCKETS.index(LATENCY_TARGET) + 1])
+                latency_score = within_target / aggregate["latency_count"]
+
+            # Mock throughput for now as it isn't tracked per agent
             metrics[agent_name] = {
                 "total_tasks": total,
                 "success_rate": success_rate,
                 "failure_rate": 1.0 - success_rate,
-                "latency_score": 0.8, # Mock
+                "latency_score": latency_score,
                 "throughput_score": 0.9 # Mock
             }
 
@@ -236,8 +250,7 @@ class SelfEvolutionEngine:
                 risk_score=best_proposal.risk_score,
                 applied_successfully=True
             )
-            self.history.history.append(audit)
-            self._save_history()
+            self._append_history("history", audit)
 
             logger.info("EVOLUTION_APPLIED", {"proposal_id": best_proposal.proposal_id})
         else:
@@ -7,6 +7,11 @@ class AgentHealth(BaseModel):
     status: str # "Healthy", "Unhealthy", "Unknown"
     uptime_seconds: float
     last_heartbeat: Optional[datetime] = None
+    # Adaptive concurrency of the agent's connector
+    concurrency_limit: Optional[int] = None
+    in_flight: Optional[int] = None
+    rtt_seconds: Optional[float] = None
+    min_rtt_seconds: Optional[float] = None
 
 class TaskMetrics(BaseModel):
     total_tasks: int
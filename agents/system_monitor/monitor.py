@@ -15,13 +15,13 @@ class SystemMonitor:
         agents_health = self._analyze_agents(state.get("agents", {}))
 
         # 2. Analyze Tasks
-        task_metrics = self._analyze_tasks(state.get("tasks", {}))
+        task_metrics = self._analyze_tasks()
 
         # 3. Resource Usage
         resources = self._get_resource_usage()
 
         # 4. Detect Patterns
-        patterns = self._detect_failure_patterns(state.get("tasks", {}))
+        patterns = self._detect_failure_patterns()
 
         # 5. Determine overall status
         system_status = "Nominal"
@@ -46,27 +46,33 @@ class SystemMonitor:
         )
 
     def _analyze_agents(self, agents_data: Dict[str, Any]) -> List[AgentHealth]:
+        from fog.core.connector import agent_registry
         health_list = []
         for name, config in agents_data.items():
             # In a real system, we'd check last heartbeat or ping the endpoint
             # Here we just assume they are healthy if registered
+            connector = agent_registry.get_agent(name)
+            limiter = connector.limiter.snapshot() if connector is not None else {}
             health_list.append(AgentHealth(
                 name=name,
                 status="Healthy",
-                uptime_seconds=3600.0 # Mock uptime
+                uptime_seconds=3600.0, # Mock uptime
+                concurrency_limit=limiter.get("limit"),
+                in_flight=limiter.get("in_flight"),
+                rtt_seconds=limiter.get("rtt"),
+                min_rtt_seconds=limiter.get("min_rtt")
             ))
         return health_list
 
-    def _analyze_tasks(self, tasks_data: Dict[str, Any]) -> TaskMetrics:
-        total = len(tasks_data)
+    def _analyze_tasks(self) -> TaskMetrics:
+        totals = self.state_store.task_totals()
+        total = totals["total"]
         if total == 0:
             return TaskMetrics(total_tasks=0, completed_tasks=0, failed_tasks=0, success_rate=1.0, average_retries=0.0)
 
-        completed = len([t for t in tasks_data.values() if t.get("status") == "completed"])
-        failed = len([t for t in tasks_data.values() if t.get("status") == "failed"])
-
-        retries = [t.get("retries", 0) for t in tasks_data.values()]
-        avg_retries = sum(retries) / total if total > 0 else 0
+        completed = totals["statuses"].get("completed", 0)
+        failed = totals["statuses"].get("failed", 0)
+        avg_retries = totals["retries"] / total
 
         success_rate = completed / (completed + failed) if (completed + failed) > 0 else 1.0
 
@@ -78,23 +84,13 @@ class SystemMonitor:
             average_retries=avg_retries
         )
 
-    def _detect_failure_patterns(self, tasks_data: Dict[str, Any]) -> List[FailurePattern]:
+    def _detect_failure_patterns(self) -> List[FailurePattern]:
         patterns = []
 
         # Check for agents with high failure rates
-        agent_failures = {}
-        agent_successes = {}
-
-        for task in tasks_data.values():
-            agent = task.get("system_name")
-            status = task.get("status")
-            if status == "failed":
-                agent_failures[agent] = agent_failures.get(agent, 0) + 1
-            elif status == "completed":
-                agent_successes[agent] = agent_successes.get(agent, 0) + 1
-
-        for agent, failures in agent_failures.items():
-            successes = agent_successes.get(agent, 0)
+        for agent, aggregate in self.state_store.task_aggregates().items():
+            failures = aggregate["statuses"].get("failed", 0)
+            successes = aggregate["statuses"].get("completed", 0)
             if failures > 3 and failures > successes:
                 patterns.append(FailurePattern(
                     pattern_type="Agent Instability",
@@ -22,14 +22,13 @@ class ResilienceManager:
 
     async def detect_and_fix(self) -> ResilienceReport:
         state = state_store.get_state()
-        tasks = state.get("tasks", {})
 
         failing_patterns = []
         actions = []
         recovered_count = 0
 
         # 1. Detect Failing Tasks and Try Recovery
-        failed_tasks = [t for t in tasks.values() if t.get("status") == TaskStatus.FAILED]
+        failed_tasks = state_store.tasks_by_status(TaskStatus.FAILED)
 
         for task_dict in failed_tasks:
             task_id = task_dict.get("task_id")
@@ -44,7 +43,7 @@ class ResilienceManager:
                     reason=f"Attempting recovery for task {task_id} due to transient error: {error}"
                 )
 
-                success = await self._recover_task(task_dict)
+                success = await self._recover_task(task_dict, error)
                 if success:
                     action.status = "Completed"
                     recovered_count += 1
@@ -56,10 +55,9 @@ class ResilienceManager:
 
         # 2. Detect Agent Instability
         agent_failures = {}
-        for task in tasks.values():
-            if task.get("status") == TaskStatus.FAILED:
-                agent = task.get("system_name")
-                agent_failures[agent] = agent_failures.get(agent, 0) + 1
+        for task in failed_tasks:
+            agent = task.get("system_name")
+            agent_failures[agent] = agent_failures.get(agent, 0) + 1
 
         for agent, count in agent_failures.items():
             if count > 5:
@@ -102,14 +100,14 @@ class ResilienceManager:
 
         return report
 
-    async def _recover_task(self, task_dict: Dict[str, Any]) -> bool:
+    async def _recover_task(self, task_dict: Dict[str, Any], error: str) -> bool:
         from fog.core.engine import orchestration_engine
         try:
             task = TaskPacket(**task_dict)
-            task.status = TaskStatus.PENDING
-            task.retries = 0
-            await orchestration_engine.submit_task(task)
-            logger.info("TASK_RECOVERY_INITIATED", {"task_id": task.task_id})
+            # One more attempt after the engine's backoff, subject to the agent's retry budget
+            if not orchestration_engine.recover_task(task, error):
+                return False
+            logger.info("TASK_RECOVERY_INITIATED", {"task_id": task.task_id, "next_retry_at": str(task.next_retry_at)})
             return True
         except Exception as e:
             logger.error("TASK_RECOVERY_FAILED", {"task_id": task_dict.get("task_id"), "error": str(e)})
@@ -16,10 +16,11 @@ from agents.meta_agent_trainer.api import router as mate_router
 from agents.shooting_star_intelligence.api import router as intel_router
 from agents.system_monitor.api import router as monitor_router
 from fog.core.engine import orchestration_engine
+from fog.core.admission import AdmissionRejected
 import asyncio
 from contextlib import asynccontextmanager
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse
 import os
 
 @asynccontextmanager
@@ -34,13 +35,15 @@ async def lifespan(app: FastAPI):
         if config.get("handler_type") == "mock":
             connector = MockAgentConnector(name, config["endpoint"])
         elif config.get("handler_type") == "local":
-            connector = LocalAgentConnector(name, config["endpoint"])
+            connector = LocalAgentConnector(name, config["endpoint"], config.get("execution_mode"))
         else:
             connector = HttpAgentConnector(name, config["endpoint"])
         agent_registry.register_agent(connector)
+        orchestration_engine.configure_agent({"name": name, **config})
         print(f"Re-registered agent: {name}")
 
-    # 2. Auto-discover local agents
+    # 2. Auto-discover local agents, persisted in one step
+    discovered = {}
     if os.path.exists("agents"):
         for agent_dir in os.listdir("agents"):
             if os.path.isdir(os.path.join("agents", agent_dir)) and os.path.exists(os.path.join("agents", agent_dir, "handler.py")):
@@ -49,15 +52,38 @@ async def lifespan(app: FastAPI):
                 if name not in agent_registry.agents:
                     connector = LocalAgentConnector(name, f"local://{agent_dir}")
                     agent_registry.register_agent(connector)
-                    state_store.add_agent(name, {"name": name, "endpoint": f"local://{agent_dir}", "handler_type": "local"})
+                    discovered[name] = {"name": name, "endpoint": f"local://{agent_dir}", "handler_type": "local"}
                     print(f"Auto-discovered and registered agent: {name}")
+    if discovered:
+        state_store.add_agents(discovered)
+
+    # Start handler processes and build handlers' shared objects before the first task needs them
+    from fog.core.handler_pool import handler_pool
+    from fog.core.handlers import handler_registry
+    if any(getattr(agent, "execution_mode", None) == "process" for agent in agent_registry.agents.values()):
+        asyncio.create_task(handler_pool.warm())
+    if os.environ.get("FOG_WARM_HANDLERS", "1") != "0":
+        # Process-mode handlers build their objects in the pool workers instead
+        asyncio.create_task(handler_registry.warm([
+            name for name, agent in agent_registry.agents.items()
+            if isinstance(agent, LocalAgentConnector) and agent.execution_mode != "process"
+        ]))
 
     await orchestration_engine.start()
     yield
     await orchestration_engine.stop()
+    state_store.close()
+    orchestration_engine.queue.close()
+    handler_pool.shutdown()
 
 app = FastAPI(title="Frontier Orchestration Gateway (FOG)", lifespan=lifespan)
 
+@app.exception_handler(AdmissionRejected)
+async def admission_rejected(request, exc: AdmissionRejected):
+    # Submissions from any router that hit the admission limits
+    return JSONResponse(status_code=429, content={"detail": {"reason": exc.reason, "message": str(exc)}},
+                        headers={"Retry-After": exc.retry_after_header})
+
 app.include_router(router)
 app.include_router(human_control_router)
 app.include_router(meta_evolution_router)
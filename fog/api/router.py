@@ -1,28 +1,82 @@
-from fastapi import APIRouter, HTTPException, BackgroundTasks
-from fog.models.task import TaskPacket, AgentConfig, ProjectInput
-from fog.core.connector import agent_registry, HttpAgentConnector, MockAgentConnector
+from fastapi import APIRouter, HTTPException, BackgroundTasks, Query, Request
+from pydantic import ValidationError
+from fog.models.task import TaskPacket, TaskStatus, AgentConfig, ProjectInput
+from fog.core.connector import agent_registry, HttpAgentConnector, LocalAgentConnector, MockAgentConnector
 from fog.core.engine import orchestration_engine
+from fog.core.admission import AdmissionRejected
+from fog.core.completion import completion_registry
+from fog.core.handlers import handler_registry
+from fog.core.handler_pool import handler_pool
 from fog.core.state import state_store
 from fog.core.backup import backup_manager
 from fog.core.mapper import DependencyMapper
 from fog.core.orchestrator import chat_orchestrator
-from typing import Dict, Any, List
+from fog.core.listing import paginate, project
+from agents.human_control_interface.registry import approval_registry
+from agents.deployment_automation.registry import deployment_registry
+from typing import Dict, Any, List, Optional
+from datetime import datetime
 import asyncio
+import math
 
 router = APIRouter()
 mapper = DependencyMapper()
 
+MAX_PAGE_SIZE = 500
+
+def _fields(fields: Optional[str]) -> Optional[List[str]]:
+    return [f.strip() for f in fields.split(",") if f.strip()] if fields else None
+
+def _client_id(request: Request) -> Optional[str]:
+    # Rate limits apply per X-Client-Id, or per remote address without one
+    return request.headers.get("X-Client-Id") or (request.client.host if request.client else None)
+
+def _too_many(rejection: AdmissionRejected) -> HTTPException:
+    return HTTPException(status_code=429, detail={"reason": rejection.reason, "message": str(rejection)},
+                         headers={"Retry-After": rejection.retry_after_header})
+
+def _page(items: List[Dict[str, Any]], next_cursor: Optional[str], fields: Optional[str]) -> Dict[str, Any]:
+    selected = _fields(fields)
+    return {"items": [project(item, selected) for item in items], "next_cursor": next_cursor}
+
 @router.post("/register-agent")
 async def register_agent(config: AgentConfig):
     if config.handler_type == "mock":
         connector = MockAgentConnector(config.name, config.endpoint)
+    elif config.handler_type == "local":
+        try:
+            connector = LocalAgentConnector(config.name, config.endpoint, config.execution_mode)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
     else:
         connector = HttpAgentConnector(config.name, config.endpoint)
 
+    try:
+        orchestration_engine.configure_agent(config.model_dump(mode='json'))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     agent_registry.register_agent(connector)
     state_store.add_agent(config.name, config.model_dump(mode='json'))
     return {"status": "success", "agent_name": config.name}
 
+@router.post("/reload-handlers")
+async def reload_handlers(agent: Optional[str] = None):
+    connector = agent_registry.get_agent(agent) if agent else None
+    if agent and not isinstance(connector, LocalAgentConnector):
+        raise HTTPException(status_code=404, detail="Local agent not found")
+    reloaded = []
+    if connector is None or connector.execution_mode != "process":
+        try:
+            reloaded = handler_registry.reload(agent)
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    if connector is None or connector.execution_mode == "process":
+        # Fresh worker processes import the current handler code
+        handler_pool.shutdown(wait=False)
+        if agent:
+            reloaded.append(agent)
+    return {"status": "success", "reloaded": reloaded}
+
 @router.post("/submit-project")
 async def submit_project(project: ProjectInput):
     # This might initiate a full project scan or backup
@@ -30,18 +84,65 @@ async def submit_project(project: ProjectInput):
     return {"status": "success", "backup_id": backup_id}
 
 @router.post("/submit-task")
-async def submit_task(task: TaskPacket):
-    await orchestration_engine.submit_task(task)
+async def submit_task(task: TaskPacket, request: Request):
+    try:
+        await orchestration_engine.submit_task(task, client=_client_id(request))
+    except AdmissionRejected as e:
+        raise _too_many(e)
     return {"status": "success", "task_id": task.task_id}
 
+@router.post("/submit-tasks")
+async def submit_tasks(packets: List[Dict[str, Any]], request: Request):
+    # Validate every packet up front; invalid ones are reported, not fatal
+    tasks, results = [], [None] * len(packets)
+    positions = []
+    for index, packet in enumerate(packets):
+        try:
+            tasks.append(TaskPacket.model_validate(packet))
+            positions.append(index)
+        except ValidationError as e:
+            results[index] = {"task_id": packet.get("task_id") if isinstance(packet, dict) else None,
+                              "status": "invalid", "error": str(e)}
+    try:
+        accepted = await orchestration_engine.submit_tasks(tasks, client=_client_id(request)) if tasks else []
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    for index, result in zip(positions, accepted):
+        results[index] = result
+    throttled = [result for result in accepted if result["status"] == "throttled"]
+    if throttled and len(throttled) == len(accepted):
+        # Nothing was admitted: tell the client when to try again
+        raise HTTPException(status_code=429, detail={"reason": "throttled", "results": results},
+                            headers={"Retry-After": str(max(1, math.ceil(max(r["retry_after"] for r in throttled))))})
+    return {
+        "status": "success",
+        "accepted": sum(1 for result in results if result["status"] in ("queued", "held")),
+        "results": results
+    }
+
+@router.post("/submit-graph")
+async def submit_graph(tasks: List[TaskPacket], request: Request):
+    try:
+        task_ids = await orchestration_engine.submit_graph(tasks, client=_client_id(request))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except AdmissionRejected as e:
+        raise _too_many(e)
+    return {"status": "success", "task_ids": task_ids}
+
 @router.post("/task-update/{task_id}")
 async def update_task_status(task_id: str, update: Dict[str, Any]):
     task_data = state_store.get_task(task_id)
     if not task_data:
         raise HTTPException(status_code=404, detail="Task not found")
+    if orchestration_engine.absorb_late_update(task_id):
+        # The losing attempt of a hedged task, reporting after the winner
+        return {"status": "ignored"}
 
     task_data.update(update)
     state_store.update_task(task_id, task_data)
+    # Wake the engine if this is the agent's completion callback
+    completion_registry.resolve(task_id, task_data)
     return {"status": "success"}
 
 @router.get("/task-status/{task_id}")
@@ -51,6 +152,13 @@ async def get_task_status(task_id: str):
         raise HTTPException(status_code=404, detail="Task not found")
     return task
 
+@router.get("/archive/tasks")
+async def query_archived_tasks(start: Optional[datetime] = None, end: Optional[datetime] = None,
+                               agent: Optional[str] = None, status: Optional[str] = None, limit: int = 100):
+    if state_store.archive is None:
+        raise HTTPException(status_code=404, detail="Task archive is not enabled")
+    return await asyncio.to_thread(state_store.archive.query, start, end, agent, status, limit)
+
 @router.post("/rollback/{backup_id}")
 async def rollback(backup_id: str):
     try:
@@ -67,9 +175,63 @@ async def get_dependency_map(project_path: str):
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+@router.get("/tasks")
+async def list_tasks(status: Optional[str] = None, agent: Optional[str] = None,
+                     start: Optional[datetime] = None, end: Optional[datetime] = None,
+                     cursor: Optional[str] = None, limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+                     fields: Optional[str] = None):
+    try:
+        items, next_cursor = state_store.list_tasks(status, agent, start, end, cursor, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return _page(items, next_cursor, fields)
+
+@router.get("/approvals")
+async def list_approvals(status: Optional[str] = None, agent: Optional[str] = None,
+                         start: Optional[datetime] = None, end: Optional[datetime] = None,
+                         cursor: Optional[str] = None, limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+                         fields: Optional[str] = None):
+    approvals = approval_registry.query(status, agent)
+    try:
+        items, next_cursor = paginate(((a["request_id"], a) for a in approvals), cursor, limit, start, end)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return _page(items, next_cursor, fields)
+
+@router.get("/deployments")
+async def list_deployments(status: Optional[str] = None, project_path: Optional[str] = None,
+                           start: Optional[datetime] = None, end: Optional[datetime] = None,
+                           cursor: Optional[str] = None, limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+                           fields: Optional[str] = None):
+    deployments = deployment_registry.query(status, project_path)
+    try:
+        items, next_cursor = paginate(((d["deployment_id"], d) for d in deployments), cursor, limit, start, end)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return _page(items, next_cursor, fields)
+
+@router.get("/agents")
+async def list_agents():
+    return state_store.get_agents()
+
 @router.get("/system-state")
-async def get_system_state():
-    return state_store.get_state()
+async def get_system_state(summary: bool = False):
+    state = state_store.get_state()
+    if not summary:
+        return state
+    # Counts and controls only, so polling cost does not grow with history
+    return {
+        "controls": state.get("controls", {"is_paused": False, "emergency_stop": False}),
+        "counts": {key: len(value) for key, value in state.items() if isinstance(value, (dict, list))},
+        "task_statuses": {status.value: state_store.count_tasks(status=status) for status in TaskStatus},
+        "pending_approvals": len(approval_registry.pending()),
+        "queue_depths": orchestration_engine.queue.depths(),
+        "agent_queues": orchestration_engine.queue.agent_stats(),
+        "workers": orchestration_engine.worker_stats(),
+        "result_cache": orchestration_engine.result_cache.stats(),
+        "admission": orchestration_engine.admission.stats(),
+        "hedging": orchestration_engine.hedge_stats()
+    }
 
 @router.post("/chat")
 async def chat(message: Dict[str, str]):
@@ -83,5 +245,7 @@ async def chat(message: Dict[str, str]):
     try:
         response = await chat_orchestrator.process(prompt, user_id=user_id, session_id=session_id)
         return response
+    except AdmissionRejected as e:
+        raise _too_many(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
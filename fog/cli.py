@@ -13,6 +13,7 @@ def main():
         print("  self-evolve [args]              - Autonomous system evolution engine")
         print("  mate [args]                     - Meta-Agent Trainer Engine (MATE)")
         print("  shooting-star-intel [args]      - Shooting Star Intelligence Layer")
+        print("  convert-state [json] [snapshot] - Convert JSON state to the binary snapshot format")
         sys.exit(1)
 
     command = sys.argv[1]
@@ -73,6 +74,12 @@ def main():
             subprocess.run(cmd, check=True)
         except subprocess.CalledProcessError as e:
             sys.exit(e.returncode)
+    elif command == "convert-state":
+        from fog.core.snapshot import convert_json_snapshot
+        json_path = args[0] if len(args) > 0 else "storage/state.json"
+        snapshot_path = args[1] if len(args) > 1 else "storage/state.snap"
+        count = convert_json_snapshot(json_path, snapshot_path)
+        print(f"Converted {json_path} to {snapshot_path} ({count} tasks)")
     else:
         print(f"Unknown command: {command}")
         sys.exit(1)
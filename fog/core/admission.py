@@ -0,0 +1,153 @@
+import math
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+from fog.models.task import TaskPacket
+
+class AdmissionRejected(Exception):
+    """
+    A task refused at submission. retry_after is the number of seconds the
+    client should wait before trying again.
+    """
+    def __init__(self, reason: str, message: str, retry_after: float):
+        super().__init__(message)
+        self.reason = reason
+        self.retry_after = retry_after
+
+    @property
+    def retry_after_header(self) -> str:
+        # Retry-After takes whole seconds
+        return str(max(1, math.ceil(self.retry_after)))
+
+class TokenBucket:
+    """
+    Refills at rate tokens per second up to burst tokens.
+    """
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self) -> float:
+        """
+        Takes one token. Returns 0 on success, otherwise the seconds until one is available.
+        """
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def refund(self):
+        self._refill()
+        self.tokens = min(self.burst, self.tokens + 1)
+
+class AdmissionController:
+    """
+    Decides whether a submitted task may enter the queue. Limits are a cap
+    on all queued tasks (max_queued), a cap per agent (max_queued_per_agent)
+    and a token bucket per client (client_rate tasks per second, bursts of
+    client_burst). Past shed_at of a queue cap, tasks below shed_priority are
+    shed so urgent work keeps its room. Limits left at None are not applied.
+    """
+    def __init__(self, max_queued: Optional[int] = None, max_queued_per_agent: Optional[int] = None,
+                 client_rate: Optional[float] = None, client_burst: Optional[float] = None,
+                 shed_at: float = 0.8, shed_priority: int = 1, retry_after: float = 1.0,
+                 max_clients: int = 10000):
+        self.max_queued = max_queued
+        self.max_queued_per_agent = max_queued_per_agent
+        self.client_rate = client_rate
+        self.client_burst = client_burst if client_burst is not None else max(1.0, client_rate or 1.0)
+        self.shed_at = shed_at
+        self.shed_priority = shed_priority
+        # Suggested wait when a queue is full, in seconds
+        self.retry_after = retry_after
+        self.max_clients = max_clients
+        # client -> bucket, least recently seen first
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self.admitted = 0
+        self.rejected: Dict[str, int] = {}
+
+    def _load(self, queued: int, agent_queued: int) -> float:
+        load = 0.0
+        if self.max_queued:
+            load = max(load, queued / self.max_queued)
+        if self.max_queued_per_agent:
+            load = max(load, agent_queued / self.max_queued_per_agent)
+        return load
+
+    def _bucket(self, client: str) -> TokenBucket:
+        bucket = self._buckets.get(client)
+        if bucket is None:
+            bucket = self._buckets[client] = TokenBucket(self.client_rate, self.client_burst)
+            while len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        self._buckets.move_to_end(client)
+        return bucket
+
+    def _reject(self, reason: str, message: str, retry_after: float) -> AdmissionRejected:
+        self.rejected[reason] = self.rejected.get(reason, 0) + 1
+        return AdmissionRejected(reason, message, retry_after)
+
+    def check(self, task: TaskPacket, queued: int, agent_queued: int,
+              client: Optional[str] = None) -> Optional[AdmissionRejected]:
+        """
+        Returns the rejection for a task given the current queue depths, or
+        None if it is admitted (which spends one of the client's tokens).
+        """
+        if self.max_queued is not None and queued >= self.max_queued:
+            return self._reject("queue_full", f"Task queue is full ({self.max_queued} tasks)", self.retry_after)
+        if self.max_queued_per_agent is not None and agent_queued >= self.max_queued_per_agent:
+            return self._reject("agent_queue_full",
+                                f"Queue for agent {task.system_name} is full ({self.max_queued_per_agent} tasks)",
+                                self.retry_after)
+        if task.priority < self.shed_priority and self._load(queued, agent_queued) >= self.shed_at:
+            return self._reject("shed", f"Gateway is overloaded; only tasks with priority >= "
+                                        f"{self.shed_priority} are accepted", self.retry_after)
+        if self.client_rate and client is not None:
+            wait = self._bucket(client).take()
+            if wait:
+                return self._reject("rate_limited", f"Client {client} exceeded {self.client_rate} tasks per second",
+                                    wait)
+        self.admitted += 1
+        return None
+
+    def refund(self, client: Optional[str]):
+        """
+        Returns the token of an admitted task that was not queued after all.
+        """
+        self.admitted -= 1
+        if self.client_rate and client is not None and client in self._buckets:
+            self._buckets[client].refund()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"max_queued": self.max_queued, "max_queued_per_agent": self.max_queued_per_agent,
+                "client_rate": self.client_rate, "admitted": self.admitted, "rejected": dict(self.rejected)}
+
+def create_admission_controller() -> AdmissionController:
+    """
+    Limits from FOG_ADMISSION_MAX_QUEUED, FOG_ADMISSION_MAX_QUEUED_PER_AGENT,
+    FOG_ADMISSION_CLIENT_RATE (tasks per second) and FOG_ADMISSION_CLIENT_BURST
+    (0 or unset disables a limit), with shedding below
+    FOG_ADMISSION_SHED_PRIORITY once a queue is FOG_ADMISSION_SHED_AT full.
+    """
+    def limit(name: str, cast=int):
+        value = cast(os.environ.get(name, "0"))
+        return value if value > 0 else None
+
+    return AdmissionController(
+        max_queued=limit("FOG_ADMISSION_MAX_QUEUED"),
+        max_queued_per_agent=limit("FOG_ADMISSION_MAX_QUEUED_PER_AGENT"),
+        client_rate=limit("FOG_ADMISSION_CLIENT_RATE", float),
+        client_burst=limit("FOG_ADMISSION_CLIENT_BURST", float),
+        shed_at=float(os.environ.get("FOG_ADMISSION_SHED_AT", "0.8")),
+        shed_priority=int(os.environ.get("FOG_ADMISSION_SHED_PRIORITY", "1")),
+        retry_after=float(os.environ.get("FOG_ADMISSION_RETRY_AFTER", "1"))
+    )
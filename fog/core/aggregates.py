@@ -0,0 +1,142 @@
+import time
+from bisect import bisect_left
+from typing import Any, Dict, List, Optional, Tuple
+
+# Upper bounds (seconds) of the latency histogram buckets; one overflow bucket follows
+LATENCY_BUCKETS = (0.1, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+TERMINAL_STATUSES = ("completed", "failed")
+
+GroupKey = Tuple[Optional[str], Optional[str]]
+
+def _empty_group() -> Dict[str, Any]:
+    return {
+        "total": 0,
+        "statuses": {},
+        "retries": 0,
+        "latency_count": 0,
+        "latency_sum": 0.0,
+        "latency_buckets": [0] * (len(LATENCY_BUCKETS) + 1)
+    }
+
+def _merge_group(into: Dict[str, Any], other: Dict[str, Any]):
+    into["total"] += other["total"]
+    for status, count in other["statuses"].items():
+        into["statuses"][status] = into["statuses"].get(status, 0) + count
+    into["retries"] += other["retries"]
+    into["latency_count"] += other["latency_count"]
+    into["latency_sum"] += other["latency_sum"]
+    into["latency_buckets"] = [a + b for a, b in zip(into["latency_buckets"], other["latency_buckets"])]
+
+def _value(value: Any) -> Any:
+    return getattr(value, "value", value)
+
+class TaskAggregates:
+    """
+    Running task counters keyed by (agent, task_type): tasks per current
+    status, retry sums, and latency sums/histograms measured from observed
+    RUNNING -> COMPLETED/FAILED transitions. Each observation is O(1), so
+    readers never have to walk the task history.
+    """
+    def __init__(self):
+        self._groups: Dict[GroupKey, Dict[str, Any]] = {}
+        # task_id -> (group key, status, retries, monotonic time RUNNING was observed)
+        self._tasks: Dict[str, Tuple[GroupKey, Optional[str], int, Optional[float]]] = {}
+
+    def _group(self, key: GroupKey) -> Dict[str, Any]:
+        group = self._groups.get(key)
+        if group is None:
+            group = self._groups[key] = _empty_group()
+        return group
+
+    def observe(self, task_id: str, task_data: Dict[str, Any], now: Optional[float] = None):
+        key = (task_data.get("system_name"), _value(task_data.get("task_type")))
+        status = _value(task_data.get("status"))
+        retries = task_data.get("retries", 0) or 0
+        now = time.monotonic() if now is None else now
+
+        previous = self._tasks.get(task_id)
+        if previous is None:
+            old_status, old_retries, started = None, 0, None
+            group = self._group(key)
+            group["total"] += 1
+        else:
+            old_key, old_status, old_retries, started = previous
+            group = self._group(key)
+            if old_key != key:
+                old_group = self._group(old_key)
+                old_group["total"] -= 1
+                old_group["retries"] -= old_retries
+                if old_status is not None:
+                    old_group["statuses"][old_status] -= 1
+                old_status, old_retries = None, 0
+                group["total"] += 1
+            elif old_status is not None:
+                group["statuses"][old_status] -= 1
+
+        group["statuses"][status] = group["statuses"].get(status, 0) + 1
+        group["retries"] += retries - old_retries
+
+        if status == "running" and old_status != "running":
+            started = now
+        elif status in TERMINAL_STATUSES and old_status not in TERMINAL_STATUSES and started is not None:
+            latency = now - started
+            group["latency_count"] += 1
+            group["latency_sum"] += latency
+            group["latency_buckets"][bisect_left(LATENCY_BUCKETS, latency)] += 1
+            started = None
+
+        self._tasks[task_id] = (key, status, retries, started)
+
+    def retract(self, task_data: Dict[str, Any]):
+        """
+        Takes an untracked task (e.g. one leaving the archive) back out of its
+        group's total, status and retry counts. Latency it added is kept.
+        """
+        group = self._group((task_data.get("system_name"), _value(task_data.get("task_type"))))
+        status = _value(task_data.get("status"))
+        group["total"] -= 1
+        group["statuses"][status] = group["statuses"].get(status, 0) - 1
+        group["retries"] -= task_data.get("retries", 0) or 0
+
+    def forget(self, task_id: str):
+        """
+        Stops tracking a task (e.g. once archived); its counts are kept.
+        """
+        self._tasks.pop(task_id, None)
+
+    def to_dict(self) -> List[Dict[str, Any]]:
+        return [{"agent": agent, "task_type": task_type, **group}
+                for (agent, task_type), group in self._groups.items()]
+
+    @classmethod
+    def from_dict(cls, groups: List[Dict[str, Any]]) -> "TaskAggregates":
+        aggregates = cls()
+        for entry in groups:
+            group = _empty_group()
+            _merge_group(group, entry)
+            aggregates._groups[(entry.get("agent"), entry.get("task_type"))] = group
+        return aggregates
+
+    def by_agent(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Per-agent totals with a per-task-type breakdown under "by_task_type".
+        """
+        agents: Dict[str, Dict[str, Any]] = {}
+        for (agent, task_type), group in self._groups.items():
+            if agent is None:
+                continue
+            summary = agents.get(agent)
+            if summary is None:
+                summary = agents[agent] = {**_empty_group(), "by_task_type": {}}
+            _merge_group(summary, group)
+            type_summary = _empty_group()
+            _merge_group(type_summary, group)
+            summary["by_task_type"][task_type] = type_summary
+        return agents
+
+    def totals(self) -> Dict[str, Any]:
+        totals = _empty_group()
+        for group in self._groups.values():
+            _merge_group(totals, group)
+        return totals
@@ -0,0 +1,293 @@
+import copy
+import gzip
+import json
+import os
+import sqlite3
+import zlib
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime
+from threading import RLock
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+from fog.core.aggregates import TaskAggregates
+from fog.core.filelock import file_lock, write_json_atomic
+from fog.core.logging import logger
+
+PARTITION_PREFIX = "tasks-"
+PARTITION_SUFFIX = ".jsonl.gz"
+INDEX_FILE = "index.db"
+# Replaced by INDEX_FILE; imported once on first open
+LEGACY_INDEX_FILE = "index.jsonl"
+AGGREGATES_FILE = "aggregates.json"
+
+def naive_local(value: datetime) -> datetime:
+    # Compare everything as naive local time, like TaskPacket.timestamp
+    return value.astimezone().replace(tzinfo=None) if value.tzinfo else value
+
+def task_time(task_data: Dict[str, Any]) -> Optional[datetime]:
+    value = task_data.get("timestamp")
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value)
+        except ValueError:
+            return None
+    if not isinstance(value, datetime):
+        return None
+    return naive_local(value)
+
+class TaskArchive:
+    """
+    Cold tier for finished tasks. Tasks are appended to gzip-compressed
+    JSON-lines segments partitioned by the day they were submitted, with a
+    task_id -> partition index in SQLite so single tasks can be faulted back
+    in without holding every archived id in memory; only the last cache_size
+    faulted-in tasks are cached. Counters for everything archived are kept
+    in aggregates.json so the state store can report totals without reading
+    the partitions.
+    """
+    def __init__(self, directory: str = "storage/archive", cache_size: int = 256):
+        self.directory = directory
+        self.cache_size = cache_size
+        self._lock = RLock()
+        self._lock_depth = 0
+        self._cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._aggregates = TaskAggregates()
+        self._open_index()
+        self._load_aggregates()
+
+    def _partition_path(self, partition: str) -> str:
+        return os.path.join(self.directory, f"{PARTITION_PREFIX}{partition}{PARTITION_SUFFIX}")
+
+    @contextmanager
+    def exclusive(self):
+        """
+        Serializes archive writers across threads and worker processes.
+        Re-entrant within a process; on entry the aggregates are caught up
+        with what other processes archived. The index is shared through SQLite.
+        """
+        with self._lock:
+            if self._lock_depth:
+                self._lock_depth += 1
+                try:
+                    yield
+                finally:
+                    self._lock_depth -= 1
+                return
+            with file_lock(os.path.join(self.directory, INDEX_FILE)):
+                self._lock_depth = 1
+                try:
+                    self._load_aggregates()
+                    yield
+                finally:
+                    self._lock_depth = 0
+
+    def _open_index(self):
+        os.makedirs(self.directory, exist_ok=True)
+        index_path = os.path.join(self.directory, INDEX_FILE)
+        self._conn = sqlite3.connect(index_path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS tasks (task_id TEXT PRIMARY KEY, partition TEXT NOT NULL)")
+        legacy_path = os.path.join(self.directory, LEGACY_INDEX_FILE)
+        if os.path.exists(legacy_path):
+            with file_lock(index_path):
+                if os.path.exists(legacy_path):
+                    self._import_legacy_index(legacy_path)
+
+    def _import_legacy_index(self, legacy_path: str):
+        entries = []
+        with open(legacy_path, "r") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                entries.append((entry["id"], entry["p"]))
+        self._conn.execute("BEGIN IMMEDIATE")
+        self._conn.executemany("INSERT OR REPLACE INTO tasks (task_id, partition) VALUES (?, ?)", entries)
+        self._conn.execute("COMMIT")
+        os.remove(legacy_path)
+        logger.info("ARCHIVE_INDEX_MIGRATED", {"tasks": len(entries)})
+
+    def _partition_of(self, task_id: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT partition FROM tasks WHERE task_id = ?", (task_id,)).fetchone()
+        return row[0] if row else None
+
+    def _load_aggregates(self):
+        path = os.path.join(self.directory, AGGREGATES_FILE)
+        if not os.path.exists(path):
+            return
+        try:
+            with open(path, "r") as f:
+                self._aggregates = TaskAggregates.from_dict(json.load(f))
+        except (json.JSONDecodeError, KeyError, TypeError):
+            logger.warning("ARCHIVE_AGGREGATES_UNREADABLE", {"path": path})
+
+    def _write_aggregates(self):
+        write_json_atomic(os.path.join(self.directory, AGGREGATES_FILE), self._aggregates.to_dict(), indent=None)
+
+    def baseline_aggregates(self) -> TaskAggregates:
+        """
+        A fresh copy of the counters for all archived tasks.
+        """
+        with self._lock:
+            return TaskAggregates.from_dict(self._aggregates.to_dict())
+
+    def partitions(self) -> List[str]:
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(name[len(PARTITION_PREFIX):-len(PARTITION_SUFFIX)] for name in os.listdir(self.directory)
+                      if name.startswith(PARTITION_PREFIX) and name.endswith(PARTITION_SUFFIX))
+
+    def __contains__(self, task_id: str) -> bool:
+        return self._partition_of(task_id) is not None
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM tasks").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def archive(self, tasks: Dict[str, Dict[str, Any]]):
+        """
+        Appends finished tasks to their partitions. Segments are fsynced
+        before the index commits so a crash never indexes a task that is not
+        on disk.
+        """
+        if not tasks:
+            return
+        by_partition: Dict[str, List[str]] = {}
+        for task_id, task_data in tasks.items():
+            created = task_time(task_data) or datetime.now()
+            by_partition.setdefault(created.strftime("%Y-%m-%d"), []).append(task_id)
+
+        with self.exclusive():
+            for partition, task_ids in by_partition.items():
+                lines = "".join(json.dumps({"id": tid, "task": tasks[tid]}, separators=(",", ":")) + "\n"
+                                for tid in task_ids)
+                # Appending opens a new gzip member; readers see one continuous stream
+                with open(self._partition_path(partition), "ab") as f:
+                    f.write(gzip.compress(lines.encode("utf-8")))
+                    f.flush()
+                    os.fsync(f.fileno())
+
+            self._conn.execute("BEGIN IMMEDIATE")
+            self._conn.executemany("INSERT OR REPLACE INTO tasks (task_id, partition) VALUES (?, ?)",
+                                   [(task_id, partition) for partition, task_ids in by_partition.items()
+                                    for task_id in task_ids])
+            self._conn.execute("COMMIT")
+            for task_id in tasks:
+                self._cache.pop(task_id, None)
+
+            for task_id, task_data in tasks.items():
+                self._aggregates.observe(task_id, task_data)
+                self._aggregates.forget(task_id)
+            self._write_aggregates()
+
+        logger.info("TASKS_ARCHIVED", {"count": len(tasks), "partitions": sorted(by_partition)})
+
+    def unarchive(self, task_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Removes tasks from the archive and from its counters, e.g. because
+        they were written to the hot set again. Returns the archived version
+        of each task that was found.
+        """
+        with self.exclusive():
+            found = {}
+            for task_id in task_ids:
+                task_data = self.get(task_id)
+                if task_data is not None:
+                    found[task_id] = task_data
+            if not found:
+                return found
+            # The segments keep the old copy; without an index entry it is never read
+            self._conn.execute("BEGIN IMMEDIATE")
+            self._conn.executemany("DELETE FROM tasks WHERE task_id = ?", [(task_id,) for task_id in found])
+            self._conn.execute("COMMIT")
+            for task_id, task_data in found.items():
+                self._cache.pop(task_id, None)
+                self._aggregates.retract(task_data)
+            self._write_aggregates()
+        logger.info("TASKS_UNARCHIVED", {"count": len(found)})
+        return found
+
+    def _indexed_in(self, partition: str, task_ids: List[str]) -> Set[str]:
+        indexed = set()
+        with self._lock:
+            # Stay under SQLite's bound-parameter limit
+            for i in range(0, len(task_ids), 500):
+                chunk = task_ids[i:i + 500]
+                rows = self._conn.execute(
+                    f"SELECT task_id FROM tasks WHERE partition = ? AND task_id IN ({','.join('?' * len(chunk))})",
+                    (partition, *chunk))
+                indexed.update(task_id for (task_id,) in rows)
+        return indexed
+
+    def _read_partition(self, partition: str) -> Iterable[Tuple[str, Dict[str, Any]]]:
+        path = self._partition_path(partition)
+        if not os.path.exists(path):
+            return
+        with gzip.open(path, "rt") as f:
+            try:
+                for line in f:
+                    record = json.loads(line)
+                    yield record["id"], record["task"]
+            except (EOFError, OSError, zlib.error, json.JSONDecodeError):
+                # Another process is still appending the last member
+                return
+
+    def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            if task_id in self._cache:
+                self._cache.move_to_end(task_id)
+                # Callers may modify the task; the cached copy must not change
+                return copy.deepcopy(self._cache[task_id])
+            partition = self._partition_of(task_id)
+            if partition is None:
+                return None
+
+            found = None
+            for archived_id, task_data in self._read_partition(partition):
+                if archived_id == task_id:
+                    # Keep scanning: a task re-archived after a crash has a later copy
+                    found = task_data
+            if found is not None:
+                self._cache[task_id] = copy.deepcopy(found)
+                if len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+            return found
+
+    def query(self, start: Optional[datetime] = None, end: Optional[datetime] = None,
+              agent: Optional[str] = None, status: Optional[str] = None, limit: int = 100) -> List[Dict[str, Any]]:
+        """
+        Returns archived tasks submitted in [start, end), optionally filtered
+        by agent and status. Only partitions overlapping the range are read.
+        """
+        start = naive_local(start) if start else None
+        end = naive_local(end) if end else None
+        first = start.strftime("%Y-%m-%d") if start else None
+        last = end.strftime("%Y-%m-%d") if end else None
+        results: Dict[str, Dict[str, Any]] = {}
+        for partition in self.partitions():
+            if (first and partition < first) or (last and partition > last):
+                continue
+            matches: Dict[str, Dict[str, Any]] = {}
+            for archived_id, task_data in self._read_partition(partition):
+                created = task_time(task_data)
+                if start and (created is None or created < start):
+                    continue
+                if end and (created is None or created >= end):
+                    continue
+                if agent and task_data.get("system_name") != agent:
+                    continue
+                if status and task_data.get("status") != getattr(status, "value", status):
+                    continue
+                matches[archived_id] = task_data
+            # Copies of tasks that were unarchived or re-archived elsewhere are no longer indexed here
+            indexed = self._indexed_in(partition, list(matches))
+            results.update((task_id, task_data) for task_id, task_data in matches.items() if task_id in indexed)
+            if len(results) >= limit:
+                break
+        return list(results.values())[:limit]
@@ -0,0 +1,60 @@
+import os
+from typing import Optional, Tuple
+
+class WorkerAutoscaler:
+    """
+    Decides the engine's worker count every interval seconds. The pool
+    doubles (up to max_workers) while every worker is busy and tasks are
+    queued, either many of them or the oldest for more than wait_threshold
+    seconds. It shrinks by one worker after idle_intervals quiet checks in
+    a row. While the event loop lags by more than lag_threshold, extra
+    coroutines would only add to the contention, so the pool is held.
+    """
+    def __init__(self, min_workers: int = 1, max_workers: int = 20, interval: float = 1.0,
+                 wait_threshold: float = 1.0, lag_threshold: float = 0.1, idle_intervals: int = 3):
+        self.min_workers = min_workers
+        self.max_workers = max(min_workers, max_workers)
+        self.interval = interval
+        self.wait_threshold = wait_threshold
+        self.lag_threshold = lag_threshold
+        self.idle_intervals = idle_intervals
+        self._quiet = 0
+
+    @classmethod
+    def from_env(cls) -> "WorkerAutoscaler":
+        """
+        Bounds from FOG_ENGINE_MIN_WORKERS and FOG_ENGINE_MAX_WORKERS.
+        """
+        return cls(
+            min_workers=int(os.environ.get("FOG_ENGINE_MIN_WORKERS", "1")),
+            max_workers=int(os.environ.get("FOG_ENGINE_MAX_WORKERS", "20"))
+        )
+
+    def clamp(self, workers: int) -> int:
+        return min(self.max_workers, max(self.min_workers, workers))
+
+    def decide(self, workers: int, busy: int, queue_depth: int, oldest_wait: float,
+               loop_lag: float) -> Tuple[int, Optional[str]]:
+        """
+        Returns the target worker count and the reason for a change (None
+        when the count stays).
+        """
+        if workers < self.min_workers:
+            return self.min_workers, "below_minimum"
+        if loop_lag > self.lag_threshold:
+            self._quiet = 0
+            return workers, None
+        # Idle workers mean queued tasks are held back by agent limits, not by workers
+        saturated = busy >= workers
+        if saturated and queue_depth > 0 and (queue_depth >= workers or oldest_wait > self.wait_threshold):
+            self._quiet = 0
+            target = self.clamp(workers * 2)
+            return target, "backlog" if target > workers else None
+        if queue_depth == 0 and busy < workers:
+            self._quiet += 1
+            if self._quiet >= self.idle_intervals and workers > self.min_workers:
+                self._quiet = 0
+                return workers - 1, "idle"
+            return workers, None
+        self._quiet = 0
+        return workers, None
@@ -0,0 +1,63 @@
+import asyncio
+import threading
+from typing import Any, Dict, Optional
+from fog.core.logging import logger
+from fog.core.state import FINISHED_STATUSES, status_of
+
+class CompletionRegistry:
+    """
+    Per-task futures resolved when a task reaches COMPLETED or FAILED, so the
+    engine is notified by whoever finishes the task (local handlers, mock
+    agents, the /task-update webhook) instead of polling for it.
+    """
+    def __init__(self):
+        self._futures: Dict[str, asyncio.Future] = {}
+        self._lock = threading.Lock()
+
+    def watch(self, task_id: str) -> asyncio.Future:
+        """
+        Returns the future for task_id, created on the running loop. Call it
+        before dispatching so an immediate completion is not missed.
+        """
+        with self._lock:
+            future = self._futures.get(task_id)
+            if future is None or future.done():
+                future = self._futures[task_id] = asyncio.get_running_loop().create_future()
+            return future
+
+    def discard(self, task_id: str):
+        with self._lock:
+            future = self._futures.pop(task_id, None)
+        if future is not None and not future.done():
+            future.cancel()
+
+    def resolve(self, task_id: str, task_data: Dict[str, Any]) -> bool:
+        """
+        Resolves the task's future if task_data is terminal. Safe to call from
+        any thread. Returns True if a waiter was notified.
+        """
+        if status_of(task_data) not in FINISHED_STATUSES:
+            return False
+        with self._lock:
+            future = self._futures.pop(task_id, None)
+        if future is None or future.done():
+            return False
+        try:
+            future.get_loop().call_soon_threadsafe(self._set_result, future, dict(task_data))
+        except RuntimeError:
+            # The waiting loop has been closed
+            return False
+        logger.info("TASK_COMPLETION_NOTIFIED", {"task_id": task_id, "status": status_of(task_data)})
+        return True
+
+    @staticmethod
+    def _set_result(future: asyncio.Future, task_data: Dict[str, Any]):
+        if not future.done():
+            future.set_result(task_data)
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._futures)
+
+# Global completion registry
+completion_registry = CompletionRegistry()
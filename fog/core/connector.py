@@ -1,19 +1,70 @@
 from abc import ABC, abstractmethod
-from typing import Any, Dict, Optional
+from typing import Any, Coroutine, Dict, List, Optional, Set
 from fog.models.task import TaskPacket, TaskStatus
 import asyncio
 from fog.core.logging import logger
+from fog.core.completion import completion_registry
+from fog.core.limiter import AdaptiveLimiter
+from fog.core.handler_pool import (DEFAULT_EXECUTION_MODES, EXECUTION_MODES, handler_module, handler_pool,
+                                   run_batch_handler, run_handler)
+from fog.core.handlers import handler_registry
 
 class AgentConnector(ABC):
+    # Whether the agent's work runs inside the gateway process, so it is
+    # lost with the process rather than reported after a restart
+    in_process = False
+
     def __init__(self, name: str, endpoint: str):
         self.name = name
         self.endpoint = endpoint
+        # Adaptive in-flight limit, fed by the engine with round-trip times and failures
+        self.limiter = AdaptiveLimiter()
+        # Attempts running in this process, by task_id
+        self._running: Dict[str, Set[asyncio.Task]] = {}
+
+    def _spawn(self, task_ids: List[str], coroutine: Coroutine) -> asyncio.Task:
+        """
+        Runs an attempt in the background, cancellable through cancel_task.
+        A batch attempt is registered under each of its task ids, so
+        cancelling any of them cancels the whole batch.
+        """
+        attempt = asyncio.create_task(coroutine)
+        for task_id in task_ids:
+            self._track(task_id, attempt)
+        return attempt
+
+    def _track(self, task_id: str, attempt: asyncio.Task):
+        # Also keeps a reference: the event loop only holds tasks weakly
+        attempts = self._running.setdefault(task_id, set())
+        attempts.add(attempt)
+
+        def forget(done: asyncio.Task):
+            attempts.discard(done)
+            if not attempts and self._running.get(task_id) is attempts:
+                del self._running[task_id]
+        attempt.add_done_callback(forget)
+
+    def cancel_task(self, task_id: str) -> bool:
+        """
+        Cancels the task's unfinished attempts so they report nothing.
+        Returns False if the agent cannot cancel, e.g. a remote agent.
+        """
+        return False
 
     @abstractmethod
     async def send_task(self, task: TaskPacket) -> bool:
         """Send a task to the agent."""
         pass
 
+    def supports_batch(self) -> bool:
+        """Whether send_batch delivers several tasks in one call."""
+        return False
+
+    async def send_batch(self, tasks: List[TaskPacket]) -> bool:
+        """Send several tasks to the agent at once; only used if supports_batch()."""
+        results = [await self.send_task(task) for task in tasks]
+        return all(results)
+
     @abstractmethod
     async def receive_result(self, task_id: str) -> Optional[Dict[str, Any]]:
         """Receive the result of a task from the agent."""
@@ -39,44 +90,100 @@ class HttpAgentConnector(AgentConnector):
         return True
 
 class LocalAgentConnector(AgentConnector):
+    """
+    Runs an agent's handler in the gateway. execution_mode "inline" awaits it
+    on the event loop, "thread" runs it on its own loop in a worker thread
+    and "process" in the shared handler process pool, which keeps CPU-bound
+    project scans from stalling the API and other tasks.
+    """
+    in_process = True
+
+    def __init__(self, name: str, endpoint: str, execution_mode: Optional[str] = None):
+        super().__init__(name, endpoint)
+        self.execution_mode = execution_mode or DEFAULT_EXECUTION_MODES.get(name, "inline")
+        if self.execution_mode not in EXECUTION_MODES:
+            raise ValueError(f"Unknown execution mode {self.execution_mode} for agent {name}")
+        self.module_name = handler_module(name)
+        # Process mode runs the handler in the pool, but it is imported here
+        # too to learn whether it has handle_batch
+        handler_registry.register(name)
+        if self.execution_mode == "process":
+            handler_pool.preload(self.module_name)
+
     async def send_task(self, task: TaskPacket) -> bool:
         logger.info("SENDING_TASK_LOCAL", {"agent": self.name, "task_id": task.task_id})
-        asyncio.create_task(self._run_local_handler(task))
+        self._spawn([task.task_id], self._run_local_handler(task))
         return True
 
-    async def _run_local_handler(self, task: TaskPacket):
-        from fog.core.state import state_store
-        import importlib
-        import os
+    def cancel_task(self, task_id: str) -> bool:
+        # Thread and process attempts run on, but their results are discarded
+        for attempt in self._running.get(task_id, ()):
+            attempt.cancel()
+        return True
 
-        # Derive directory name from PascalCase name (e.g., FrictionSolver -> friction_solver)
-        agent_dir = ""
-        for i, char in enumerate(self.name):
-            if char.isupper() and i > 0:
-                agent_dir += "_"
-            agent_dir += char.lower()
+    def supports_batch(self) -> bool:
+        return handler_registry.resolve_batch(self.name) is not None
 
-        # Fallback to direct name if directory doesn't exist
-        if not os.path.exists(os.path.join("agents", agent_dir)):
-            agent_dir = self.name.lower()
+    async def send_batch(self, tasks: List[TaskPacket]) -> bool:
+        logger.info("SENDING_TASK_BATCH_LOCAL", {"agent": self.name, "task_ids": [task.task_id for task in tasks]})
+        self._spawn([task.task_id for task in tasks], self._run_local_batch(tasks))
+        return True
 
-        try:
-            module = importlib.import_module(f"agents.{agent_dir}.handler")
-            result = await module.handle_task(task.model_dump(mode='json'))
+    @staticmethod
+    def _apply_result(task: TaskPacket, result: Dict[str, Any]):
+        if result.get("status") == "success":
+            task.status = TaskStatus.COMPLETED
+            task.result = result.get("result") or result
+        else:
+            task.status = TaskStatus.FAILED
+            task.result = {"error": result.get("message", "Unknown error")}
+
+    async def _run_local_handler(self, task: TaskPacket):
+        from fog.core.state import state_store
 
-            if result.get("status") == "success":
-                task.status = TaskStatus.COMPLETED
-                task.result = result.get("result") or result
+        try:
+            task_data = task.model_dump(mode='json')
+            if self.execution_mode == "process":
+                result = await handler_pool.run(self.module_name, task_data)
+            elif self.execution_mode == "thread":
+                result = await asyncio.to_thread(run_handler, self.module_name, task_data)
             else:
-                task.status = TaskStatus.FAILED
-                task.result = {"error": result.get("message", "Unknown error")}
+                result = await handler_registry.resolve(self.name)(task_data)
+            self._apply_result(task, result)
 
         except Exception as e:
             logger.error("LOCAL_HANDLER_ERROR", {"agent": self.name, "error": str(e)})
             task.status = TaskStatus.FAILED
             task.result = {"error": str(e)}
 
-        state_store.update_task(task.task_id, task.model_dump(mode='json'))
+        task_data = task.model_dump(mode='json')
+        state_store.update_task(task.task_id, task_data)
+        completion_registry.resolve(task.task_id, task_data)
+
+    async def _run_local_batch(self, tasks: List[TaskPacket]):
+        from fog.core.state import state_store
+
+        task_list = [task.model_dump(mode='json') for task in tasks]
+        try:
+            if self.execution_mode == "process":
+                results = await handler_pool.run(self.module_name, task_list, run_batch_handler)
+            elif self.execution_mode == "thread":
+                results = await asyncio.to_thread(run_batch_handler, self.module_name, task_list)
+            else:
+                results = await handler_registry.resolve_batch(self.name)(task_list)
+            if len(results) != len(tasks):
+                raise ValueError(f"handle_batch returned {len(results)} results for {len(tasks)} tasks")
+        except Exception as e:
+            logger.error("LOCAL_HANDLER_ERROR", {"agent": self.name, "error": str(e), "batch_size": len(tasks)})
+            results = [{"status": "error", "message": str(e)}] * len(tasks)
+
+        # Fan the results back out to the individual tasks, persisted together
+        for task, result in zip(tasks, results):
+            self._apply_result(task, result)
+        finished = {task.task_id: task.model_dump(mode='json') for task in tasks}
+        state_store.update_tasks(finished)
+        for task_id, task_data in finished.items():
+            completion_registry.resolve(task_id, task_data)
 
     async def receive_result(self, task_id: str) -> Optional[Dict[str, Any]]:
         return None
@@ -85,18 +192,32 @@ class LocalAgentConnector(AgentConnector):
         return True
 
 class MockAgentConnector(AgentConnector):
+    in_process = True
+
+    def __init__(self, name: str, endpoint: str, delay: float = 0.0):
+        super().__init__(name, endpoint)
+        # Simulated processing time in seconds
+        self.delay = delay
+
     async def send_task(self, task: TaskPacket) -> bool:
         logger.info("SENDING_TASK_MOCK", {"agent": self.name, "task_id": task.task_id})
         # Simulate background processing
-        asyncio.create_task(self._simulate_processing(task))
+        self._spawn([task.task_id], self._simulate_processing(task))
+        return True
+
+    def cancel_task(self, task_id: str) -> bool:
+        for attempt in self._running.get(task_id, ()):
+            attempt.cancel()
         return True
 
     async def _simulate_processing(self, task: TaskPacket):
-        await asyncio.sleep(2)
+        await asyncio.sleep(self.delay)
         task.status = TaskStatus.COMPLETED
         task.result = {"message": f"Task {task.task_id} completed by mock agent {self.name}"}
         from fog.core.state import state_store
-        state_store.update_task(task.task_id, task.model_dump(mode='json'))
+        task_data = task.model_dump(mode='json')
+        state_store.update_task(task.task_id, task_data)
+        completion_registry.resolve(task.task_id, task_data)
         logger.info("TASK_COMPLETED_MOCK", {"agent": self.name, "task_id": task.task_id})
 
     async def receive_result(self, task_id: str) -> Optional[Dict[str, Any]]:
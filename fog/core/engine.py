@@ -1,32 +1,166 @@
 import asyncio
-from typing import List, Dict, Any, Optional
+import os
+import time
+from collections import Counter, deque
+from datetime import datetime, timedelta
+from typing import List, Dict, Any, Optional, Set, Tuple
 from fog.models.task import TaskPacket, TaskStatus, TaskType
-from fog.core.connector import agent_registry
-from fog.core.queue import task_queue
-from fog.core.state import state_store
+from fog.core.connector import agent_registry, AgentConnector
+from fog.core.completion import completion_registry
+from fog.core.scheduler import DependencyScheduler, validate_graph
+from fog.core.parking import ParkingLot
+from fog.core.admission import AdmissionController, AdmissionRejected, create_admission_controller
+from fog.core.autoscale import WorkerAutoscaler
+from fog.core.hedging import Hedger, create_hedger
+from fog.core.result_cache import ResultCache, create_result_cache
+from fog.core.retry import DelayedTasks, RetryBudget, RetryPolicy, DEFAULT_RETRY_POLICIES, classify_error, create_retry_budget
+from fog.core.queue import task_queue, TaskQueue
+from fog.core.queue_journal import HELD, LEASED
+from fog.core.state import state_store, FINISHED_STATUSES, status_of
 from fog.core.backup import backup_manager
 from fog.core.logging import logger
 from agents.human_control_interface.control import HumanControlInterface
 from agents.human_control_interface.models import ApprovalStatus
+from agents.human_control_interface.registry import approval_registry
+
+# Seconds a dispatched task may run before it is failed (and possibly retried)
+TASK_TIMEOUT = 300
+# Seconds between checks for completions that arrive without a notification:
+# webhooks handled by another worker process, or connectors that only
+# implement receive_result
+RECONCILE_INTERVAL = 5.0
+# Seconds a task may wait for human approval before the request is rejected
+APPROVAL_TTL = float(os.environ.get("FOG_APPROVAL_TTL_SECONDS", "86400"))
+# Micro-batching for agents with handle_batch: most tasks per dispatch, and
+# how long the first task waits for more to arrive
+BATCH_MAX_SIZE = int(os.environ.get("FOG_BATCH_MAX_SIZE", "32"))
+BATCH_WINDOW = float(os.environ.get("FOG_BATCH_WINDOW_MS", "5")) / 1000
+# Task types that need a human approval before they run
+APPROVAL_TASK_TYPES = (TaskType.MODIFICATION, TaskType.DEPLOYMENT)
+
+def adaptive_limit(agent_name: str) -> Optional[int]:
+    agent = agent_registry.get_agent(agent_name)
+    return agent.limiter.current if agent is not None else None
 
 class OrchestrationEngine:
-    def __init__(self):
+    def __init__(self, task_timeout: float = TASK_TIMEOUT, reconcile_interval: float = RECONCILE_INTERVAL,
+                 queue: Optional[TaskQueue] = None, approval_ttl: Optional[float] = APPROVAL_TTL,
+                 retry_policies: Optional[Dict[str, RetryPolicy]] = None, retry_budget: Optional[RetryBudget] = None,
+                 autoscaler: Optional[WorkerAutoscaler] = None, result_cache: Optional[ResultCache] = None,
+                 batch_size: int = BATCH_MAX_SIZE, batch_window: float = BATCH_WINDOW,
+                 admission: Optional[AdmissionController] = None, hedger: Optional[Hedger] = None):
         self.running = False
-        self._workers = []
+        # FIFO or priority order, chosen by FOG_TASK_QUEUE for the global queue
+        self.queue = queue if queue is not None else task_queue
+        self.scheduler = DependencyScheduler()
+        self.task_timeout = task_timeout
+        self.reconcile_interval = reconcile_interval
+        self.approval_ttl = approval_ttl
+        self.batch_size = batch_size
+        self.batch_window = batch_window
+        self.parking = ParkingLot()
+        # Failed tasks wait here for their backoff instead of in the queue
+        self.retry_policies = {**DEFAULT_RETRY_POLICIES, **(retry_policies or {})}
+        self.retry_budget = retry_budget if retry_budget is not None else create_retry_budget()
+        self.delayed = DelayedTasks(self._on_retry_due)
+        self.result_cache = result_cache if result_cache is not None else create_result_cache()
+        # Queue caps, per-client rates and priority shedding for new submissions
+        self.admission = admission if admission is not None else create_admission_controller()
+        self.hedger = hedger if hedger is not None else create_hedger()
+        # task_id -> (hedge timer, connector the hedge went to, hedge dispatch time)
+        self._hedges: Dict[str, Tuple[asyncio.TimerHandle, Optional[AgentConnector], Optional[float]]] = {}
+        # Tasks whose losing attempt could not be cancelled; its late report is dropped
+        self._abandoned: Dict[str, None] = {}
+        # task_id -> result cache key, for tasks whose result will be cached
+        self._cache_keys: Dict[str, str] = {}
+        # idempotency_key -> unfinished task_id, and that task's waiting duplicates
+        self._idempotency: Dict[str, str] = {}
+        self._duplicates: Dict[str, List[TaskPacket]] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.autoscaler = autoscaler if autoscaler is not None else WorkerAutoscaler.from_env()
+        self._workers: List[asyncio.Task] = []
+        # Workers currently processing a task rather than waiting on the queue
+        self._busy: Set[asyncio.Task] = set()
+        self.scaling_events = deque(maxlen=100)
+        self._scaler: Optional[asyncio.Task] = None
+        self._reconciler: Optional[asyncio.Task] = None
+        # Dispatched tasks awaiting completion: task_id -> (task, agent, timeout timer,
+        # dispatch time or None if recovered after a restart)
+        self._in_flight: Dict[str, Tuple[TaskPacket, AgentConnector, asyncio.TimerHandle, Optional[float]]] = {}
+        self.queue.limit_source = adaptive_limit
 
     async def start(self, num_workers: int = 5):
         self.running = True
+        self._loop = asyncio.get_running_loop()
+        approval_registry.subscribe(self._on_approval_decided)
+        self.delayed.resume()
+        await self._recover_queue()
+        num_workers = self.autoscaler.clamp(num_workers)
         self._workers = [asyncio.create_task(self._worker()) for _ in range(num_workers)]
-        logger.info("ENGINE_STARTED", {"num_workers": num_workers})
+        self._reconciler = asyncio.create_task(self._reconcile_loop())
+        self._scaler = asyncio.create_task(self._autoscale_loop())
+        logger.info("ENGINE_STARTED", {"num_workers": num_workers, "min_workers": self.autoscaler.min_workers,
+                                       "max_workers": self.autoscaler.max_workers})
 
     async def stop(self):
         self.running = False
-        for worker in self._workers:
+        approval_registry.unsubscribe(self._on_approval_decided)
+        self.parking.clear()
+        self.delayed.suspend()
+        tasks = self._workers + [task for task in (self._reconciler, self._scaler) if task is not None]
+        for worker in tasks:
             worker.cancel()
-        await asyncio.gather(*self._workers, return_exceptions=True)
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._workers = []
+        self._busy.clear()
+        self._reconciler = None
+        self._scaler = None
+        for task_id, (task, agent, timer, started_at) in list(self._in_flight.items()):
+            timer.cancel()
+            completion_registry.discard(task_id)
+            self._settle_hedge(task, agent, started_at, None)
+            agent.limiter.on_cancel()
+            self.queue.release(task)
+        self._in_flight.clear()
         logger.info("ENGINE_STOPPED")
 
-    async def submit_task(self, task: TaskPacket):
+    def configure_agent(self, agent_config: Dict[str, Any]):
+        """
+        Applies an agent's bulkhead settings (max_in_flight, weight) and hedge
+        policy from its AgentConfig.
+        """
+        self.queue.configure_agent(agent_config["name"], agent_config.get("max_in_flight"),
+                                   agent_config.get("weight") or 1)
+        if agent_config.get("hedge_percentile") is not None:
+            self.hedger.configure(agent_config["name"], agent_config["hedge_percentile"],
+                                  agent_config.get("hedge_agent"))
+
+    def _admit(self, task: TaskPacket, client: Optional[str], pending: Counter) -> Optional[AdmissionRejected]:
+        """
+        Admission check for a task, counting tasks admitted earlier in the
+        same call (pending, per agent) as already queued.
+        """
+        rejection = self.admission.check(task, self.queue.size() + sum(pending.values()),
+                                         self.queue.agent_depth(task.system_name) + pending[task.system_name], client)
+        if rejection is None:
+            pending[task.system_name] += 1
+        else:
+            logger.warning("TASK_ADMISSION_REJECTED", {"task_id": task.task_id, "agent": task.system_name,
+                                                       "client": client, "reason": rejection.reason,
+                                                       "retry_after": rejection.retry_after})
+        return rejection
+
+    async def submit_task(self, task: TaskPacket, client: Optional[str] = None):
+        """
+        Accepts a task for execution. Raises AdmissionRejected, without
+        recording the task, if the gateway is over its admission limits.
+        """
+        rejection = self._admit(task, client, Counter())
+        if rejection is not None:
+            raise rejection
+        await self._accept_task(task)
+
+    async def _accept_task(self, task: TaskPacket):
         # Safety rule: backup before modification
         if task.task_type == TaskType.MODIFICATION and not task.backup_id:
             project_path = task.payload.get("project_path")
@@ -42,16 +176,182 @@ class OrchestrationEngine:
                     task.status = TaskStatus.FAILED
                     task.result = {"error": f"Backup failed: {str(e)}"}
                     state_store.update_task(task.task_id, task.model_dump(mode='json'))
+                    await self._task_finished(task)
                     return
             else:
                 logger.error("MODIFICATION_TASK_WITHOUT_PROJECT_PATH", {"task_id": task.task_id})
                 task.status = TaskStatus.FAILED
                 task.result = {"error": "Modification task requires project_path in payload for safety backup"}
                 state_store.update_task(task.task_id, task.model_dump(mode='json'))
+                await self._task_finished(task)
                 return
 
+        cache_key = await asyncio.to_thread(self.result_cache.key_for, task)
+        if self._deduplicate(task, cache_key):
+            state_store.update_task(task.task_id, task.model_dump(mode='json'))
+            if task.status == TaskStatus.COMPLETED:
+                await self._task_finished(task)
+            return
+
+        error = self.scheduler.add(task)
+        if error:
+            await self._skip_task(task, error)
+            return
         state_store.update_task(task.task_id, task.model_dump(mode='json'))
-        await task_queue.enqueue(task)
+        if self.scheduler.is_held(task.task_id):
+            self.queue.defer(task)
+        else:
+            await self.queue.enqueue(task)
+
+    async def submit_tasks(self, tasks: List[TaskPacket], client: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Submits many tasks with one state write and one enqueue step.
+        Returns a result per task, in input order: "queued", "held" (waiting
+        for dependencies), "cached" (completed from the result cache),
+        "deduplicated" (waiting for a task with the same idempotency key),
+        "rejected" with an error (the task is recorded as FAILED) or
+        "throttled" with an error and retry_after (refused by admission
+        control and not recorded). Tasks depending on a throttled task are
+        throttled too. Raises ValueError for duplicate ids, dependency cycles
+        or unknown dependencies.
+        """
+        ordered = validate_graph(tasks)
+        throttled: Dict[str, AdmissionRejected] = {}
+        pending: Counter = Counter()
+        admitted = []
+        for task in ordered:
+            blocker = next((throttled[d] for d in task.dependencies if d in throttled), None)
+            rejection = blocker or self._admit(task, client, pending)
+            if rejection is not None:
+                throttled[task.task_id] = rejection
+            else:
+                admitted.append(task)
+        ordered = admitted
+        # Modifications without a backup go through _accept_task below, which deduplicates them
+        cacheable = [task for task in ordered
+                     if not (task.task_type == TaskType.MODIFICATION and not task.backup_id)]
+        # Fingerprinting walks the referenced projects, so keep it off the event loop
+        keys = await asyncio.to_thread(self.result_cache.keys_for, cacheable)
+        deduplicated = set()
+        for task, cache_key in zip(cacheable, keys):
+            if self._deduplicate(task, cache_key):
+                deduplicated.add(task.task_id)
+        # Record every task first so dependents within the batch can see their prerequisites
+        state_store.update_tasks({task.task_id: task.model_dump(mode='json') for task in ordered})
+        ready = []
+        for task in ordered:
+            if task.task_id in deduplicated:
+                if task.status == TaskStatus.COMPLETED:
+                    await self._task_finished(task)
+                continue
+            if task.task_type == TaskType.MODIFICATION and not task.backup_id:
+                # Needs its own safety backup before it may be queued
+                await self._accept_task(task)
+                continue
+            error = self.scheduler.add(task)
+            if error:
+                await self._skip_task(task, error)
+            elif self.scheduler.is_held(task.task_id):
+                self.queue.defer(task)
+            else:
+                ready.append(task)
+        if ready:
+            await self.queue.enqueue_many(ready)
+        logger.info("TASK_BATCH_SUBMITTED", {"tasks": len(tasks), "queued": len(ready)})
+
+        results = []
+        for task in tasks:
+            if task.task_id in throttled:
+                rejection = throttled[task.task_id]
+                results.append({"task_id": task.task_id, "status": "throttled", "error": str(rejection),
+                                "retry_after": rejection.retry_after})
+            elif task.task_id in deduplicated:
+                results.append({"task_id": task.task_id,
+                                "status": "cached" if task.status == TaskStatus.COMPLETED else "deduplicated"})
+            elif task.status == TaskStatus.FAILED:
+                results.append({"task_id": task.task_id, "status": "rejected", "error": (task.result or {}).get("error")})
+            else:
+                results.append({"task_id": task.task_id, "status": "held" if self.scheduler.is_held(task.task_id) else "queued"})
+        return results
+
+    async def submit_graph(self, tasks: List[TaskPacket], client: Optional[str] = None) -> List[str]:
+        """
+        Submits tasks linked by TaskPacket.dependencies in one call. Tasks are
+        released as soon as their prerequisites complete, so independent
+        branches run in parallel. Raises ValueError for cycles or unknown
+        dependencies, and AdmissionRejected if any task is refused, in which
+        case none is submitted.
+        """
+        ordered = validate_graph(tasks)
+        pending: Counter = Counter()
+        for index, task in enumerate(ordered):
+            rejection = self._admit(task, client, pending)
+            if rejection is not None:
+                for _ in range(index):
+                    self.admission.refund(client)
+                raise rejection
+        # Record every task first so dependents can see their prerequisites
+        for task in ordered:
+            state_store.update_task(task.task_id, task.model_dump(mode='json'))
+        for task in ordered:
+            await self._accept_task(task)
+        logger.info("TASK_GRAPH_SUBMITTED", {"tasks": len(ordered)})
+        return [task.task_id for task in ordered]
+
+    async def _task_finished(self, task: TaskPacket):
+        """
+        Releases dependents of a task that reached COMPLETED or FAILED.
+        """
+        self.queue.ack(task.task_id)
+        cache_key = self._cache_keys.pop(task.task_id, None)
+        if cache_key is not None and task.status == TaskStatus.COMPLETED:
+            self.result_cache.put(cache_key, task.task_id, task.result)
+        if task.idempotency_key and self._idempotency.get(task.idempotency_key) == task.task_id:
+            del self._idempotency[task.idempotency_key]
+        for duplicate in self._duplicates.pop(task.task_id, ()):
+            duplicate.status = task.status
+            duplicate.result = {**(task.result or {}), "deduplicated_from": task.task_id}
+            state_store.update_task(duplicate.task_id, duplicate.model_dump(mode='json'))
+            await self._task_finished(duplicate)
+        ready, orphaned = self.scheduler.complete(task.task_id, task.status.value, task.result)
+        for dependent in ready:
+            logger.info("TASK_DEPENDENCIES_MET", {"task_id": dependent.task_id})
+            state_store.update_task(dependent.task_id, dependent.model_dump(mode='json'))
+            await self.queue.enqueue(dependent)
+        for dependent in orphaned:
+            await self._skip_task(dependent, f"Dependency {task.task_id} failed")
+
+    def _deduplicate(self, task: TaskPacket, cache_key: Optional[str]) -> bool:
+        """
+        Settles a task without running it if possible: it joins an unfinished
+        task with the same idempotency key, or completes from the result
+        cache. Returns False if the task has to run; the caller persists it.
+        """
+        if task.idempotency_key:
+            original_id = self._idempotency.get(task.idempotency_key)
+            if original_id is not None:
+                self._duplicates.setdefault(original_id, []).append(task)
+                logger.info("TASK_DEDUPLICATED", {"task_id": task.task_id, "original_task_id": original_id})
+                return True
+        if cache_key is not None:
+            cached = self.result_cache.get(cache_key)
+            if cached is not None:
+                result, source_task_id = cached
+                task.status = TaskStatus.COMPLETED
+                task.result = {**result, "cached": True, "cached_from": source_task_id}
+                logger.info("TASK_RESULT_CACHED", {"task_id": task.task_id, "cached_from": source_task_id})
+                return True
+            self._cache_keys[task.task_id] = cache_key
+        if task.idempotency_key:
+            self._idempotency[task.idempotency_key] = task.task_id
+        return False
+
+    async def _skip_task(self, task: TaskPacket, reason: str):
+        logger.warning("TASK_SKIPPED", {"task_id": task.task_id, "reason": reason})
+        task.status = TaskStatus.FAILED
+        task.result = {"error": reason, "skipped": True}
+        state_store.update_task(task.task_id, task.model_dump(mode='json'))
+        await self._task_finished(task)
 
     async def _worker(self):
         hci = HumanControlInterface()
@@ -66,13 +366,133 @@ class OrchestrationEngine:
                 await asyncio.sleep(2)
                 continue
 
-            task = await task_queue.dequeue()
+            task = await self.queue.dequeue()
+            current = asyncio.current_task()
+            self._busy.add(current)
+            batch = [task]
             try:
-                await self._process_task(task)
+                batch = await self._gather_batch(task)
+                if len(batch) > 1:
+                    await self._process_batch(batch)
+                else:
+                    await self._process_task(task)
             except Exception as e:
                 logger.error("TASK_PROCESSING_ERROR", {"task_id": task.task_id, "error": str(e)})
             finally:
-                task_queue.task_done()
+                self._busy.discard(current)
+                for taken in batch:
+                    # A dispatched task keeps its agent slot until it completes or times out
+                    if taken.task_id not in self._in_flight:
+                        self.queue.release(taken)
+                    self.queue.task_done()
+
+    async def _gather_batch(self, task: TaskPacket) -> List[TaskPacket]:
+        """
+        Collects more queued tasks for the same agent if it accepts batches,
+        waiting up to batch_window for the batch to fill.
+        """
+        if self.batch_size <= 1 or task.task_type in APPROVAL_TASK_TYPES:
+            return [task]
+        agent = agent_registry.get_agent(task.system_name)
+        if agent is None or not agent.supports_batch():
+            return [task]
+        batchable = lambda queued: queued.task_type not in APPROVAL_TASK_TYPES
+        batch = [task] + self.queue.take(task.system_name, self.batch_size - 1, batchable)
+        if len(batch) < self.batch_size and self.batch_window > 0:
+            await asyncio.sleep(self.batch_window)
+            batch += self.queue.take(task.system_name, self.batch_size - len(batch), batchable)
+        return batch
+
+    async def _recover_queue(self):
+        """
+        Re-drives tasks a durable queue journaled but never acknowledged.
+        Tasks still running on a remote agent under an unexpired lease are
+        watched for completion again instead of being sent twice. Work of
+        in-process agents died with the previous process, so those tasks are
+        queued again like the rest, or held for their dependencies or wait
+        out their retry delay.
+        """
+        entries = self.queue.recover()
+        if not entries:
+            return
+        counts = {"requeued": 0, "running": 0, "held": 0, "delayed": 0, "finished": 0}
+        loop = asyncio.get_running_loop()
+        now = datetime.now()
+        for task_data, state, leased_until in entries:
+            stored = state_store.get_task(task_data["task_id"])
+            if stored is not None and status_of(stored) in FINISHED_STATUSES:
+                # Finished while acknowledgement was pending
+                self.queue.ack(task_data["task_id"])
+                counts["finished"] += 1
+                continue
+            task = TaskPacket(**(stored or task_data))
+            agent = agent_registry.get_agent(task.system_name)
+            lease_left = leased_until - time.time() if leased_until is not None else 0
+            if (state == LEASED and task.status == TaskStatus.RUNNING and agent is not None
+                    and not agent.in_process and lease_left > 0):
+                completion = completion_registry.watch(task.task_id)
+                timer = loop.call_later(min(lease_left, self.task_timeout), self._on_timeout, task.task_id)
+                agent.limiter.on_dispatch()
+                self.queue.claim(task)
+                self._in_flight[task.task_id] = (task, agent, timer, None)
+                completion.add_done_callback(lambda future, task_id=task.task_id: self._on_completion(task_id, future))
+                counts["running"] += 1
+            elif state == HELD:
+                error = self.scheduler.add(task)
+                if error:
+                    await self._skip_task(task, error)
+                elif self.scheduler.is_held(task.task_id):
+                    counts["held"] += 1
+                else:
+                    await self.queue.enqueue(task)
+                    counts["requeued"] += 1
+            elif task.next_retry_at is not None and task.next_retry_at > now:
+                task.status = TaskStatus.PENDING
+                self.delayed.schedule(task, (task.next_retry_at - now).total_seconds())
+                counts["delayed"] += 1
+            else:
+                task.status = TaskStatus.PENDING
+                await self.queue.enqueue(task)
+                counts["requeued"] += 1
+        logger.info("TASK_QUEUE_RECOVERED", counts)
+
+    async def _autoscale_loop(self):
+        loop = asyncio.get_running_loop()
+        while self.running:
+            before = loop.time()
+            await asyncio.sleep(self.autoscaler.interval)
+            # How late the loop woke us up: a measure of event-loop saturation
+            self._autoscale(max(0.0, loop.time() - before - self.autoscaler.interval))
+
+    def _autoscale(self, loop_lag: float):
+        self._workers = [worker for worker in self._workers if not worker.done()]
+        workers = len(self._workers)
+        queue_depth = self.queue.size()
+        oldest_wait = self.queue.oldest_wait()
+        target, reason = self.autoscaler.decide(workers, len(self._busy), queue_depth, oldest_wait, loop_lag)
+        if target > workers:
+            self._workers.extend(asyncio.create_task(self._worker()) for _ in range(target - workers))
+        elif target < workers:
+            # Only retire workers waiting on the queue; a cancelled dequeue leaves its task queued
+            idle = [worker for worker in self._workers if worker not in self._busy]
+            for worker in idle[:workers - target]:
+                worker.cancel()
+                self._workers.remove(worker)
+            target = len(self._workers)
+        if target != workers:
+            event = {"timestamp": datetime.now().isoformat(), "from": workers, "to": target, "reason": reason,
+                     "queue_depth": queue_depth, "oldest_wait": round(oldest_wait, 3), "loop_lag": round(loop_lag, 4)}
+            self.scaling_events.append(event)
+            logger.info("ENGINE_SCALED", event)
+
+    def worker_stats(self) -> Dict[str, Any]:
+        return {
+            "workers": len([worker for worker in self._workers if not worker.done()]),
+            "busy": len(self._busy),
+            "min_workers": self.autoscaler.min_workers,
+            "max_workers": self.autoscaler.max_workers,
+            "scaling_events": list(self.scaling_events)[-10:],
+        }
 
     async def _process_task(self, task: TaskPacket):
         hci = HumanControlInterface()
@@ -85,28 +505,18 @@ class OrchestrationEngine:
             return
 
         # Human approval check for high-risk tasks
-        if task.task_type in [TaskType.MODIFICATION, TaskType.DEPLOYMENT]:
-            state = state_store.get_state()
-            approvals = state.get("approvals", {})
-
-            # Find if there is an approval for this task
-            approval = next((ApprovalStatus(a["status"]) for a in approvals.values() if a["task_id"] == task.task_id), None)
+        if task.task_type in APPROVAL_TASK_TYPES:
+            approval = hci.get_task_approval_status(task.task_id)
 
+            if approval == ApprovalStatus.REJECTED:
+                logger.warning("TASK_REJECTED_BY_HUMAN", {"task_id": task.task_id})
+                await self._fail_task(task, "Task rejected by human approval")
+                return
             if approval != ApprovalStatus.APPROVED:
                 if approval is None:
                     hci.request_approval(task, requester="OrchestrationEngine")
                     logger.info("APPROVAL_REQUESTED_FOR_TASK", {"task_id": task.task_id})
-                elif approval == ApprovalStatus.REJECTED:
-                    logger.warning("TASK_REJECTED_BY_HUMAN", {"task_id": task.task_id})
-                    await self._handle_failure(task, "Task rejected by human approval")
-                    return
-
-                # Re-enqueue and wait
-                logger.info("TASK_AWAITING_APPROVAL", {"task_id": task.task_id})
-                task.status = TaskStatus.PENDING
-                state_store.update_task(task.task_id, task.model_dump(mode='json'))
-                await asyncio.sleep(5)
-                await task_queue.enqueue(task)
+                self._park(task)
                 return
 
         task.status = TaskStatus.RUNNING
@@ -119,55 +529,312 @@ class OrchestrationEngine:
             task.result = {"error": f"Agent {task.system_name} not found"}
             state_store.update_task(task.task_id, task.model_dump(mode='json'))
             logger.error("AGENT_NOT_FOUND", {"task_id": task.task_id, "agent": task.system_name})
+            await self._task_finished(task)
             return
 
+        # Watch before dispatching so an immediate completion is not missed
+        completion = completion_registry.watch(task.task_id)
+        started_at = asyncio.get_running_loop().time()
+        agent.limiter.on_dispatch()
         success = await agent.send_task(task)
         if not success:
+            completion_registry.discard(task.task_id)
+            agent.limiter.on_drop("dispatch_failed")
             await self._handle_failure(task, "Failed to send task to agent")
             return
+        self._track_dispatch(task, agent, completion, started_at)
 
-        # Wait for result (polling or status update)
-        timeout = 300 # 5 minutes timeout
-        start_time = asyncio.get_event_loop().time()
+    async def _process_batch(self, tasks: List[TaskPacket]):
+        """
+        Dispatches same-agent tasks in one send_batch call. Each task is then
+        tracked, completed and retried on its own.
+        """
+        agent_name = tasks[0].system_name
+        if HumanControlInterface().get_agent_toggles().get(agent_name) is False:
+            logger.warning("AGENT_DISABLED_TASK_REJECTED", {"task_ids": [t.task_id for t in tasks], "agent": agent_name})
+            for task in tasks:
+                await self._handle_failure(task, f"Agent {agent_name} is currently disabled")
+            return
+        agent = agent_registry.get_agent(agent_name)
+        if not agent:
+            # Unregistered since the batch was gathered; fail as _process_task does
+            for task in tasks:
+                task.status = TaskStatus.FAILED
+                task.result = {"error": f"Agent {agent_name} not found"}
+            state_store.update_tasks({task.task_id: task.model_dump(mode='json') for task in tasks})
+            logger.error("AGENT_NOT_FOUND", {"task_ids": [t.task_id for t in tasks], "agent": agent_name})
+            for task in tasks:
+                await self._task_finished(task)
+            return
 
-        while True:
-            # Re-fetch task state from store to see if it was updated by an external callback
-            current_task_state = state_store.get_task(task.task_id)
-            if current_task_state:
-                if current_task_state["status"] in [TaskStatus.COMPLETED, TaskStatus.FAILED]:
-                    task.status = TaskStatus(current_task_state["status"])
-                    task.result = current_task_state.get("result")
-                    break
+        for task in tasks:
+            task.status = TaskStatus.RUNNING
+        state_store.update_tasks({task.task_id: task.model_dump(mode='json') for task in tasks})
+        logger.info("PROCESSING_TASK_BATCH", {"agent": agent_name, "task_ids": [task.task_id for task in tasks]})
 
-            # Also check if agent has the result (polling)
-            agent_result = await agent.receive_result(task.task_id)
-            if agent_result:
-                task.status = TaskStatus.COMPLETED
-                task.result = agent_result
-                state_store.update_task(task.task_id, task.model_dump(mode='json'))
-                break
+        completions = [completion_registry.watch(task.task_id) for task in tasks]
+        started_at = asyncio.get_running_loop().time()
+        for _ in tasks:
+            agent.limiter.on_dispatch()
+        success = await agent.send_batch(tasks)
+        if not success:
+            for task in tasks:
+                completion_registry.discard(task.task_id)
+                agent.limiter.on_drop("dispatch_failed")
+                await self._handle_failure(task, "Failed to send task to agent")
+            return
+        for task, completion in zip(tasks, completions):
+            # A batch runs as one attempt that cannot be cancelled per task, so it is not hedged
+            self._track_dispatch(task, agent, completion, started_at, hedge=False)
 
-            if asyncio.get_event_loop().time() - start_time > timeout:
-                await self._handle_failure(task, "Task timed out")
-                return
+    def _track_dispatch(self, task: TaskPacket, agent: AgentConnector, completion: asyncio.Future, started_at: float,
+                        hedge: bool = True):
+        # The worker is released now; the completion or the timer finishes the task
+        loop = asyncio.get_running_loop()
+        timer = loop.call_later(self.task_timeout, self._on_timeout, task.task_id)
+        self._in_flight[task.task_id] = (task, agent, timer, started_at)
+        self._abandoned.pop(task.task_id, None)
+        hedge_after = None
+        if hedge:
+            self.hedger.note_eligible(task)
+            hedge_after = self.hedger.delay(task)
+        if hedge_after is not None:
+            self._hedges[task.task_id] = (loop.call_later(hedge_after, self._hedge, task.task_id), None, None)
+        completion.add_done_callback(lambda future: self._on_completion(task.task_id, future))
 
-            await asyncio.sleep(2)
+    def _hedge(self, task_id: str):
+        """
+        Dispatches a duplicate of a task that has run past its agent's hedge delay.
+        """
+        entry = self._in_flight.get(task_id)
+        if entry is None or task_id not in self._hedges:
+            return
+        task, agent, _, _ = entry
+        target = agent_registry.get_agent(self.hedger.target(task.system_name))
+        if (target is None or target.limiter.in_flight >= target.limiter.current
+                or not self.hedger.allow(task.system_name)):
+            self._hedges.pop(task_id, None)
+            return
+        timer, _, _ = self._hedges[task_id]
+        self._hedges[task_id] = (timer, target, asyncio.get_running_loop().time())
+        asyncio.create_task(self._send_hedge(task, target))
 
+    async def _send_hedge(self, task: TaskPacket, target: AgentConnector):
+        duplicate = task.model_copy(deep=True)
+        duplicate.hedge_attempt = True
+        logger.info("TASK_HEDGED", {"task_id": task.task_id, "agent": task.system_name, "hedge_agent": target.name})
+        target.limiter.on_dispatch()
+        try:
+            sent = await target.send_task(duplicate)
+        except Exception as e:
+            logger.error("TASK_HEDGE_FAILED", {"task_id": task.task_id, "error": str(e)})
+            sent = False
+        if not sent:
+            target.limiter.on_drop("dispatch_failed")
+            hedge = self._hedges.get(task.task_id)
+            if hedge is not None and hedge[1] is target:
+                self._hedges[task.task_id] = (hedge[0], None, None)
+
+    def _settle_hedge(self, task: TaskPacket, agent: AgentConnector, started_at: Optional[float],
+                      task_data: Optional[Dict[str, Any]]) -> Tuple[AgentConnector, Optional[float]]:
+        """
+        Ends a task's hedge, if any. The attempt that produced task_data wins
+        and the other one is cancelled. Returns the winning attempt's
+        connector and dispatch time.
+        """
+        hedge = self._hedges.pop(task.task_id, None)
+        if hedge is None:
+            return agent, started_at
+        timer, target, hedged_at = hedge
+        timer.cancel()
+        if target is None:
+            return agent, started_at
+        hedge_won = bool(task_data and task_data.get("hedge_attempt"))
+        winner, loser = (target, agent) if hedge_won else (agent, target)
+        loser.limiter.on_cancel()
+        if not loser.cancel_task(task.task_id):
+            self._abandon(task.task_id)
+        if task_data is not None:
+            self.hedger.record(task.system_name, hedge_won)
+            logger.info("TASK_HEDGE_SETTLED", {"task_id": task.task_id, "winner": winner.name,
+                                               "hedge_won": hedge_won})
+        return winner, hedged_at if hedge_won else started_at
+
+    def _abandon(self, task_id: str, limit: int = 10000):
+        self._abandoned[task_id] = None
+        while len(self._abandoned) > limit:
+            del self._abandoned[next(iter(self._abandoned))]
+
+    def absorb_late_update(self, task_id: str) -> bool:
+        """
+        True if an update for a finished task comes from its losing hedged
+        attempt, which could not be cancelled; the caller should drop it.
+        """
+        if task_id in self._in_flight or task_id not in self._abandoned:
+            return False
+        del self._abandoned[task_id]
+        return True
+
+    def hedge_stats(self) -> Dict[str, Dict[str, Any]]:
+        return self.hedger.stats()
+
+    def _on_completion(self, task_id: str, future: asyncio.Future):
+        if future.cancelled():
+            return
+        entry = self._in_flight.pop(task_id, None)
+        if entry is None:
+            return
+        task, primary, timer, started_at = entry
+        timer.cancel()
+        task_data = future.result()
+        # With a hedge out, the attempt that finished first is the one measured
+        agent, started_at = self._settle_hedge(task, primary, started_at, task_data)
+        if started_at is None:
+            # Recovered after a restart: the round-trip time is unknown
+            agent.limiter.on_cancel()
+        elif status_of(task_data) == TaskStatus.COMPLETED.value:
+            rtt = asyncio.get_running_loop().time() - started_at
+            agent.limiter.on_success(rtt)
+            self.hedger.observe(task.system_name, rtt)
+        else:
+            agent.limiter.on_drop("failure")
+        self.queue.release(task)
+        asyncio.create_task(self._finish_task(task, task_data))
+
+    async def _finish_task(self, task: TaskPacket, task_data: Dict[str, Any]):
+        task.status = TaskStatus(status_of(task_data))
+        task.result = task_data.get("result")
         state_store.update_task(task.task_id, task.model_dump(mode='json'))
         logger.info("TASK_FINISHED", {"task_id": task.task_id, "status": task.status})
+        await self._task_finished(task)
+
+    def _on_timeout(self, task_id: str):
+        entry = self._in_flight.pop(task_id, None)
+        if entry is None:
+            return
+        task, agent, _, started_at = entry
+        completion_registry.discard(task_id)
+        self._settle_hedge(task, agent, started_at, None)
+        agent.limiter.on_drop("timeout")
+        self.queue.release(task)
+        asyncio.create_task(self._handle_failure(task, "Task timed out"))
+
+    async def _reconcile_loop(self):
+        while self.running:
+            await asyncio.sleep(self.reconcile_interval)
+            # Hold on to this process's journaled tasks and adopt those of processes that died
+            try:
+                self.queue.renew()
+                await self._recover_queue()
+            except Exception as e:
+                logger.error("TASK_QUEUE_RENEW_ERROR", {"error": str(e)})
+            # Approvals decided by another process (e.g. the CLI) do not notify this one
+            for task_id in self.parking.task_ids():
+                request_data = approval_registry.for_task(task_id)
+                if request_data is not None and request_data["status"] != ApprovalStatus.PENDING:
+                    self._resume_parked(task_id, request_data["status"], request_data.get("reason"))
+            for task_id, (task, agent, _, _) in list(self._in_flight.items()):
+                try:
+                    current_task_state = state_store.get_task(task_id)
+                    if current_task_state and status_of(current_task_state) in FINISHED_STATUSES:
+                        completion_registry.resolve(task_id, current_task_state)
+                        continue
+                    agent_result = await agent.receive_result(task_id)
+                    if agent_result:
+                        completion_registry.resolve(task_id, {"status": TaskStatus.COMPLETED.value, "result": agent_result})
+                        continue
+                    hedge_agent = self._hedges.get(task_id, (None, None, None))[1]
+                    if hedge_agent is not None and hedge_agent is not agent:
+                        hedge_result = await hedge_agent.receive_result(task_id)
+                        if hedge_result:
+                            completion_registry.resolve(task_id, {"status": TaskStatus.COMPLETED.value,
+                                                                  "result": hedge_result, "hedge_attempt": True})
+                except Exception as e:
+                    logger.error("TASK_RECONCILE_ERROR", {"task_id": task_id, "error": str(e)})
+
+    def _park(self, task: TaskPacket):
+        # Out of the queue until the approval is decided; the worker moves on
+        task.status = TaskStatus.PENDING
+        state_store.update_task(task.task_id, task.model_dump(mode='json'))
+        timer = None
+        if self.approval_ttl is not None:
+            timer = asyncio.get_running_loop().call_later(self.approval_ttl, self._on_approval_expired, task.task_id)
+        self.parking.park(task, timer)
+
+    def _on_approval_decided(self, request_data: Dict[str, Any]):
+        # Approvals may be decided from any thread
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        loop.call_soon_threadsafe(self._resume_parked, request_data["task_id"], request_data["status"], request_data.get("reason"))
+
+    def _resume_parked(self, task_id: str, status: str, reason: Optional[str] = None):
+        task = self.parking.unpark(task_id)
+        if task is None:
+            return
+        if status == ApprovalStatus.APPROVED:
+            logger.info("TASK_RESUMED_AFTER_APPROVAL", {"task_id": task_id})
+            asyncio.create_task(self.queue.enqueue(task))
+        else:
+            logger.warning("TASK_REJECTED_BY_HUMAN", {"task_id": task_id, "reason": reason})
+            error = "Task rejected by human approval" + (f": {reason}" if reason else "")
+            asyncio.create_task(self._fail_task(task, error))
+
+    def _on_approval_expired(self, task_id: str):
+        request_data = approval_registry.for_task(task_id)
+        if request_data is None or request_data["status"] != ApprovalStatus.PENDING:
+            self._resume_parked(task_id, request_data["status"] if request_data else ApprovalStatus.REJECTED)
+            return
+        logger.warning("APPROVAL_EXPIRED", {"task_id": task_id, "request_id": request_data["request_id"]})
+        # Rejecting the request notifies _on_approval_decided, which fails the task
+        HumanControlInterface().reject_request(request_data["request_id"], "OrchestrationEngine", "Approval timed out")
+
+    async def _fail_task(self, task: TaskPacket, error_message: str):
+        task.status = TaskStatus.FAILED
+        task.result = {"error": error_message}
+        state_store.update_task(task.task_id, task.model_dump(mode='json'))
+        await self._task_finished(task)
+
+    def _schedule_retry(self, task: TaskPacket, error_message: str):
+        error_class = classify_error(error_message)
+        delay = self.retry_policies.get(error_class, self.retry_policies["default"]).delay(task.retries)
+        task.status = TaskStatus.PENDING
+        task.last_error = error_message
+        task.next_retry_at = datetime.now() + timedelta(seconds=delay)
+        state_store.update_task(task.task_id, task.model_dump(mode='json'))
+        self.delayed.schedule(task, delay)
+        logger.warning("TASK_RETRYING", {"task_id": task.task_id, "retry": task.retries, "error": error_message,
+                                         "error_class": error_class, "delay": round(delay, 3)})
+
+    def _on_retry_due(self, task: TaskPacket):
+        task.next_retry_at = None
+        asyncio.create_task(self.queue.enqueue(task))
+
+    def recover_task(self, task: TaskPacket, error_message: str) -> bool:
+        """
+        Gives a failed task one more attempt through the retry backoff.
+        Returns False if the agent's retry budget is exhausted.
+        """
+        if not self.retry_budget.allow(task.system_name):
+            logger.warning("RETRY_BUDGET_EXHAUSTED", {"task_id": task.task_id, "agent": task.system_name})
+            return False
+        task.max_retries = max(task.max_retries, task.retries + 1)
+        self._schedule_retry(task, error_message)
+        return True
 
     async def _handle_failure(self, task: TaskPacket, error_message: str):
         task.retries += 1
-        if task.retries < task.max_retries:
-            logger.warning("TASK_RETRYING", {"task_id": task.task_id, "retry": task.retries, "error": error_message})
-            task.status = TaskStatus.PENDING
-            state_store.update_task(task.task_id, task.model_dump(mode='json'))
-            await task_queue.enqueue(task)
+        if task.retries < task.max_retries and self.retry_budget.allow(task.system_name):
+            self._schedule_retry(task, error_message)
         else:
+            if task.retries < task.max_retries:
+                logger.warning("RETRY_BUDGET_EXHAUSTED", {"task_id": task.task_id, "agent": task.system_name})
+                error_message = f"{error_message} (retry budget for {task.system_name} exhausted)"
             task.status = TaskStatus.FAILED
             task.result = {"error": error_message}
             state_store.update_task(task.task_id, task.model_dump(mode='json'))
             logger.error("TASK_MAX_RETRIES_REACHED", {"task_id": task.task_id, "error": error_message})
+            await self._task_finished(task)
 
 # Global engine instance
 orchestration_engine = OrchestrationEngine()
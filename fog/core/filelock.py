@@ -0,0 +1,40 @@
+import json
+import os
+from contextlib import contextmanager
+from typing import Any
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows has no flock; fall back to process-local safety
+    fcntl = None
+
+@contextmanager
+def file_lock(path: str):
+    """
+    Holds an exclusive advisory lock on path + ".lock" so several gateway
+    worker processes can read-modify-write the same file safely.
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path + ".lock", "a+") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+def write_json_atomic(path: str, data: Any, indent: int = 4):
+    """
+    Writes JSON through a temporary file so readers in other processes never
+    see a half-written document.
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, indent=indent)
+    os.replace(tmp_path, path)
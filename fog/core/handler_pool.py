@@ -0,0 +1,122 @@
+import asyncio
+import importlib
+import inspect
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set
+from fog.core.logging import logger
+
+EXECUTION_MODES = ("inline", "thread", "process")
+
+# Handlers that walk and parse whole projects. Debugger records its history
+# in the state store, which only the gateway process may write, so it gets a
+# thread rather than a process.
+DEFAULT_EXECUTION_MODES = {
+    "CodeQuality": "process",
+    "SecurityAnalyzer": "process",
+    "DependencyRepair": "process",
+    "Debugger": "thread",
+}
+
+def handler_module(agent_name: str) -> str:
+    """
+    Module path of a local agent's handler (FrictionSolver -> agents.friction_solver.handler).
+    """
+    agent_dir = ""
+    for i, char in enumerate(agent_name):
+        if char.isupper() and i > 0:
+            agent_dir += "_"
+        agent_dir += char.lower()
+
+    # Fallback to direct name if directory doesn't exist
+    if not os.path.exists(os.path.join("agents", agent_dir)):
+        agent_dir = agent_name.lower()
+    return f"agents.{agent_dir}.handler"
+
+def run_handler(module_name: str, task_data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Runs a handler to completion on its own event loop, for thread and process modes.
+    """
+    module = importlib.import_module(module_name)
+    return asyncio.run(module.handle_task(task_data))
+
+def run_batch_handler(module_name: str, task_list: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Runs a handler's handle_batch on its own event loop.
+    """
+    module = importlib.import_module(module_name)
+    return asyncio.run(module.handle_batch(task_list))
+
+def _preload(module_names: Iterable[str]):
+    for module_name in module_names:
+        try:
+            module = importlib.import_module(module_name)
+            # Build the handler's shared objects once per worker process
+            warm = getattr(module, "warm", None)
+            if inspect.iscoroutinefunction(warm):
+                asyncio.run(warm())
+            elif warm is not None:
+                warm()
+        except Exception as e:
+            logger.error("HANDLER_PRELOAD_FAILED", {"module": module_name, "error": str(e)})
+
+def _worker_pid() -> int:
+    return os.getpid()
+
+class HandlerProcessPool:
+    """
+    Process pool for CPU-bound local handlers. Worker processes are spawned
+    (not forked, so they inherit no gateway threads or locks) and import the
+    registered handler modules when they start; warm() starts them all up
+    front so the first tasks do not pay for interpreter start-up.
+    """
+    def __init__(self, max_workers: Optional[int] = None):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self._modules: Set[str] = set()
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def preload(self, module_name: str):
+        """
+        Registers a handler module for import by worker processes started from now on.
+        """
+        self._modules.add(module_name)
+
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_preload,
+                initargs=(sorted(self._modules),)
+            )
+        return self._executor
+
+    async def warm(self):
+        loop = asyncio.get_running_loop()
+        pool = self._pool()
+        pids = await asyncio.gather(*[loop.run_in_executor(pool, _worker_pid) for _ in range(self.max_workers)])
+        logger.info("HANDLER_POOL_WARMED", {"processes": len(set(pids)), "modules": sorted(self._modules)})
+
+    async def run(self, module_name: str, task_data: Any, function: Callable = run_handler) -> Any:
+        """
+        Runs function(module_name, task_data) in a worker process: run_handler
+        for one task or run_batch_handler for a list of them.
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(self._pool(), function, module_name, task_data)
+        except BrokenProcessPool:
+            # A worker died (e.g. killed for memory); start a fresh pool for later tasks
+            logger.error("HANDLER_POOL_BROKEN", {"module": module_name})
+            self.shutdown(wait=False)
+            raise
+
+    def shutdown(self, wait: bool = True):
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait, cancel_futures=True)
+            self._executor = None
+
+# Global pool, sized by FOG_HANDLER_PROCESSES (default: CPU count)
+handler_pool = HandlerProcessPool(int(os.environ.get("FOG_HANDLER_PROCESSES", "0")) or None)
@@ -0,0 +1,106 @@
+import asyncio
+import importlib
+import inspect
+from types import ModuleType
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from fog.core.handler_pool import handler_module
+from fog.core.logging import logger
+
+Handler = Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]
+BatchHandler = Callable[[List[Dict[str, Any]]], Awaitable[List[Dict[str, Any]]]]
+
+async def warm_module(module: ModuleType):
+    """
+    Calls a handler module's optional warm() hook, which builds the heavy
+    objects its tasks share. Synchronous hooks run in a thread.
+    """
+    warm = getattr(module, "warm", None)
+    if warm is None:
+        return
+    if inspect.iscoroutinefunction(warm):
+        await warm()
+    else:
+        await asyncio.to_thread(warm)
+
+class HandlerRegistry:
+    """
+    Local agents' handle_task functions, resolved and imported once when the
+    agent is registered so dispatching a task is a dict lookup.
+    """
+    def __init__(self):
+        self._modules: Dict[str, ModuleType] = {}
+        self._handlers: Dict[str, Handler] = {}
+        # Optional handle_batch(list of packets) -> list of results, per agent
+        self._batch_handlers: Dict[str, Optional[BatchHandler]] = {}
+
+    def register(self, agent_name: str) -> Optional[Handler]:
+        """
+        Imports an agent's handler. Import errors are logged and raised again
+        by resolve() when a task needs the handler.
+        """
+        try:
+            return self.resolve(agent_name)
+        except Exception as e:
+            logger.error("HANDLER_IMPORT_FAILED", {"agent": agent_name, "error": str(e)})
+            return None
+
+    def resolve(self, agent_name: str) -> Handler:
+        handler = self._handlers.get(agent_name)
+        if handler is None:
+            module = importlib.import_module(handler_module(agent_name))
+            handler = module.handle_task
+            self._modules[agent_name] = module
+            self._handlers[agent_name] = handler
+            self._batch_handlers[agent_name] = getattr(module, "handle_batch", None)
+        return handler
+
+    def resolve_batch(self, agent_name: str) -> Optional[BatchHandler]:
+        """
+        The agent's handle_batch, or None if it only handles single tasks.
+        """
+        try:
+            self.resolve(agent_name)
+        except Exception:
+            return None
+        return self._batch_handlers.get(agent_name)
+
+    async def warm(self, agent_names: Optional[List[str]] = None):
+        """
+        Runs the warm() hooks of registered handlers, e.g. in the background at startup.
+        """
+        warmed = []
+        for agent_name in agent_names if agent_names is not None else list(self._modules):
+            module = self._modules.get(agent_name)
+            if module is None:
+                continue
+            try:
+                await warm_module(module)
+                if hasattr(module, "warm"):
+                    warmed.append(agent_name)
+            except Exception as e:
+                logger.error("HANDLER_WARM_FAILED", {"agent": agent_name, "error": str(e)})
+        logger.info("HANDLERS_WARMED", {"agents": warmed})
+
+    def reload(self, agent_name: Optional[str] = None) -> List[str]:
+        """
+        Re-imports one agent's handler module (or every registered one) so
+        code changes take effect without a restart. Returns the reloaded agents.
+        """
+        names = [agent_name] if agent_name is not None else list(self._modules)
+        reloaded = []
+        for name in names:
+            module = self._modules.get(name)
+            if module is None:
+                self._handlers.pop(name, None)
+                self.resolve(name)
+            else:
+                module = importlib.reload(module)
+                self._modules[name] = module
+                self._handlers[name] = module.handle_task
+                self._batch_handlers[name] = getattr(module, "handle_batch", None)
+            reloaded.append(name)
+        logger.info("HANDLERS_RELOADED", {"agents": reloaded})
+        return reloaded
+
+# Global handler registry
+handler_registry = HandlerRegistry()
@@ -0,0 +1,153 @@
+import math
+import os
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+from fog.models.task import TaskPacket, TaskType
+
+class LatencyWindow:
+    """
+    The most recent successful round-trip times of an agent.
+    """
+    def __init__(self, size: int = 200):
+        self._samples: Deque[float] = deque(maxlen=size)
+
+    def observe(self, rtt: float):
+        self._samples.append(rtt)
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, max(0, math.ceil(fraction * len(ordered)) - 1))]
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+class HedgePolicy:
+    """
+    Opt-in hedging for one agent: an ANALYSIS task still running after the
+    agent's percentile latency is dispatched again, to target (another
+    registered agent serving the same handler) or to the same connector.
+    """
+    def __init__(self, percentile: float = 0.95, target: Optional[str] = None):
+        self.percentile = percentile
+        self.target = target
+        self.eligible = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.primary_wins = 0
+
+class Hedger:
+    """
+    Hedge policies, latency windows and hedge statistics per agent. A hedge
+    waits until the agent has min_samples latencies, and at most max_ratio
+    of eligible tasks are hedged so slow periods do not double the load.
+    """
+    def __init__(self, min_samples: int = 20, max_ratio: float = 0.1, window: int = 200):
+        self.min_samples = min_samples
+        self.max_ratio = max_ratio
+        self.window = window
+        self.policies: Dict[str, HedgePolicy] = {}
+        self._latencies: Dict[str, LatencyWindow] = {}
+
+    def configure(self, agent: str, percentile: Optional[float], target: Optional[str] = None):
+        """
+        Enables hedging for an agent, or disables it if percentile is None.
+        """
+        if percentile is None:
+            self.policies.pop(agent, None)
+            return
+        if not 0 < percentile < 1:
+            raise ValueError(f"Hedge percentile for {agent} must be between 0 and 1")
+        policy = self.policies.get(agent)
+        if policy is None:
+            self.policies[agent] = HedgePolicy(percentile, target)
+        else:
+            policy.percentile, policy.target = percentile, target
+
+    def observe(self, agent: str, rtt: float):
+        if agent in self.policies:
+            self._latencies.setdefault(agent, LatencyWindow(self.window)).observe(rtt)
+
+    def _policy_for(self, task: TaskPacket) -> Optional[HedgePolicy]:
+        # ANALYSIS tasks are the idempotent ones that may safely run twice
+        if task.task_type != TaskType.ANALYSIS:
+            return None
+        return self.policies.get(task.system_name)
+
+    def note_eligible(self, task: TaskPacket):
+        """
+        Counts a dispatch that could be hedged towards the max_ratio budget.
+        """
+        policy = self._policy_for(task)
+        if policy is not None:
+            policy.eligible += 1
+
+    def delay(self, task: TaskPacket) -> Optional[float]:
+        """
+        Seconds after dispatch at which the task should be hedged, or None.
+        """
+        policy = self._policy_for(task)
+        if policy is None:
+            return None
+        latencies = self._latencies.get(task.system_name)
+        if latencies is None or len(latencies) < self.min_samples:
+            return None
+        return latencies.percentile(policy.percentile)
+
+    def target(self, agent: str) -> str:
+        policy = self.policies.get(agent)
+        return policy.target if policy is not None and policy.target else agent
+
+    def allow(self, agent: str) -> bool:
+        """
+        Spends one hedge from the agent's budget, if any is left.
+        """
+        policy = self.policies.get(agent)
+        if policy is None or policy.hedged + 1 > self.max_ratio * policy.eligible:
+            return False
+        policy.hedged += 1
+        return True
+
+    def record(self, agent: str, hedge_won: bool):
+        policy = self.policies.get(agent)
+        if policy is None:
+            return
+        if hedge_won:
+            policy.hedge_wins += 1
+        else:
+            policy.primary_wins += 1
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        stats = {}
+        for agent, policy in sorted(self.policies.items()):
+            latencies = self._latencies.get(agent)
+            stats[agent] = {
+                "percentile": policy.percentile,
+                "target": self.target(agent),
+                "hedge_after": latencies.percentile(policy.percentile) if latencies is not None else None,
+                "samples": len(latencies) if latencies is not None else 0,
+                "eligible": policy.eligible,
+                "hedged": policy.hedged,
+                "hedge_rate": policy.hedged / policy.eligible if policy.eligible else 0.0,
+                "hedge_wins": policy.hedge_wins,
+                "primary_wins": policy.primary_wins,
+            }
+        return stats
+
+def create_hedger() -> Hedger:
+    """
+    Hedging is enabled per agent through AgentConfig.hedge_percentile, or
+    for the comma-separated FOG_HEDGE_AGENTS at FOG_HEDGE_PERCENTILE
+    (default 0.95). FOG_HEDGE_MIN_SAMPLES and FOG_HEDGE_MAX_RATIO bound when
+    and how often tasks are hedged.
+    """
+    hedger = Hedger(
+        min_samples=int(os.environ.get("FOG_HEDGE_MIN_SAMPLES", "20")),
+        max_ratio=float(os.environ.get("FOG_HEDGE_MAX_RATIO", "0.1"))
+    )
+    percentile = float(os.environ.get("FOG_HEDGE_PERCENTILE", "0.95"))
+    for agent in os.environ.get("FOG_HEDGE_AGENTS", "").split(","):
+        if agent.strip():
+            hedger.configure(agent.strip(), percentile)
+    return hedger
@@ -0,0 +1,61 @@
+from typing import Any, Dict, Optional
+from fog.core.logging import logger
+
+class AdaptiveLimiter:
+    """
+    AIMD concurrency limit for one agent. Each success grows the limit by
+    1/limit (about +1 per round trip of a full window) while the round-trip
+    time stays within tolerance of the best observed; rising latency shrinks
+    it gently, and timeouts, failed dispatches or failures halve it.
+    """
+    def __init__(self, initial_limit: float = 10.0, min_limit: int = 1, max_limit: int = 200,
+                 tolerance: float = 2.0, latency_backoff: float = 0.9, drop_backoff: float = 0.5,
+                 smoothing: float = 0.2, baseline_decay: float = 0.001):
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.tolerance = tolerance
+        self.latency_backoff = latency_backoff
+        self.drop_backoff = drop_backoff
+        self.smoothing = smoothing
+        # Lets the no-load baseline drift up so it follows lasting capacity changes
+        self.baseline_decay = baseline_decay
+        self.in_flight = 0
+        self.rtt: Optional[float] = None
+        self.min_rtt: Optional[float] = None
+
+    @property
+    def current(self) -> int:
+        return max(self.min_limit, int(self.limit))
+
+    def on_dispatch(self):
+        self.in_flight += 1
+
+    def _finish(self):
+        self.in_flight = max(0, self.in_flight - 1)
+
+    def on_success(self, rtt: float):
+        # Only grow while the limit is actually being used
+        utilized = self.in_flight * 2 >= self.current
+        self._finish()
+        self.rtt = rtt if self.rtt is None else (1 - self.smoothing) * self.rtt + self.smoothing * rtt
+        self.min_rtt = rtt if self.min_rtt is None else min(rtt, self.min_rtt * (1 + self.baseline_decay))
+        if self.rtt > self.min_rtt * self.tolerance:
+            self.limit = max(self.min_limit, self.limit * self.latency_backoff)
+        elif utilized:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+    def on_drop(self, reason: str = "failure"):
+        self._finish()
+        previous = self.current
+        self.limit = max(self.min_limit, self.limit * self.drop_backoff)
+        logger.warning("CONCURRENCY_LIMIT_REDUCED", {"reason": reason, "from": previous, "to": self.current})
+
+    def on_cancel(self):
+        """
+        Releases a dispatch without a latency or load signal.
+        """
+        self._finish()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"limit": self.current, "in_flight": self.in_flight, "rtt": self.rtt, "min_rtt": self.min_rtt}
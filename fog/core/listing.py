@@ -0,0 +1,93 @@
+import base64
+import heapq
+import json
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from fog.core.archive import naive_local, task_time
+
+# Records are listed newest first, ordered by (timestamp, id)
+SortKey = Tuple[str, str]
+
+def sort_key(record_id: str, record: Dict[str, Any]) -> SortKey:
+    return (str(record.get("timestamp") or ""), record_id)
+
+def encode_cursor(key: SortKey) -> str:
+    return base64.urlsafe_b64encode(json.dumps(list(key)).encode("utf-8")).decode("ascii")
+
+def decode_cursor(cursor: str) -> SortKey:
+    """
+    Raises ValueError for cursors that were not produced by encode_cursor.
+    """
+    try:
+        timestamp, record_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except Exception:
+        raise ValueError(f"Invalid cursor {cursor!r}")
+    return (str(timestamp), str(record_id))
+
+def project(record: Dict[str, Any], fields: Optional[List[str]]) -> Dict[str, Any]:
+    if not fields:
+        return record
+    return {field: record[field] for field in fields if field in record}
+
+def in_range(record: Dict[str, Any], start: Optional[datetime], end: Optional[datetime]) -> bool:
+    if start is None and end is None:
+        return True
+    created = task_time(record)
+    if created is None:
+        return False
+    if start is not None and created < naive_local(start):
+        return False
+    return end is None or created < naive_local(end)
+
+def paginate(records: Iterable[Tuple[str, Dict[str, Any]]], cursor: Optional[str] = None, limit: int = 50,
+             start: Optional[datetime] = None, end: Optional[datetime] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    Returns one page of records newest first plus the cursor for the next
+    page (None on the last page). Only the page is sorted, so the cost is
+    O(n log limit) in the number of candidate records.
+    """
+    after = decode_cursor(cursor) if cursor else None
+    candidates = (
+        (sort_key(record_id, record), record) for record_id, record in records
+        if (after is None or sort_key(record_id, record) < after) and in_range(record, start, end)
+    )
+    page = heapq.nlargest(limit + 1, candidates, key=lambda item: item[0])
+    next_cursor = encode_cursor(page[limit - 1][0]) if len(page) > limit else None
+    return [record for _, record in page[:limit]], next_cursor
+
+IndexKey = Tuple[Optional[str], Optional[str]]
+
+class FieldIndex:
+    """
+    Record ids keyed by (status, owner), (status, None) and (None, owner),
+    kept in insertion order, so filtered listings of a state mapping read
+    only the matching records.
+    """
+    def __init__(self):
+        self._keys: Dict[str, IndexKey] = {}
+        self._ids: Dict[IndexKey, Dict[str, None]] = {}
+
+    def clear(self):
+        self._keys = {}
+        self._ids = {}
+
+    def add(self, record_id: str, status: Any, owner: Optional[str]):
+        new_key = (getattr(status, "value", status), owner)
+        old_key = self._keys.get(record_id)
+        if old_key == new_key:
+            return
+        if old_key is not None:
+            for key in self._lookup_keys(*old_key):
+                self._ids[key].pop(record_id, None)
+        self._keys[record_id] = new_key
+        for key in self._lookup_keys(*new_key):
+            self._ids.setdefault(key, {})[record_id] = None
+
+    @staticmethod
+    def _lookup_keys(status: Optional[str], owner: Optional[str]) -> Tuple[IndexKey, ...]:
+        return ((status, owner), (status, None), (None, owner))
+
+    def ids(self, status: Any = None, owner: Optional[str] = None) -> Dict[str, None]:
+        if status is None and owner is None:
+            return dict.fromkeys(self._keys)
+        return self._ids.get((getattr(status, "value", status), owner), {})
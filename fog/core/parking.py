@@ -0,0 +1,39 @@
+import asyncio
+from typing import Dict, List, Optional, Tuple
+from fog.models.task import TaskPacket
+from fog.core.logging import logger
+
+class ParkingLot:
+    """
+    Tasks waiting on a human approval. They are kept out of the run queue
+    and resumed when the approval is decided, so no worker waits on people.
+    """
+    def __init__(self):
+        # task_id -> (task, approval timeout timer)
+        self._parked: Dict[str, Tuple[TaskPacket, Optional[asyncio.TimerHandle]]] = {}
+
+    def park(self, task: TaskPacket, timer: Optional[asyncio.TimerHandle] = None):
+        previous = self._parked.get(task.task_id)
+        if previous is not None and previous[1] is not None:
+            previous[1].cancel()
+        self._parked[task.task_id] = (task, timer)
+        logger.info("TASK_PARKED_FOR_APPROVAL", {"task_id": task.task_id, "parked": len(self._parked)})
+
+    def unpark(self, task_id: str) -> Optional[TaskPacket]:
+        entry = self._parked.pop(task_id, None)
+        if entry is None:
+            return None
+        task, timer = entry
+        if timer is not None:
+            timer.cancel()
+        return task
+
+    def task_ids(self) -> List[str]:
+        return list(self._parked)
+
+    def clear(self):
+        for task_id in self.task_ids():
+            self.unpark(task_id)
+
+    def __len__(self) -> int:
+        return len(self._parked)
@@ -1,25 +1,388 @@
 import asyncio
-from typing import Any, Dict, Optional
+import heapq
+import itertools
+import os
+import time
+from collections import Counter, deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
 from fog.models.task import TaskPacket
+from fog.core.queue_journal import QueueJournal, HELD
 from fog.core.logging import logger
 
 class TaskQueue:
+    # Optional callable giving an agent's current adaptive concurrency limit
+    limit_source: Optional[Callable[[str], Optional[int]]] = None
+    # Optional journal that makes queued and running tasks survive restarts
+    journal: Optional[QueueJournal] = None
+
     def __init__(self):
-        self.queue = asyncio.Queue()
+        self.queue = self._new_queue()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        # Queued tasks per priority level
+        self._depths: Counter = Counter()
+        # Queued tasks per agent
+        self._agent_depths: Counter = Counter()
+        # task_id -> enqueue time, oldest first
+        self._enqueued_at: Dict[str, float] = {}
+
+    def _new_queue(self) -> asyncio.Queue:
+        return asyncio.Queue()
+
+    def _entry(self, task: TaskPacket) -> Any:
+        return task
+
+    @staticmethod
+    def _task(entry: Any) -> TaskPacket:
+        return entry
+
+    def _bind_loop(self):
+        # asyncio queues bind to the loop that first waits on them; carry the
+        # queued tasks over when the engine is restarted on a new loop
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            if self._loop is not None:
+                previous, self.queue = self.queue, self._new_queue()
+                while not previous.empty():
+                    self.queue.put_nowait(previous.get_nowait())
+            self._loop = loop
+
+    def _track_enqueue(self, task: TaskPacket):
+        if self.journal is not None:
+            self.journal.put(task)
+        self._count_enqueue(task)
+
+    def _count_enqueue(self, task: TaskPacket):
+        self._depths[task.priority] += 1
+        self._agent_depths[task.system_name] += 1
+        self._enqueued_at.pop(task.task_id, None)
+        self._enqueued_at[task.task_id] = time.monotonic()
+
+    def _track_dequeue(self, task: TaskPacket) -> float:
+        """
+        Updates the metrics for a dequeued task and returns how long it waited.
+        """
+        if self.journal is not None:
+            self.journal.lease(task.task_id)
+        self._depths[task.priority] -= 1
+        if not self._depths[task.priority]:
+            del self._depths[task.priority]
+        self._agent_depths[task.system_name] -= 1
+        if not self._agent_depths[task.system_name]:
+            del self._agent_depths[task.system_name]
+        enqueued_at = self._enqueued_at.pop(task.task_id, None)
+        return time.monotonic() - enqueued_at if enqueued_at is not None else 0.0
 
     async def enqueue(self, task: TaskPacket):
-        await self.queue.put(task)
-        logger.info("TASK_ENQUEUED", {"task_id": task.task_id})
+        self._bind_loop()
+        self._track_enqueue(task)
+        await self.queue.put(self._entry(task))
+        logger.info("TASK_ENQUEUED", {"task_id": task.task_id, "priority": task.priority})
+
+    async def enqueue_many(self, tasks: List[TaskPacket]):
+        """
+        Enqueues tasks in one step: they are journaled together and no
+        worker can dequeue before the whole batch is queued.
+        """
+        self._bind_loop()
+        if self.journal is not None:
+            self.journal.put_many(tasks)
+        for task in tasks:
+            self._count_enqueue(task)
+            self.queue.put_nowait(self._entry(task))
+        logger.info("TASKS_ENQUEUED", {"count": len(tasks)})
 
     async def dequeue(self) -> TaskPacket:
-        task = await self.queue.get()
+        self._bind_loop()
+        task = self._task(await self.queue.get())
+        self._track_dequeue(task)
         return task
 
+    def oldest_wait(self) -> float:
+        """
+        Seconds the longest-waiting queued task has been waiting.
+        """
+        for enqueued_at in self._enqueued_at.values():
+            return time.monotonic() - enqueued_at
+        return 0.0
+
     def task_done(self):
         self.queue.task_done()
 
     def size(self) -> int:
         return self.queue.qsize()
 
+    def depths(self) -> Dict[int, int]:
+        """
+        Number of queued tasks per priority level, highest priority first.
+        """
+        return dict(sorted(self._depths.items(), reverse=True))
+
+    def agent_depth(self, agent: str) -> int:
+        return self._agent_depths.get(agent, 0)
+
+    def take(self, agent: str, limit: int, predicate: Optional[Callable[[TaskPacket], bool]] = None) -> List[TaskPacket]:
+        """
+        Dequeues up to limit more queued tasks of one agent matching predicate,
+        for queues that can pick per agent (used to form micro-batches).
+        """
+        return []
+
+    def release(self, task: TaskPacket):
+        """
+        Called by the engine when a dequeued task stops occupying its agent.
+        """
+
+    def claim(self, task: TaskPacket):
+        """
+        Counts a task that is running without having been dequeued (one
+        recovered after a restart) against its agent, until it is released.
+        """
+
+    def defer(self, task: TaskPacket):
+        """
+        Journals a task that is accepted but held back, e.g. for its dependencies.
+        """
+        if self.journal is not None:
+            self.journal.put(task, HELD)
+
+    def ack(self, task_id: str):
+        """
+        Called by the engine when a task is COMPLETED or FAILED.
+        """
+        if self.journal is not None:
+            self.journal.ack(task_id)
+
+    def recover(self) -> List[Tuple[Dict[str, Any], str, Optional[float]]]:
+        """
+        Tasks journaled but never acknowledged by a process that is gone
+        (including this one's previous run), in submission order.
+        """
+        return self.journal.entries() if self.journal is not None else []
+
+    def renew(self):
+        """
+        Keeps this process's journaled tasks from being claimed by others.
+        """
+        if self.journal is not None:
+            self.journal.renew(force=False)
+
+    def close(self):
+        if self.journal is not None:
+            self.journal.close()
+
+    def configure_agent(self, agent: str, max_in_flight: Optional[int] = None, weight: int = 1):
+        """
+        Sets an agent's concurrency limit and scheduling weight, for queues
+        that schedule per agent.
+        """
+
+    def agent_stats(self) -> Dict[str, Dict[str, Any]]:
+        return {}
+
+class PriorityTaskQueue(TaskQueue):
+    """
+    Dequeues higher TaskPacket.priority first and FIFO within a level. A task
+    gains one priority level for every aging_interval seconds it waits, so
+    low-priority work is not starved by a steady stream of urgent tasks.
+    """
+    def __init__(self, aging_interval: Optional[float] = 30.0):
+        self.aging_interval = aging_interval
+        self._sequence = itertools.count()
+        super().__init__()
+
+    def _new_queue(self) -> asyncio.Queue:
+        return asyncio.PriorityQueue()
+
+    def _entry(self, task: TaskPacket) -> Any:
+        # Every queued task ages at the same rate, so ordering by
+        # enqueue_time / aging_interval - priority matches ordering by the
+        # aged priority at any later moment
+        rank = -task.priority
+        if self.aging_interval:
+            rank += time.monotonic() / self.aging_interval
+        return (rank, next(self._sequence), task)
+
+    @staticmethod
+    def _task(entry: Any) -> TaskPacket:
+        return entry[2]
+
+class FairTaskQueue(PriorityTaskQueue):
+    """
+    Bulkheads: one sub-queue per agent (TaskPacket.system_name), each in
+    priority order with aging. Agents take turns by smooth weighted round
+    robin, and an agent at its max_in_flight limit is skipped until the
+    engine releases one of its tasks, so a slow agent cannot hold up others.
+    """
+    def __init__(self, aging_interval: Optional[float] = 30.0, default_max_in_flight: Optional[int] = None):
+        super().__init__(aging_interval)
+        self.default_max_in_flight = default_max_in_flight
+        self._agent_queues: Dict[str, List[Tuple[float, int, TaskPacket]]] = {}
+        self._limits: Dict[str, Optional[int]] = {}
+        self._weights: Dict[str, int] = {}
+        self._current: Dict[str, int] = {}
+        self._in_flight: Counter = Counter()
+        # agent -> [dequeued tasks, total seconds waited, longest wait]
+        self._waits: Dict[str, List[float]] = {}
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    def configure_agent(self, agent: str, max_in_flight: Optional[int] = None, weight: int = 1):
+        self._limits[agent] = max_in_flight
+        self._weights[agent] = max(1, weight)
+        logger.info("AGENT_BULKHEAD_CONFIGURED", {"agent": agent, "max_in_flight": max_in_flight, "weight": weight})
+        self._wake()
+
+    def _limit(self, agent: str) -> Optional[int]:
+        # The tighter of the configured bulkhead and the agent's adaptive limit
+        limits = [self._limits.get(agent, self.default_max_in_flight),
+                  self.limit_source(agent) if self.limit_source is not None else None]
+        limits = [limit for limit in limits if limit is not None]
+        return min(limits) if limits else None
+
+    async def enqueue(self, task: TaskPacket):
+        heapq.heappush(self._agent_queues.setdefault(task.system_name, []), self._entry(task))
+        self._track_enqueue(task)
+        logger.info("TASK_ENQUEUED", {"task_id": task.task_id, "priority": task.priority, "agent": task.system_name})
+        self._wake()
+
+    async def enqueue_many(self, tasks: List[TaskPacket]):
+        if self.journal is not None:
+            self.journal.put_many(tasks)
+        for task in tasks:
+            heapq.heappush(self._agent_queues.setdefault(task.system_name, []), self._entry(task))
+            self._count_enqueue(task)
+        logger.info("TASKS_ENQUEUED", {"count": len(tasks)})
+        self._wake()
+
+    async def dequeue(self) -> TaskPacket:
+        while True:
+            task = self._pick()
+            if task is not None:
+                return task
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            finally:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+
+    def _pick(self) -> Optional[TaskPacket]:
+        eligible = [agent for agent, entries in self._agent_queues.items()
+                    if self._limit(agent) is None or self._in_flight[agent] < self._limit(agent)]
+        if not eligible:
+            return None
+        total = 0
+        for agent in eligible:
+            weight = self._weights.get(agent, 1)
+            self._current[agent] = self._current.get(agent, 0) + weight
+            total += weight
+        agent = max(eligible, key=self._current.get)
+        self._current[agent] -= total
+
+        entries = self._agent_queues[agent]
+        task = self._task(heapq.heappop(entries))
+        if not entries:
+            del self._agent_queues[agent]
+            self._current.pop(agent, None)
+        self._note_dequeue(agent, task)
+        return task
+
+    def _note_dequeue(self, agent: str, task: TaskPacket):
+        self._in_flight[agent] += 1
+        waited = self._track_dequeue(task)
+        stats = self._waits.setdefault(agent, [0, 0.0, 0.0])
+        stats[0] += 1
+        stats[1] += waited
+        stats[2] = max(stats[2], waited)
+
+    def take(self, agent: str, limit: int, predicate: Optional[Callable[[TaskPacket], bool]] = None) -> List[TaskPacket]:
+        entries = self._agent_queues.get(agent)
+        if not entries:
+            return []
+        cap = self._limit(agent)
+        if cap is not None:
+            limit = min(limit, cap - self._in_flight[agent])
+        taken, skipped = [], []
+        while entries and len(taken) < limit:
+            entry = heapq.heappop(entries)
+            task = self._task(entry)
+            if predicate is None or predicate(task):
+                taken.append(task)
+            else:
+                skipped.append(entry)
+        for entry in skipped:
+            heapq.heappush(entries, entry)
+        if not entries:
+            del self._agent_queues[agent]
+            self._current.pop(agent, None)
+        for task in taken:
+            self._note_dequeue(agent, task)
+        return taken
+
+    def _wake(self):
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done() and not waiter.get_loop().is_closed():
+                waiter.set_result(None)
+
+    def claim(self, task: TaskPacket):
+        self._in_flight[task.system_name] += 1
+
+    def release(self, task: TaskPacket):
+        agent = task.system_name
+        if self._in_flight[agent] > 0:
+            self._in_flight[agent] -= 1
+            self._wake()
+
+    def task_done(self):
+        pass
+
+    def size(self) -> int:
+        return sum(len(entries) for entries in self._agent_queues.values())
+
+    def agent_stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Queue depth, in-flight count, limits and wait times per agent.
+        """
+        agents = set(self._agent_queues) | set(self._waits) | {a for a, n in self._in_flight.items() if n}
+        stats = {}
+        for agent in sorted(agents):
+            dequeued, total_wait, max_wait = self._waits.get(agent, [0, 0.0, 0.0])
+            stats[agent] = {
+                "queued": len(self._agent_queues.get(agent, ())),
+                "in_flight": self._in_flight[agent],
+                "max_in_flight": self._limit(agent),
+                "weight": self._weights.get(agent, 1),
+                "avg_wait": total_wait / dequeued if dequeued else 0.0,
+                "max_wait": max_wait,
+            }
+        return stats
+
+def create_task_queue() -> TaskQueue:
+    """
+    Builds the queue selected by FOG_TASK_QUEUE: "fair" (default, per-agent
+    bulkheads), "priority" or "fifo". Aging comes from FOG_QUEUE_AGING_SECONDS
+    (seconds of waiting worth one priority level; 0 disables aging) and the
+    fair queue's limit for agents without one from FOG_AGENT_MAX_IN_FLIGHT.
+    FOG_QUEUE_BACKEND=sqlite journals the queue to FOG_QUEUE_PATH with leases
+    of FOG_QUEUE_VISIBILITY_TIMEOUT seconds, so tasks survive restarts.
+    """
+    kind = os.environ.get("FOG_TASK_QUEUE", "fair").lower()
+    aging = float(os.environ.get("FOG_QUEUE_AGING_SECONDS", "30"))
+    if kind == "priority":
+        queue = PriorityTaskQueue(aging_interval=aging if aging > 0 else None)
+    elif kind == "fair":
+        default_limit = int(os.environ.get("FOG_AGENT_MAX_IN_FLIGHT", "0"))
+        queue = FairTaskQueue(aging_interval=aging if aging > 0 else None,
+                              default_max_in_flight=default_limit if default_limit > 0 else None)
+    else:
+        queue = TaskQueue()
+    if os.environ.get("FOG_QUEUE_BACKEND", "memory").lower() == "sqlite":
+        queue.journal = QueueJournal(
+            os.environ.get("FOG_QUEUE_PATH", "storage/queue.db"),
+            visibility_timeout=float(os.environ.get("FOG_QUEUE_VISIBILITY_TIMEOUT", "300"))
+        )
+    return queue
+
 # Global task queue instance
-task_queue = TaskQueue()
+task_queue = create_task_queue()
@@ -0,0 +1,163 @@
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+from fog.models.task import TaskPacket
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS queue (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    task_id TEXT NOT NULL UNIQUE,
+    agent TEXT,
+    priority INTEGER NOT NULL DEFAULT 0,
+    state TEXT NOT NULL,
+    leased_until REAL,
+    deliveries INTEGER NOT NULL DEFAULT 0,
+    data TEXT NOT NULL,
+    owner TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_queue_state ON queue(state);
+CREATE TABLE IF NOT EXISTS owners (
+    owner TEXT PRIMARY KEY,
+    heartbeat REAL NOT NULL
+);
+"""
+
+# Entry states: waiting on dependencies, queued, or handed to a worker
+HELD = "held"
+READY = "ready"
+LEASED = "leased"
+
+class QueueJournal:
+    """
+    SQLite journal behind a task queue. A task is written when it is
+    accepted, leased when a worker takes it and deleted only when it is
+    acknowledged as COMPLETED or FAILED, so every task not acknowledged
+    before a crash is found again by entries() (at-least-once delivery).
+    Rows keep their original sequence number when rewritten, so recovery
+    preserves submission order.
+
+    Several gateway processes may share one journal. Each row belongs to
+    the process that wrote it, and renew() keeps that owner's heartbeat and
+    leases fresh. entries() only hands out rows whose owner closed the
+    journal or missed its heartbeat for visibility_timeout seconds, so a
+    process never re-drives tasks that a live process still holds.
+    """
+    def __init__(self, storage_path: str = "storage/queue.db", visibility_timeout: float = 300.0):
+        self.storage_path = storage_path
+        self.visibility_timeout = visibility_timeout
+        self.lock = threading.Lock()
+        directory = os.path.dirname(storage_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(storage_path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(queue)")]
+        if "owner" not in columns:
+            # Journals written before rows had owners; such rows are orphans
+            self._conn.execute("ALTER TABLE queue ADD COLUMN owner TEXT")
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._renewed_at = 0.0
+        self.renew()
+
+    def put(self, task: TaskPacket, state: str = READY):
+        self.put_many([task], state)
+
+    def put_many(self, tasks: List[TaskPacket], state: str = READY):
+        """
+        Writes several tasks in one transaction.
+        """
+        rows = [(task.task_id, task.system_name, task.priority, state,
+                 json.dumps(task.model_dump(mode='json'), separators=(",", ":")), self.owner) for task in tasks]
+        with self.lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany(
+                    "INSERT INTO queue (task_id, agent, priority, state, data, owner) VALUES (?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT(task_id) DO UPDATE SET agent = excluded.agent, priority = excluded.priority, "
+                    "state = excluded.state, leased_until = NULL, data = excluded.data, owner = excluded.owner",
+                    rows
+                )
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def lease(self, task_id: str, seconds: Optional[float] = None):
+        """
+        Marks a task as taken by a worker until the lease runs out.
+        """
+        leased_until = time.time() + (seconds if seconds is not None else self.visibility_timeout)
+        with self.lock:
+            self._conn.execute(
+                "UPDATE queue SET state = ?, leased_until = ?, deliveries = deliveries + 1, owner = ? "
+                "WHERE task_id = ?",
+                (LEASED, leased_until, self.owner, task_id)
+            )
+
+    def renew(self, force: bool = True):
+        """
+        Refreshes this process's heartbeat and extends its leases. With
+        force=False it does nothing until a quarter of the timeout has passed.
+        """
+        now = time.time()
+        if not force and now - self._renewed_at < self.visibility_timeout / 4:
+            return
+        with self.lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(
+                    "INSERT INTO owners (owner, heartbeat) VALUES (?, ?) "
+                    "ON CONFLICT(owner) DO UPDATE SET heartbeat = excluded.heartbeat",
+                    (self.owner, now)
+                )
+                self._conn.execute("UPDATE queue SET leased_until = ? WHERE owner = ? AND state = ?",
+                                   (now + self.visibility_timeout, self.owner, LEASED))
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+        self._renewed_at = now
+
+    def ack(self, task_id: str):
+        with self.lock:
+            self._conn.execute("DELETE FROM queue WHERE task_id = ?", (task_id,))
+
+    def entries(self) -> List[Tuple[Dict[str, Any], str, Optional[float]]]:
+        """
+        Claims the unacknowledged tasks of processes that are gone and
+        returns them in submission order as (task data, state, lease expiry).
+        """
+        with self.lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute("DELETE FROM owners WHERE heartbeat < ? AND owner != ?",
+                                   (time.time() - self.visibility_timeout, self.owner))
+                orphaned = "owner IS NULL OR owner NOT IN (SELECT owner FROM owners)"
+                rows = self._conn.execute(
+                    f"SELECT data, state, leased_until FROM queue WHERE {orphaned} ORDER BY seq"
+                ).fetchall()
+                self._conn.execute(f"UPDATE queue SET owner = ? WHERE {orphaned}", (self.owner,))
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+        return [(json.loads(data), state, leased_until) for data, state, leased_until in rows]
+
+    def counts(self) -> Dict[str, int]:
+        with self.lock:
+            return dict(self._conn.execute("SELECT state, COUNT(*) FROM queue GROUP BY state").fetchall())
+
+    def close(self):
+        with self.lock:
+            if self._conn is not None:
+                # The rows left behind become orphans for the next process to claim
+                self._conn.execute("DELETE FROM owners WHERE owner = ?", (self.owner,))
+                self._conn.close()
+                self._conn = None
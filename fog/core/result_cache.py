@@ -0,0 +1,129 @@
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from fog.models.task import TaskPacket, TaskType
+
+# Agents whose ANALYSIS results depend only on the payload and the files it names
+DEFAULT_CACHEABLE_AGENTS = ("StructureAnalyzer", "SecurityAnalyzer", "CodeQuality", "DependencyGraph",
+                            "LogicSummarizer", "SemanticTagger")
+# Payload keys naming files or directories the agent reads
+PATH_KEYS = ("project_path", "file_path")
+SKIPPED_DIRS = {".git", "__pycache__"}
+
+def fingerprint_path(path: str) -> Optional[str]:
+    """
+    Hash of the relative path, size and modification time of every file
+    under path (or of path itself). None if it does not exist.
+    """
+    digest = hashlib.sha256()
+    if os.path.isfile(path):
+        stat = os.stat(path)
+        digest.update(f"{stat.st_size}:{stat.st_mtime_ns}".encode())
+        return digest.hexdigest()
+    if not os.path.isdir(path):
+        return None
+    for root, dirs, files in os.walk(path):
+        dirs[:] = sorted(d for d in dirs if d not in SKIPPED_DIRS)
+        for name in sorted(files):
+            full_path = os.path.join(root, name)
+            try:
+                stat = os.stat(full_path)
+            except OSError:
+                continue
+            digest.update(f"{os.path.relpath(full_path, path)}:{stat.st_size}:{stat.st_mtime_ns}\n".encode())
+    return digest.hexdigest()
+
+class ResultCache:
+    """
+    LRU cache of ANALYSIS results keyed by agent, normalized payload and a
+    fingerprint of the files the payload references, so a result is reused
+    only while those files are unchanged. Entries expire after ttl seconds.
+    """
+    def __init__(self, max_entries: int = 1000, ttl: float = 3600.0,
+                 agents: Iterable[str] = DEFAULT_CACHEABLE_AGENTS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.agents = set(agents)
+        # key -> (expiry, result, task_id that produced it)
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any], str]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def key_for(self, task: TaskPacket, fingerprints: Optional[Dict[str, Optional[str]]] = None) -> Optional[str]:
+        """
+        Cache key of a task, or None if its result must not be cached.
+        fingerprints memoizes path fingerprints across calls, e.g. for a batch.
+        """
+        if (not self.max_entries or task.task_type != TaskType.ANALYSIS
+                or task.system_name not in self.agents or task.dependencies):
+            return None
+        digest = hashlib.sha256(task.system_name.encode())
+        digest.update(json.dumps(task.payload, sort_keys=True, separators=(",", ":"), default=str).encode())
+        for key in PATH_KEYS:
+            path = task.payload.get(key)
+            if not isinstance(path, str):
+                continue
+            path = os.path.abspath(path)
+            if fingerprints is not None and path in fingerprints:
+                fingerprint = fingerprints[path]
+            else:
+                fingerprint = fingerprint_path(path)
+                if fingerprints is not None:
+                    fingerprints[path] = fingerprint
+            if fingerprint is None:
+                # Missing inputs give error results worth retrying
+                return None
+            digest.update(fingerprint.encode())
+        return digest.hexdigest()
+
+    def keys_for(self, tasks: List[TaskPacket]) -> List[Optional[str]]:
+        """
+        Cache keys of several tasks, fingerprinting each referenced path once.
+        """
+        fingerprints: Dict[str, Optional[str]] = {}
+        return [self.key_for(task, fingerprints) for task in tasks]
+
+    def get(self, key: str) -> Optional[Tuple[Dict[str, Any], str]]:
+        """
+        Returns (result, producing task_id) for a live entry.
+        """
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1], entry[2]
+
+    def put(self, key: str, task_id: str, result: Optional[Dict[str, Any]]):
+        if not self.max_entries or not isinstance(result, dict) or "error" in result:
+            return
+        self._entries[key] = (time.monotonic() + self.ttl, result, task_id)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"entries": len(self._entries), "max_entries": self.max_entries, "hits": self.hits,
+                "misses": self.misses}
+
+def create_result_cache() -> ResultCache:
+    """
+    Size from FOG_RESULT_CACHE_SIZE (0 disables caching), lifetime from
+    FOG_RESULT_CACHE_TTL seconds and cacheable agents from the comma-separated
+    FOG_RESULT_CACHE_AGENTS.
+    """
+    agents = os.environ.get("FOG_RESULT_CACHE_AGENTS")
+    return ResultCache(
+        max_entries=int(os.environ.get("FOG_RESULT_CACHE_SIZE", "1000")),
+        ttl=float(os.environ.get("FOG_RESULT_CACHE_TTL", "3600")),
+        agents=[a.strip() for a in agents.split(",") if a.strip()] if agents is not None else DEFAULT_CACHEABLE_AGENTS
+    )
@@ -0,0 +1,125 @@
+import asyncio
+import heapq
+import itertools
+import os
+import random
+import time
+from collections import defaultdict, deque
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+from fog.models.task import TaskPacket
+
+class RetryPolicy:
+    """
+    Exponential backoff: the n-th retry waits base_delay * multiplier**(n-1)
+    seconds, capped at max_delay, minus up to jitter of that delay at random
+    so retries from many failing tasks do not arrive in lockstep.
+    """
+    def __init__(self, base_delay: float = 2.0, multiplier: float = 2.0, max_delay: float = 120.0,
+                 jitter: float = 0.5):
+        self.base_delay = base_delay
+        self.multiplier = multiplier
+        self.max_delay = max_delay
+        self.jitter = jitter
+
+    def delay(self, attempt: int) -> float:
+        delay = min(self.max_delay, self.base_delay * self.multiplier ** max(0, attempt - 1))
+        return delay - random.uniform(0, self.jitter * delay)
+
+# Retry policies per error class, see classify_error
+DEFAULT_RETRY_POLICIES: Dict[str, RetryPolicy] = {
+    "timeout": RetryPolicy(base_delay=5.0, max_delay=300.0),
+    "dispatch": RetryPolicy(base_delay=1.0, max_delay=60.0),
+    "agent_disabled": RetryPolicy(base_delay=30.0, max_delay=600.0),
+    "default": RetryPolicy(),
+}
+
+def classify_error(error_message: str) -> str:
+    message = error_message.lower()
+    if "timed out" in message or "timeout" in message:
+        return "timeout"
+    if "failed to send" in message:
+        return "dispatch"
+    if "disabled" in message:
+        return "agent_disabled"
+    return "default"
+
+class RetryBudget:
+    """
+    Allows at most max_retries retries per agent within a sliding window of
+    window seconds, so a flapping agent is not kept busy with retries.
+    """
+    def __init__(self, max_retries: int = 30, window: float = 60.0):
+        self.max_retries = max_retries
+        self.window = window
+        self._spent: Dict[str, Deque[float]] = defaultdict(deque)
+
+    def allow(self, agent: str) -> bool:
+        now = time.monotonic()
+        spent = self._spent[agent]
+        while spent and spent[0] <= now - self.window:
+            spent.popleft()
+        if len(spent) >= self.max_retries:
+            return False
+        spent.append(now)
+        return True
+
+def create_retry_budget() -> RetryBudget:
+    """
+    Builds the per-agent retry budget from FOG_RETRY_BUDGET (retries per
+    agent per window) and FOG_RETRY_BUDGET_WINDOW (seconds).
+    """
+    return RetryBudget(
+        max_retries=int(os.environ.get("FOG_RETRY_BUDGET", "30")),
+        window=float(os.environ.get("FOG_RETRY_BUDGET_WINDOW", "60"))
+    )
+
+class DelayedTasks:
+    """
+    Tasks waiting for their retry time, kept in a heap ordered by due time
+    with a single loop timer armed for the earliest one.
+    """
+    def __init__(self, on_due: Callable[[TaskPacket], None]):
+        self._on_due = on_due
+        self._heap: List[Tuple[float, int, TaskPacket]] = []
+        self._sequence = itertools.count()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    def schedule(self, task: TaskPacket, delay: float):
+        heapq.heappush(self._heap, (time.monotonic() + delay, next(self._sequence), task))
+        self.resume()
+
+    def resume(self):
+        """
+        Arms the timer on the running loop, e.g. after the engine restarted.
+        """
+        self._loop = asyncio.get_running_loop()
+        self._arm()
+
+    def suspend(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def _arm(self):
+        self.suspend()
+        if self._heap and self._loop is not None and not self._loop.is_closed():
+            self._timer = self._loop.call_later(max(0.0, self._heap[0][0] - time.monotonic()), self._fire)
+
+    def _fire(self):
+        self._timer = None
+        now = time.monotonic()
+        while self._heap and self._heap[0][0] <= now:
+            _, _, task = heapq.heappop(self._heap)
+            self._on_due(task)
+        self._arm()
+
+    def pending(self) -> Dict[str, float]:
+        """
+        Seconds until each waiting task is due, by task_id.
+        """
+        now = time.monotonic()
+        return {task.task_id: max(0.0, due - now) for due, _, task in sorted(self._heap)}
+
+    def __len__(self) -> int:
+        return len(self._heap)
@@ -0,0 +1,116 @@
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Set, Tuple
+from fog.models.task import TaskPacket, TaskStatus
+from fog.core.state import state_store, status_of
+from fog.core.logging import logger
+
+def validate_graph(tasks: List[TaskPacket]) -> List[TaskPacket]:
+    """
+    Checks that a task graph has unique ids, no cycles, and only depends on
+    tasks in the graph or already known to the state store. Returns the tasks
+    in topological order; raises ValueError otherwise.
+    """
+    by_id: Dict[str, TaskPacket] = {}
+    for task in tasks:
+        if task.task_id in by_id:
+            raise ValueError(f"Duplicate task_id {task.task_id}")
+        by_id[task.task_id] = task
+
+    for task in tasks:
+        for dependency in task.dependencies:
+            if dependency not in by_id and state_store.get_task(dependency) is None:
+                raise ValueError(f"Task {task.task_id} depends on unknown task {dependency}")
+
+    ordered: List[TaskPacket] = []
+    placed: Set[str] = set()
+    remaining = list(tasks)
+    while remaining:
+        ready = [task for task in remaining
+                 if all(dep in placed or dep not in by_id for dep in task.dependencies)]
+        if not ready:
+            raise ValueError(f"Dependency cycle among tasks {[task.task_id for task in remaining]}")
+        ordered.extend(ready)
+        placed.update(task.task_id for task in ready)
+        remaining = [task for task in remaining if task.task_id not in placed]
+    return ordered
+
+class DependencyScheduler:
+    """
+    Holds tasks until every task in TaskPacket.dependencies has completed.
+    Results of completed prerequisites are copied into the dependent's
+    dependency_results before it is released.
+    """
+    def __init__(self):
+        self._held: Dict[str, TaskPacket] = {}
+        # Held task -> prerequisites it still waits for
+        self._blockers: Dict[str, Set[str]] = {}
+        # Prerequisite -> held tasks waiting for it
+        self._dependents: Dict[str, Set[str]] = defaultdict(set)
+
+    def add(self, task: TaskPacket) -> Optional[str]:
+        """
+        Registers a task. Returns an error if a prerequisite already failed or
+        does not exist; otherwise the task is either ready (is_held is False)
+        or held until its prerequisites complete.
+        """
+        waiting = set()
+        for dependency in task.dependencies:
+            if dependency in self._held:
+                waiting.add(dependency)
+                continue
+            dependency_data = state_store.get_task(dependency)
+            if dependency_data is None:
+                return f"Dependency {dependency} not found"
+            status = status_of(dependency_data)
+            if status == TaskStatus.FAILED.value:
+                return f"Dependency {dependency} failed"
+            if status == TaskStatus.COMPLETED.value:
+                task.dependency_results[dependency] = dependency_data.get("result")
+            else:
+                waiting.add(dependency)
+
+        if waiting:
+            self._held[task.task_id] = task
+            self._blockers[task.task_id] = waiting
+            for dependency in waiting:
+                self._dependents[dependency].add(task.task_id)
+            logger.info("TASK_HELD_FOR_DEPENDENCIES", {"task_id": task.task_id, "waiting_for": sorted(waiting)})
+        return None
+
+    def is_held(self, task_id: str) -> bool:
+        return task_id in self._held
+
+    def held_count(self) -> int:
+        return len(self._held)
+
+    def complete(self, task_id: str, status: str, result: Optional[Dict[str, Any]]) -> Tuple[List[TaskPacket], List[TaskPacket]]:
+        """
+        Records that task_id finished. Returns the held tasks that are now
+        ready and those that can never run because task_id failed.
+        """
+        ready: List[TaskPacket] = []
+        orphaned: List[TaskPacket] = []
+        for dependent_id in self._dependents.pop(task_id, ()):
+            dependent = self._held.get(dependent_id)
+            if dependent is None:
+                continue
+            if status != TaskStatus.COMPLETED.value:
+                self._release(dependent_id)
+                orphaned.append(dependent)
+                continue
+            dependent.dependency_results[task_id] = result
+            blockers = self._blockers[dependent_id]
+            blockers.discard(task_id)
+            if not blockers:
+                self._release(dependent_id)
+                ready.append(dependent)
+        return ready, orphaned
+
+    def _release(self, task_id: str):
+        self._held.pop(task_id, None)
+        for dependency in self._blockers.pop(task_id, ()):
+            waiting = self._dependents.get(dependency)
+            if waiting is not None:
+                waiting.discard(task_id)
+                if not waiting:
+                    del self._dependents[dependency]
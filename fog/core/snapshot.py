@@ -0,0 +1,326 @@
+import json
+import os
+import struct
+import threading
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from fog.core.logging import logger
+from fog.core.state import StateStore, TaskTable, dumps_compact, status_of
+
+# File layout: MAGIC, length-prefixed records (control plane, then one per
+# task), a length-prefixed index of [task_id, offset, summary] entries, then
+# the footer. The summary holds the fields the task indexes and aggregates
+# need, so they can be built without reading task records. Snapshots written
+# before summaries existed have [task_id, offset] entries.
+MAGIC = b"FOGSNAP1"
+RECORD_LENGTH = struct.Struct(">I")
+# control record offset, index record offset, MAGIC
+FOOTER = struct.Struct(">QQ8s")
+# Control key numbering snapshot rewrites; a delta only applies to its generation
+GENERATION_KEY = "snapshot_generation"
+
+def task_summary(task_data: Dict[str, Any]) -> Dict[str, Any]:
+    task_type = task_data.get("task_type")
+    return {"status": status_of(task_data), "system_name": task_data.get("system_name"),
+            "task_type": getattr(task_type, "value", task_type), "retries": task_data.get("retries", 0) or 0}
+
+def write_snapshot(path: str, control: Dict[str, Any], tasks: Iterable[Tuple[str, bytes, Optional[Dict[str, Any]]]]):
+    """
+    Writes a snapshot atomically. Tasks are (task_id, payload, summary)
+    triples; payloads are passed pre-encoded so callers can reuse encodings
+    of tasks that did not change.
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+
+        def write_record(payload: bytes) -> int:
+            offset = f.tell()
+            f.write(RECORD_LENGTH.pack(len(payload)))
+            f.write(payload)
+            return offset
+
+        control_offset = write_record(dumps_compact(control).encode("utf-8"))
+        index = [[task_id, write_record(payload)] + ([] if summary is None else [summary])
+                 for task_id, payload, summary in tasks]
+        index_offset = write_record(dumps_compact(index).encode("utf-8"))
+        f.write(FOOTER.pack(control_offset, index_offset, MAGIC))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+class SnapshotReader:
+    """
+    Random access to a snapshot: the control plane and the task index (with
+    per-task summaries, None for older snapshots) are read up front, task
+    records only when asked for.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        if self._file.read(len(MAGIC)) != MAGIC:
+            self._file.close()
+            raise ValueError(f"{path} is not a FOG state snapshot")
+        self._file.seek(-FOOTER.size, os.SEEK_END)
+        control_offset, index_offset, magic = FOOTER.unpack(self._file.read(FOOTER.size))
+        if magic != MAGIC:
+            self._file.close()
+            raise ValueError(f"{path} is truncated")
+        self.control: Dict[str, Any] = json.loads(self._read_at(control_offset))
+        self.index: Dict[str, int] = {}
+        self.summaries: Dict[str, Optional[Dict[str, Any]]] = {}
+        for entry in json.loads(self._read_at(index_offset)):
+            self.index[entry[0]] = entry[1]
+            self.summaries[entry[0]] = entry[2] if len(entry) > 2 else None
+
+    def _read_at(self, offset: int) -> bytes:
+        self._file.seek(offset)
+        (length,) = RECORD_LENGTH.unpack(self._file.read(RECORD_LENGTH.size))
+        return self._file.read(length)
+
+    def read_task_bytes(self, task_id: str) -> Optional[bytes]:
+        offset = self.index.get(task_id)
+        return None if offset is None else self._read_at(offset)
+
+    def read_task(self, task_id: str) -> Optional[Dict[str, Any]]:
+        payload = self.read_task_bytes(task_id)
+        return None if payload is None else json.loads(payload)
+
+    def close(self):
+        self._file.close()
+
+def convert_json_snapshot(json_path: str, snapshot_path: str) -> int:
+    """
+    Converts a JSON state document to a snapshot. Returns the number of tasks.
+    """
+    with open(json_path, "r") as f:
+        state = json.load(f)
+    tasks = state.pop("tasks", {})
+    write_snapshot(snapshot_path, state,
+                   ((task_id, dumps_compact(task_data).encode("utf-8"), task_summary(task_data))
+                    for task_id, task_data in tasks.items()))
+    logger.info("STATE_CONVERTED_TO_SNAPSHOT", {"source": json_path, "snapshot": snapshot_path, "tasks": len(tasks)})
+    return len(tasks)
+
+class SnapshotStateStore(StateStore):
+    """
+    State store persisted as a binary snapshot. Opening it reads only the
+    control plane and the task index, whose summaries seed the status/agent
+    indexes and aggregates; task records are filled in by a background
+    loader and read by offset until then. Commits made before the history
+    is loaded append the changed tasks to a delta file next to the snapshot;
+    the first commit afterwards rewrites the snapshot and drops the delta.
+    get_state()["tasks"] may be partial for the first moments after boot.
+    """
+    def __init__(self, storage_path: str = "storage/state.snap", legacy_path: Optional[str] = None,
+                 durability: str = "always", flush_interval: float = 0.05, flush_batch_size: int = 100,
+                 background_load: bool = True, load_batch_size: int = 1000):
+        self.legacy_path = legacy_path
+        self.delta_path = storage_path + ".delta"
+        self.load_batch_size = load_batch_size
+        self._reader: Optional[SnapshotReader] = None
+        self._generation = 0
+        # Tasks whose current version is only in the snapshot file, with their summaries
+        self._on_disk: Dict[str, Optional[Dict[str, Any]]] = {}
+        self._unloaded: List[str] = []
+        self._lazy_tasks: Optional[Dict[str, Any]] = None
+        self._tasks_loaded = threading.Event()
+        # Task ids written or removed since the last commit, for the delta
+        self._dirty_tasks: Dict[str, None] = {}
+        self._removed_tasks: Dict[str, None] = {}
+        # Encoded task records reused across commits; only changed tasks are re-encoded
+        self._encoded_tasks: Dict[str, bytes] = {}
+        self._encoded_for: Optional[Dict[str, Any]] = None
+        super().__init__(storage_path, durability, flush_interval, flush_batch_size)
+        if background_load and not self._tasks_loaded.is_set():
+            threading.Thread(target=self._background_load, name="fog-snapshot-load", daemon=True).start()
+
+    def _load(self):
+        if not os.path.exists(self.storage_path) and self.legacy_path and os.path.exists(self.legacy_path):
+            convert_json_snapshot(self.legacy_path, self.storage_path)
+        if not os.path.exists(self.storage_path):
+            self._tasks_loaded.set()
+            return
+        self._reader = SnapshotReader(self.storage_path)
+        control = dict(self._reader.control)
+        self._generation = control.pop(GENERATION_KEY, 0)
+        self._state.update(control)
+        self._state["tasks"] = self._lazy_tasks = self._encoded_for = TaskTable()
+        self._on_disk = dict(self._reader.summaries)
+        self._replay_delta()
+        # Load in file order, which is the order tasks were submitted
+        self._unloaded = list(reversed(self._on_disk))
+        self._sync_task_index()
+        if not self._unloaded:
+            self._finish_loading()
+
+    def _replay_delta(self):
+        if not os.path.exists(self.delta_path):
+            return
+        tasks = self._state["tasks"]
+        applied = 0
+        with open(self.delta_path, "r") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # Torn by a crash mid-append; that commit never completed
+                    break
+                if record["generation"] != self._generation:
+                    # Written against a snapshot that has since been rewritten
+                    continue
+                for task_id in record["removed"]:
+                    tasks.pop(task_id, None)
+                    self._on_disk.pop(task_id, None)
+                for task_id, task_data in record["tasks"].items():
+                    tasks[task_id] = task_data
+                    self._on_disk.pop(task_id, None)
+                state = self._empty_state()
+                state.update(record["control"])
+                state["tasks"] = tasks
+                self._state = state
+                applied += 1
+        logger.info("SNAPSHOT_DELTA_REPLAYED", {"commits": applied, "generation": self._generation})
+
+    def _pending_on_disk(self) -> Dict[str, Optional[Dict[str, Any]]]:
+        if self._on_disk and self._state["tasks"] is not self._lazy_tasks:
+            # The tasks dict was replaced; the snapshot no longer applies
+            self._finish_loading()
+        return self._on_disk
+
+    def _load_task_batch(self, limit: int):
+        with self.lock:
+            if self._tasks_loaded.is_set():
+                return
+            on_disk = self._pending_on_disk()
+            tasks = self._state["tasks"]
+            indexed = tasks is self._indexed_tasks and tasks.revision == self._indexed_revision
+            for _ in range(min(limit, len(self._unloaded))):
+                task_id = self._unloaded.pop()
+                if task_id not in on_disk:
+                    # Updated or removed since boot; the in-memory version is newer
+                    continue
+                payload = self._reader.read_task_bytes(task_id)
+                tasks[task_id] = json.loads(payload)
+                del on_disk[task_id]
+                self._encoded_tasks[task_id] = payload
+            if indexed:
+                # The summaries these tasks were indexed from still hold
+                self._mark_indexed()
+            if not self._unloaded:
+                self._finish_loading()
+
+    def _finish_loading(self):
+        if self._reader is not None:
+            self._reader.close()
+            self._reader = None
+        self._unloaded = []
+        self._on_disk = {}
+        self._tasks_loaded.set()
+        logger.info("SNAPSHOT_TASKS_LOADED", {"tasks": len(self._state["tasks"])})
+
+    def _background_load(self):
+        while not self._tasks_loaded.is_set():
+            try:
+                self._load_task_batch(self.load_batch_size)
+            except Exception as e:
+                logger.error("SNAPSHOT_LOAD_FAILED", {"error": str(e)})
+                return
+        # Fold the deltas written during loading into a fresh snapshot
+        if os.path.exists(self.delta_path):
+            with self.lock:
+                self._commit()
+
+    def _ensure_tasks_loaded(self):
+        if not self._tasks_loaded.is_set():
+            self._load_task_batch(len(self._unloaded))
+
+    def _indexable_tasks(self) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        tasks = self._state["tasks"]
+        on_disk = self._pending_on_disk()
+        yield from tasks.items()
+        for task_id, summary in on_disk.items():
+            # Snapshots without summaries are indexed from the records themselves
+            yield task_id, summary if summary is not None else self._reader.read_task(task_id)
+
+    def _task_records(self, task_ids: Iterable[str]) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        tasks = self._state["tasks"]
+        on_disk = self._pending_on_disk()
+        for task_id in task_ids:
+            task = tasks.get(task_id)
+            if task is None and task_id in on_disk:
+                task = self._reader.read_task(task_id)
+            if task is not None:
+                yield task_id, task
+
+    def get_task(self, task_id: str) -> Optional[Dict[str, Any]]:
+        if not self._tasks_loaded.is_set():
+            with self.lock:
+                if task_id not in self._state["tasks"] and task_id in self._pending_on_disk():
+                    return self._reader.read_task(task_id)
+        return super().get_task(task_id)
+
+    def _persist_task(self, task_id: str):
+        self._persist_tasks([task_id])
+
+    def _persist_tasks(self, task_ids: List[str]):
+        tasks = self._state["tasks"]
+        for task_id in task_ids:
+            self._encoded_tasks[task_id] = dumps_compact(tasks[task_id]).encode("utf-8")
+            self._dirty_tasks[task_id] = None
+            self._removed_tasks.pop(task_id, None)
+            self._on_disk.pop(task_id, None)
+        self._mark_dirty()
+
+    def _persist_task_removal(self, task_ids: List[str]):
+        for task_id in task_ids:
+            self._encoded_tasks.pop(task_id, None)
+            self._dirty_tasks.pop(task_id, None)
+            self._removed_tasks[task_id] = None
+            self._on_disk.pop(task_id, None)
+        self._mark_dirty()
+
+    def _encoded(self, task_id: str, task_data: Dict[str, Any]) -> bytes:
+        payload = self._encoded_tasks.get(task_id)
+        if payload is None:
+            payload = self._encoded_tasks[task_id] = dumps_compact(task_data).encode("utf-8")
+        return payload
+
+    def _append_delta(self):
+        tasks = self._state["tasks"]
+        changed = ",".join("%s:%s" % (json.dumps(task_id), self._encoded(task_id, tasks[task_id]).decode("utf-8"))
+                           for task_id in self._dirty_tasks if task_id in tasks)
+        control = dumps_compact({key: value for key, value in self._state.items() if key != "tasks"})
+        with open(self.delta_path, "a") as f:
+            f.write('{"generation":%d,"tasks":{%s},"removed":%s,"control":%s}\n'
+                    % (self._generation, changed, dumps_compact(list(self._removed_tasks)), control))
+            f.flush()
+            os.fsync(f.fileno())
+        self._dirty_tasks.clear()
+        self._removed_tasks.clear()
+
+    def _commit(self):
+        if not self._tasks_loaded.is_set() and self._pending_on_disk():
+            # Rewriting now would mean reading every task still in the file
+            self._append_delta()
+            return
+        tasks = self._state["tasks"]
+        if tasks is not self._encoded_for:
+            self._encoded_for = tasks
+            self._encoded_tasks = {}
+        elif len(self._encoded_tasks) > len(tasks):
+            self._encoded_tasks = {task_id: payload for task_id, payload in self._encoded_tasks.items()
+                                   if task_id in tasks}
+        control = {key: value for key, value in self._state.items() if key != "tasks"}
+        control[GENERATION_KEY] = self._generation + 1
+        write_snapshot(self.storage_path, control,
+                       ((task_id, self._encoded(task_id, task_data), task_summary(task_data))
+                        for task_id, task_data in tasks.items()))
+        self._generation += 1
+        self._dirty_tasks.clear()
+        self._removed_tasks.clear()
+        # The new generation makes any leftover delta inapplicable
+        if os.path.exists(self.delta_path):
+            os.remove(self.delta_path)
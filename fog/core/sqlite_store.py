@@ -0,0 +1,450 @@
+import json
+import os
+import sqlite3
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set, Tuple
+from fog.core.archive import naive_local
+from fog.core.listing import decode_cursor, encode_cursor
+from fog.core.logging import logger
+from fog.core.state import StateStore, ChangeTracker, dumps_compact, status_of
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    task_id TEXT PRIMARY KEY,
+    status TEXT,
+    agent TEXT,
+    task_type TEXT,
+    timestamp TEXT,
+    data TEXT NOT NULL,
+    rev INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks(status);
+CREATE INDEX IF NOT EXISTS idx_tasks_agent_status ON tasks(agent, status);
+CREATE INDEX IF NOT EXISTS idx_tasks_timestamp ON tasks(timestamp);
+
+CREATE TABLE IF NOT EXISTS approvals (
+    request_id TEXT PRIMARY KEY,
+    task_id TEXT,
+    status TEXT,
+    timestamp TEXT,
+    data TEXT NOT NULL,
+    rev INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_approvals_status ON approvals(status);
+CREATE INDEX IF NOT EXISTS idx_approvals_task ON approvals(task_id);
+CREATE INDEX IF NOT EXISTS idx_approvals_timestamp ON approvals(timestamp);
+
+CREATE TABLE IF NOT EXISTS deployments (
+    deployment_id TEXT PRIMARY KEY,
+    project_path TEXT,
+    status TEXT,
+    timestamp TEXT,
+    data TEXT NOT NULL,
+    rev INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_deployments_status ON deployments(status);
+CREATE INDEX IF NOT EXISTS idx_deployments_timestamp ON deployments(timestamp);
+
+CREATE TABLE IF NOT EXISTS backups (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    backup_id TEXT,
+    project_path TEXT,
+    timestamp TEXT,
+    data TEXT NOT NULL,
+    rev INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_backups_timestamp ON backups(timestamp);
+
+CREATE TABLE IF NOT EXISTS agents (
+    name TEXT PRIMARY KEY,
+    data TEXT NOT NULL,
+    rev INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS control (
+    key TEXT PRIMARY KEY,
+    data TEXT NOT NULL,
+    rev INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO meta (key, value) VALUES ('rev', 0);
+INSERT OR IGNORE INTO meta (key, value) VALUES ('pruned_rev', 0);
+
+CREATE TABLE IF NOT EXISTS tombstones (
+    tbl TEXT NOT NULL,
+    row_id TEXT NOT NULL,
+    rev INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_tombstones_rev ON tombstones(rev);
+"""
+
+# State keys stored row-per-entry: state key -> (table, id column, indexed columns)
+DOCUMENT_TABLES = {
+    "approvals": ("approvals", "request_id", ("task_id", "status", "timestamp")),
+    "deployments": ("deployments", "deployment_id", ("project_path", "status", "timestamp")),
+}
+
+# Keys with dedicated tables; everything else goes to the control table
+TABLE_KEYS = ("tasks", "agents", "backups") + tuple(DOCUMENT_TABLES)
+
+# Tables whose rows carry the revision that last wrote them, with their id column
+REVISIONED_TABLES = {
+    "tasks": "task_id", "agents": "name", "control": "key", "backups": "seq",
+    **{table: id_column for table, id_column, _ in DOCUMENT_TABLES.values()}
+}
+
+# Deletions are remembered for this many revisions; a process that falls
+# further behind reloads everything instead of replaying tombstones.
+TOMBSTONE_RETENTION = 100000
+
+class SqliteStateStore(StateStore):
+    """
+    State store backed by SQLite. Tasks, approvals, deployments and backups
+    live in indexed tables so status/agent/time queries do not scan every
+    task; the in-memory document is kept for get_state() compatibility.
+
+    Several processes may share one database: writers take the write lock
+    up front and stamp every row with a global revision, and each process
+    applies other processes' revisions whenever SQLite's data_version says
+    the file changed.
+    """
+    def __init__(self, storage_path: str = "storage/state.db", legacy_path: Optional[str] = None,
+                 durability: str = "always", flush_interval: float = 0.05, flush_batch_size: int = 100):
+        self.legacy_path = legacy_path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._control = ChangeTracker()
+        self._documents = {key: ChangeTracker() for key in DOCUMENT_TABLES}
+        self._state_ref: Optional[Dict[str, Any]] = None
+        self._rev = 0
+        self._seen_rev = 0
+        self._own_revs: Set[int] = set()
+        self._data_version: Optional[int] = None
+        super().__init__(storage_path, durability, flush_interval, flush_batch_size)
+
+    def _connect(self) -> sqlite3.Connection:
+        directory = os.path.dirname(self.storage_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Other worker processes may hold the write lock briefly; wait for it
+        conn = sqlite3.connect(self.storage_path, check_same_thread=False, isolation_level=None, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(SCHEMA)
+        for table in REVISIONED_TABLES:
+            columns = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+            if "rev" not in columns:
+                # Databases created before revisions were tracked
+                conn.execute(f"ALTER TABLE {table} ADD COLUMN rev INTEGER NOT NULL DEFAULT 0")
+            conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_rev ON {table}(rev)")
+        return conn
+
+    def _meta(self, key: str) -> int:
+        return self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()[0]
+
+    def _load(self):
+        self._conn = self._connect()
+        # Hold the write lock so concurrently starting workers migrate only once
+        self._begin()
+        empty = self._conn.execute("SELECT NOT EXISTS (SELECT 1 FROM tasks) AND NOT EXISTS (SELECT 1 FROM agents) "
+                                   "AND NOT EXISTS (SELECT 1 FROM control)").fetchone()[0]
+        if empty and self.legacy_path and os.path.exists(self.legacy_path):
+            with open(self.legacy_path, "r") as f:
+                self._state.update(json.load(f))
+            self._state_ref = None
+            self._save()
+            self._commit()
+            logger.info("SQLITE_MIGRATED_LEGACY_STATE", {"legacy_path": self.legacy_path})
+        else:
+            self._read_all()
+            self._commit()
+        self._seen_rev = self._rev
+        self._own_revs.clear()
+        self._data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def _read_all(self):
+        for key, data in self._conn.execute("SELECT key, data FROM control"):
+            self._state[key] = json.loads(data)
+        self._state["tasks"] = {task_id: json.loads(data) for task_id, data in
+                                self._conn.execute("SELECT task_id, data FROM tasks")}
+        self._state["agents"] = {name: json.loads(data) for name, data in
+                                 self._conn.execute("SELECT name, data FROM agents")}
+        self._state["backups"] = [json.loads(data) for (data,) in
+                                  self._conn.execute("SELECT data FROM backups ORDER BY seq")]
+        for key, (table, id_column, _) in DOCUMENT_TABLES.items():
+            rows = self._conn.execute(f"SELECT {id_column}, data FROM {table}").fetchall()
+            if rows or key in self._state:
+                self._state[key] = {row_id: json.loads(data) for row_id, data in rows}
+
+        self._state_ref = self._state
+        self._control.reset()
+        self._control.diff(self._state, skip=TABLE_KEYS)
+        for key, tracker in self._documents.items():
+            tracker.reset()
+            tracker.diff(self._state.get(key, {}))
+
+    def _refresh(self):
+        if self._conn is None:
+            return
+        with self.lock:
+            version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+            if version == self._data_version:
+                return
+            self._data_version = version
+            # Read every table from one snapshot
+            own_transaction = self._conn.in_transaction
+            if not own_transaction:
+                self._conn.execute("BEGIN")
+            try:
+                latest = self._meta("rev")
+                if self._seen_rev < self._meta("pruned_rev"):
+                    logger.warning("SQLITE_STATE_RELOADED", {"seen_rev": self._seen_rev, "latest_rev": latest})
+                    self._read_all()
+                else:
+                    self._apply_remote_changes(self._seen_rev)
+                self._seen_rev = latest
+                self._own_revs = {rev for rev in self._own_revs if rev > latest}
+            finally:
+                if not own_transaction:
+                    self._conn.execute("COMMIT")
+
+    def _remote_rows(self, query: str, since: int) -> List[Tuple]:
+        # The revision is the last column; rows this process wrote are already applied
+        return [row for row in self._conn.execute(query, (since,)) if row[-1] not in self._own_revs]
+
+    def _apply_remote_changes(self, since: int):
+        self._sync_task_index()
+        tasks = self._state["tasks"]
+        documents: Dict[str, Dict[str, Optional[str]]] = {}
+
+        # Deletions first: a row deleted and then re-created is present below again
+        for table, row_id, _ in self._remote_rows("SELECT tbl, row_id, rev FROM tombstones WHERE rev > ? ORDER BY rev", since):
+            if table == "tasks":
+                if tasks.pop(row_id, None) is not None:
+                    self._unindex_task(row_id)
+                    self._aggregates.forget(row_id)
+            elif table == "agents":
+                self._state["agents"].pop(row_id, None)
+            elif table == "control":
+                self._state.pop(row_id, None)
+                self._control.forget(row_id)
+            elif table == "backups":
+                self._state["backups"].clear()
+            elif table in DOCUMENT_TABLES:
+                documents.setdefault(table, {})[row_id] = None
+
+        for task_id, data, _ in self._remote_rows("SELECT task_id, data, rev FROM tasks WHERE rev > ?", since):
+            task_data = json.loads(data)
+            tasks[task_id] = task_data
+            self._index_task(task_id, task_data)
+            self._aggregates.observe(task_id, task_data)
+        self._mark_indexed()
+        for name, data, _ in self._remote_rows("SELECT name, data, rev FROM agents WHERE rev > ?", since):
+            self._state["agents"][name] = json.loads(data)
+        for data, _ in self._remote_rows("SELECT data, rev FROM backups WHERE rev > ? ORDER BY seq", since):
+            self._state["backups"].append(json.loads(data))
+        for key, data, _ in self._remote_rows("SELECT key, data, rev FROM control WHERE rev > ?", since):
+            self._state[key] = json.loads(data)
+            self._control.remember(key, data)
+        for key, (table, id_column, _) in DOCUMENT_TABLES.items():
+            for row_id, data, _ in self._remote_rows(f"SELECT {id_column}, data, rev FROM {table} WHERE rev > ?", since):
+                documents.setdefault(key, {})[row_id] = data
+
+        for key, changes in documents.items():
+            # A new dict, so identity-keyed caches such as the approval registry rebuild
+            entries = dict(self._state.get(key, {}))
+            tracker = self._documents[key]
+            for row_id, data in changes.items():
+                if data is None:
+                    entries.pop(row_id, None)
+                    tracker.forget(row_id)
+                else:
+                    entries[row_id] = json.loads(data)
+                    tracker.remember(row_id, data)
+            self._state[key] = entries
+
+    @staticmethod
+    def _task_row(task_id: str, task_data: Dict[str, Any]) -> Tuple:
+        return (task_id, status_of(task_data), task_data.get("system_name"),
+                getattr(task_data.get("task_type"), "value", task_data.get("task_type")),
+                str(task_data.get("timestamp") or ""), dumps_compact(task_data))
+
+    @staticmethod
+    def _document_row(row_id: str, columns: Tuple[str, ...], data: Dict[str, Any]) -> Tuple:
+        values = [getattr(data.get(c), "value", data.get(c)) for c in columns]
+        return (row_id, *[None if v is None else str(v) for v in values], dumps_compact(data))
+
+    def _upsert_tasks(self, rows: List[Tuple]):
+        self._conn.executemany("INSERT OR REPLACE INTO tasks (task_id, status, agent, task_type, timestamp, data, rev) "
+                               "VALUES (?, ?, ?, ?, ?, ?, ?)", [(*row, self._rev) for row in rows])
+
+    def _upsert_agent(self, name: str, agent_config: Dict[str, Any]):
+        self._conn.execute("INSERT OR REPLACE INTO agents (name, data, rev) VALUES (?, ?, ?)",
+                           (name, dumps_compact(agent_config), self._rev))
+
+    def _tombstone(self, table: str, row_ids: List[str]):
+        self._conn.executemany("INSERT INTO tombstones (tbl, row_id, rev) VALUES (?, ?, ?)",
+                               [(table, row_id, self._rev) for row_id in row_ids])
+
+    def _write_documents(self, key: str, changed: Dict[str, Any], removed: List[str]):
+        table, id_column, columns = DOCUMENT_TABLES[key]
+        placeholders = ", ".join("?" * (len(columns) + 3))
+        self._conn.executemany(
+            f"INSERT OR REPLACE INTO {table} ({id_column}, {', '.join(columns)}, data, rev) VALUES ({placeholders})",
+            [(*self._document_row(row_id, columns, data), self._rev) for row_id, data in changed.items()]
+        )
+        self._conn.executemany(f"DELETE FROM {table} WHERE {id_column} = ?", [(row_id,) for row_id in removed])
+        self._tombstone(table, removed)
+
+    def _rewrite_all(self):
+        for table, id_column in REVISIONED_TABLES.items():
+            if table == "backups":
+                self._tombstone("backups", ["*"])
+            else:
+                self._conn.execute(f"INSERT INTO tombstones (tbl, row_id, rev) SELECT ?, {id_column}, ? FROM {table}",
+                                   (table, self._rev))
+            self._conn.execute(f"DELETE FROM {table}")
+        self._upsert_tasks([self._task_row(tid, data) for tid, data in self._state["tasks"].items()])
+        for name, data in self._state["agents"].items():
+            self._upsert_agent(name, data)
+        for backup in self._state["backups"]:
+            self._insert_backup(backup)
+        self._control.reset()
+        for tracker in self._documents.values():
+            tracker.reset()
+
+    def _begin(self):
+        # Writes accumulate in one open transaction until the next commit.
+        # IMMEDIATE takes the write lock now, so revisions follow commit order.
+        if not self._conn.in_transaction:
+            self._conn.execute("BEGIN IMMEDIATE")
+            self._rev = self._meta("rev") + 1
+            self._conn.execute("UPDATE meta SET value = ? WHERE key = 'rev'", (self._rev,))
+            self._own_revs.add(self._rev)
+
+    def _commit(self):
+        if self._conn.in_transaction:
+            self._conn.execute("COMMIT")
+
+    def _save(self):
+        with self.lock:
+            self._begin()
+            if self._state is not self._state_ref:
+                # The whole document was replaced; rewrite every table
+                self._state_ref = self._state
+                self._rewrite_all()
+
+            changed, removed = self._control.diff(self._state, skip=TABLE_KEYS)
+            self._conn.executemany("INSERT OR REPLACE INTO control (key, data, rev) VALUES (?, ?, ?)",
+                                   [(key, dumps_compact(value), self._rev) for key, value in changed.items()])
+            self._conn.executemany("DELETE FROM control WHERE key = ?", [(key,) for key in removed])
+            self._tombstone("control", removed)
+            for key, tracker in self._documents.items():
+                changed, removed = tracker.diff(self._state.get(key, {}))
+                self._write_documents(key, changed, removed)
+            self._mark_dirty()
+
+    def _persist_task(self, task_id: str):
+        self._begin()
+        self._upsert_tasks([self._task_row(task_id, self._state["tasks"][task_id])])
+        self._mark_dirty()
+
+    def _persist_tasks(self, task_ids: List[str]):
+        self._begin()
+        tasks = self._state["tasks"]
+        self._upsert_tasks([self._task_row(task_id, tasks[task_id]) for task_id in task_ids])
+        self._mark_dirty()
+
+    def _persist_task_removal(self, task_ids: List[str]):
+        self._begin()
+        self._conn.executemany("DELETE FROM tasks WHERE task_id = ?", [(task_id,) for task_id in task_ids])
+        self._tombstone("tasks", task_ids)
+        pruned_rev = self._rev - TOMBSTONE_RETENTION
+        if pruned_rev > self._meta("pruned_rev"):
+            self._conn.execute("DELETE FROM tombstones WHERE rev < ?", (pruned_rev,))
+            self._conn.execute("UPDATE meta SET value = ? WHERE key = 'pruned_rev'", (pruned_rev,))
+        self._mark_dirty()
+
+    def _persist_agent(self, agent_name: str):
+        self._begin()
+        self._upsert_agent(agent_name, self._state["agents"][agent_name])
+        self._mark_dirty()
+
+    def _persist_agents(self, agent_names: List[str]):
+        self._begin()
+        for agent_name in agent_names:
+            self._upsert_agent(agent_name, self._state["agents"][agent_name])
+        self._mark_dirty()
+
+    def _insert_backup(self, backup_metadata: Dict[str, Any]):
+        self._conn.execute("INSERT INTO backups (backup_id, project_path, timestamp, data, rev) VALUES (?, ?, ?, ?, ?)",
+                           (backup_metadata.get("backup_id"), backup_metadata.get("project_path"),
+                            backup_metadata.get("timestamp"), dumps_compact(backup_metadata), self._rev))
+
+    def _persist_backup(self, backup_metadata: Dict[str, Any]):
+        self._begin()
+        self._insert_backup(backup_metadata)
+        self._mark_dirty()
+
+    def _select_tasks(self, where: str, params: Tuple) -> List[Dict[str, Any]]:
+        with self.lock:
+            rows = self._conn.execute(f"SELECT data FROM tasks WHERE {where} ORDER BY timestamp", params).fetchall()
+        return [json.loads(data) for (data,) in rows]
+
+    @staticmethod
+    def _task_filters(agent: Optional[str], status: Optional[str]) -> Tuple[List[str], List[Any]]:
+        clauses, params = [], []
+        if agent is not None:
+            clauses.append("agent = ?")
+            params.append(agent)
+        if status is not None:
+            clauses.append("status = ?")
+            params.append(getattr(status, "value", status))
+        return clauses, params
+
+    def tasks_for_agent(self, agent: Optional[str], status: Optional[str] = None) -> List[Dict[str, Any]]:
+        clauses, params = self._task_filters(agent, status)
+        return self._select_tasks(" AND ".join(clauses) or "1", tuple(params))
+
+    def count_tasks(self, status: Optional[str] = None, agent: Optional[str] = None) -> int:
+        clauses, params = self._task_filters(agent, status)
+        with self.lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM tasks WHERE {' AND '.join(clauses) or '1'}",
+                                      tuple(params)).fetchone()[0]
+
+    def list_tasks(self, status: Optional[str] = None, agent: Optional[str] = None,
+                   start: Optional[datetime] = None, end: Optional[datetime] = None,
+                   cursor: Optional[str] = None, limit: int = 50) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        clauses, params = self._task_filters(agent, status)
+        if start is not None:
+            clauses.append("timestamp >= ?")
+            params.append(naive_local(start).isoformat())
+        if end is not None:
+            clauses.append("timestamp < ?")
+            params.append(naive_local(end).isoformat())
+        if cursor:
+            timestamp, task_id = decode_cursor(cursor)
+            clauses.append("(timestamp < ? OR (timestamp = ? AND task_id < ?))")
+            params.extend([timestamp, timestamp, task_id])
+        with self.lock:
+            rows = self._conn.execute(
+                f"SELECT task_id, timestamp, data FROM tasks WHERE {' AND '.join(clauses) or '1'} "
+                "ORDER BY timestamp DESC, task_id DESC LIMIT ?", (*params, limit + 1)
+            ).fetchall()
+        next_cursor = encode_cursor((rows[limit - 1][1], rows[limit - 1][0])) if len(rows) > limit else None
+        return [json.loads(data) for _, _, data in rows[:limit]], next_cursor
+
+    def task_agents(self) -> List[str]:
+        with self.lock:
+            return [agent for (agent,) in
+                    self._conn.execute("SELECT DISTINCT agent FROM tasks WHERE agent IS NOT NULL")]
+
+    def close(self):
+        super().close()
+        with self.lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -1,19 +1,153 @@
+import atexit
 import json
 import os
-from typing import Any, Dict, List, Optional
-from threading import Lock
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from threading import RLock
+from fog.core.aggregates import TaskAggregates
+from fog.core.archive import TaskArchive, task_time
+from fog.core.listing import paginate
+from fog.core.logging import logger
+
+FINISHED_STATUSES = ("completed", "failed")
+
+# "always" persists every mutation before returning; "grouped" persists once
+# flush_batch_size mutations are pending or flush_interval has passed;
+# "interval" persists only every flush_interval seconds.
+DURABILITY_MODES = ("always", "grouped", "interval")
+
+# How often update_task re-checks the age-based retention rule, in seconds
+AGE_SWEEP_INTERVAL = 60.0
+
+def dumps_compact(obj: Any) -> str:
+    return json.dumps(obj, separators=(",", ":"))
+
+def status_of(task_data: Dict[str, Any]) -> Optional[str]:
+    status = task_data.get("status")
+    # TaskStatus is a str Enum but hashes by member name, so normalize to the value
+    return getattr(status, "value", status)
+
+class TaskTable(dict):
+    """
+    The hot task mapping. Counts every write so the store can tell whether
+    its indexes still match the tasks, whoever wrote them.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.revision = 0
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.revision += 1
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self.revision += 1
+
+    def pop(self, key, *default):
+        self.revision += 1
+        return super().pop(key, *default)
+
+    def popitem(self):
+        self.revision += 1
+        return super().popitem()
+
+    def setdefault(self, key, default=None):
+        self.revision += 1
+        return super().setdefault(key, default)
+
+    def update(self, *args, **kwargs):
+        super().update(*args, **kwargs)
+        self.revision += 1
+
+    def clear(self):
+        super().clear()
+        self.revision += 1
+
+class ChangeTracker:
+    """
+    Remembers the last persisted encoding of each entry in a mapping so a
+    backend can write only the entries that changed since the previous save.
+    """
+    def __init__(self):
+        self._encoded: Dict[str, str] = {}
+
+    def reset(self):
+        self._encoded = {}
+
+    def remember(self, key: str, encoded: str):
+        # Records a value another writer already persisted
+        self._encoded[key] = encoded
+
+    def forget(self, key: str):
+        self._encoded.pop(key, None)
+
+    def diff(self, entries: Dict[str, Any], skip: Tuple[str, ...] = ()) -> Tuple[Dict[str, Any], List[str]]:
+        changed = {}
+        for key, value in entries.items():
+            if key in skip:
+                continue
+            encoded = dumps_compact(value)
+            if self._encoded.get(key) != encoded:
+                self._encoded[key] = encoded
+                changed[key] = value
+        removed = [key for key in self._encoded if key not in entries or key in skip]
+        for key in removed:
+            del self._encoded[key]
+        return changed, removed
 
 class StateStore:
-    def __init__(self, storage_path: str = "storage/state.json"):
+    """
+    File-based JSON state store. Committing rewrites the whole document,
+    which is fine for small installs. Log-structured backends override the
+    _persist_* hooks to write only what changed.
+
+    Mutations mark the store dirty; the durability mode decides whether the
+    commit happens immediately or is coalesced by a background flusher.
+    """
+    def __init__(self, storage_path: str = "storage/state.json", durability: str = "always",
+                 flush_interval: float = 0.05, flush_batch_size: int = 100):
+        if durability not in DURABILITY_MODES:
+            raise ValueError(f"Unknown durability mode {durability}")
         self.storage_path = storage_path
-        self.lock = Lock()
-        self._state = {
-            "tasks": {},
+        self.durability = durability
+        self.flush_interval = flush_interval
+        self.flush_batch_size = flush_batch_size
+        self.lock = RLock()
+        self._pending = 0
+        self._flush_wakeup = threading.Event()
+        self._flusher_stop = threading.Event()
+        self._flusher: Optional[threading.Thread] = None
+        self._state = self._empty_state()
+        # Secondary task indexes keyed by (status, agent), (status, None) and
+        # (None, agent); rebuilt lazily if the tasks are written behind the
+        # store's back, which the TaskTable revision reveals.
+        self._indexed_tasks: Optional[TaskTable] = None
+        self._indexed_revision = -1
+        self._task_keys: Dict[str, Tuple[Optional[str], Optional[str]]] = {}
+        self._task_index: Dict[Tuple[Optional[str], Optional[str]], Dict[str, None]] = {}
+        # Per-agent/task-type counters, maintained alongside the indexes
+        self._aggregates = TaskAggregates()
+        # Retention: finished tasks beyond these limits move to the cold archive
+        self.archive: Optional[TaskArchive] = None
+        self.retention_max_age: Optional[float] = None
+        self.retention_max_finished: Optional[int] = None
+        self._last_age_sweep = 0.0
+        self._load()
+        if self.durability != "always":
+            self._flusher = threading.Thread(target=self._flush_loop, name="fog-state-flush", daemon=True)
+            self._flusher.start()
+
+    @staticmethod
+    def _empty_state() -> Dict[str, Any]:
+        return {
+            "tasks": TaskTable(),
             "agents": {},
             "backups": [],
             "runs": []
         }
-        self._load()
 
     def _load(self):
         if os.path.exists(self.storage_path):
@@ -24,37 +158,423 @@ class StateStore:
                 # Fallback to empty state if file is corrupt
                 pass
 
-    def _save(self):
-        os.makedirs(os.path.dirname(self.storage_path), exist_ok=True)
-        with open(self.storage_path, 'w') as f:
+    def _commit(self):
+        directory = os.path.dirname(self.storage_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = self.storage_path + ".tmp"
+        with open(tmp_path, 'w') as f:
             json.dump(self._state, f, indent=4)
+        os.replace(tmp_path, self.storage_path)
+
+    def _mark_dirty(self):
+        if self.durability == "always":
+            with self.lock:
+                self._commit()
+            return
+        with self.lock:
+            self._pending += 1
+            if self.durability == "grouped" and self._pending >= self.flush_batch_size:
+                self._flush_wakeup.set()
+
+    def _save(self):
+        self._mark_dirty()
+
+    # Persistence hooks for the typed mutations below. The JSON store has
+    # no cheaper option than rewriting the document.
+    def _persist_task(self, task_id: str):
+        self._mark_dirty()
+
+    def _persist_tasks(self, task_ids: List[str]):
+        self._mark_dirty()
+
+    def _persist_agent(self, agent_name: str):
+        self._mark_dirty()
+
+    def _persist_agents(self, agent_names: List[str]):
+        self._mark_dirty()
+
+    def _persist_backup(self, backup_metadata: Dict[str, Any]):
+        self._mark_dirty()
+
+    def _persist_task_removal(self, task_ids: List[str]):
+        self._mark_dirty()
+
+    def _refresh(self):
+        """
+        Applies changes committed by other processes sharing the storage.
+        Only backends that support several writers override this.
+        """
+
+    def _ensure_tasks_loaded(self):
+        """
+        Completes loading of task history for backends that defer it at boot.
+        """
+
+    def _flush_loop(self):
+        while not self._flusher_stop.is_set():
+            self._flush_wakeup.wait(self.flush_interval)
+            self._flush_wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error("STATE_FLUSH_FAILED", {"error": str(e)})
+
+    def flush(self):
+        """
+        Forces any buffered mutations to durable storage.
+        """
+        with self.lock:
+            if not self._pending:
+                return
+            self._pending = 0
+            self._commit()
+
+    def close(self):
+        if self._flusher is not None:
+            self._flusher_stop.set()
+            self._flush_wakeup.set()
+            self._flusher.join()
+            self._flusher = None
+        self.flush()
 
     def update_task(self, task_id: str, task_data: Dict[str, Any]):
+        """
+        Writes one task and re-indexes it. Changes to a stored task dict are
+        only seen by the indexes once written back through here.
+        """
         with self.lock:
+            self._refresh()
+            self._sync_task_index()
+            if task_id not in self._state["tasks"]:
+                self._unarchive([task_id])
             self._state["tasks"][task_id] = task_data
-            self._save()
+            self._index_task(task_id, task_data)
+            self._aggregates.observe(task_id, task_data)
+            self._mark_indexed()
+            self._persist_task(task_id)
+            if self.archive is not None and self._task_keys[task_id][0] in FINISHED_STATUSES:
+                self._maybe_enforce_retention()
+
+    def update_tasks(self, tasks: Dict[str, Dict[str, Any]]):
+        """
+        Writes several tasks with a single persistence step.
+        """
+        with self.lock:
+            self._refresh()
+            self._sync_task_index()
+            hot = self._state["tasks"]
+            self._unarchive([task_id for task_id in tasks if task_id not in hot])
+            hot.update(tasks)
+            for task_id, task_data in tasks.items():
+                self._index_task(task_id, task_data)
+                self._aggregates.observe(task_id, task_data)
+            self._mark_indexed()
+            self._persist_tasks(list(tasks))
+            if self.archive is not None and any(self._task_keys[task_id][0] in FINISHED_STATUSES for task_id in tasks):
+                self._maybe_enforce_retention()
+
+    def _unarchive(self, task_ids: List[str]):
+        # Writing an archived task moves it back to the hot set, so its
+        # archived copy must stop counting towards the totals
+        if self.archive is None:
+            return
+        archived = [task_id for task_id in task_ids if task_id in self.archive]
+        if archived:
+            for task_data in self.archive.unarchive(archived).values():
+                self._aggregates.retract(task_data)
 
     def get_task(self, task_id: str) -> Optional[Dict[str, Any]]:
-        return self._state["tasks"].get(task_id)
+        self._refresh()
+        task = self._state["tasks"].get(task_id)
+        if task is None and self.archive is not None:
+            # Fault finished tasks back in from the cold tier
+            return self.archive.get(task_id)
+        return task
+
+    def configure_retention(self, archive: TaskArchive, max_age: Optional[float] = None,
+                            max_finished: Optional[int] = None):
+        """
+        Enables archival of COMPLETED/FAILED tasks older than max_age seconds
+        or beyond the newest max_finished ones.
+        """
+        with self.lock:
+            self.archive = archive
+            self.retention_max_age = max_age
+            self.retention_max_finished = max_finished
+            # Rebuild aggregates on top of the archive's baseline
+            self._indexed_tasks = None
+
+    def _maybe_enforce_retention(self):
+        if self.retention_max_finished is not None:
+            finished = sum(len(self._task_index.get((status, None), {})) for status in FINISHED_STATUSES)
+            # Archive in batches rather than one task per completion
+            if finished >= self.retention_max_finished + max(1, self.retention_max_finished // 10):
+                self.enforce_retention()
+                return
+        if self.retention_max_age is not None and time.time() - self._last_age_sweep >= AGE_SWEEP_INTERVAL:
+            self.enforce_retention()
+
+    def enforce_retention(self) -> int:
+        """
+        Moves finished tasks that exceed the retention limits to the archive.
+        Returns the number of tasks archived.
+        """
+        if self.archive is None:
+            return 0
+        with self.lock:
+            self._last_age_sweep = time.time()
+            # Victims are chosen by timestamp, which only full task records carry
+            self._ensure_tasks_loaded()
+            if not self._retention_victims():
+                return 0
+            # Release any open write transaction first: another process may hold
+            # the archive lock while it waits to write
+            self.flush()
+            # The archive lock keeps worker processes from archiving the same
+            # tasks; victims are recomputed once other processes' removals are in
+            with self.archive.exclusive():
+                self._refresh()
+                victims = self._retention_victims()
+                if not victims:
+                    return 0
+                tasks = self._state["tasks"]
+                self.archive.archive({task_id: tasks[task_id] for task_id in victims})
+                for task_id in victims:
+                    del tasks[task_id]
+                    self._unindex_task(task_id)
+                    self._aggregates.forget(task_id)
+                self._mark_indexed()
+                self._persist_task_removal(victims)
+                # Commit before releasing the archive lock so other processes see the removal
+                self.flush()
+                return len(victims)
+
+    def _retention_victims(self) -> List[str]:
+        self._sync_task_index()
+        tasks = self._state["tasks"]
+        finished = [task_id for status in FINISHED_STATUSES
+                    for task_id in self._task_index.get((status, None), {})]
+
+        victims: Dict[str, None] = {}
+        if self.retention_max_age is not None:
+            cutoff = datetime.now() - timedelta(seconds=self.retention_max_age)
+            for task_id in finished:
+                created = task_time(tasks[task_id])
+                if created is not None and created < cutoff:
+                    victims[task_id] = None
+
+        if self.retention_max_finished is not None:
+            remaining = [task_id for task_id in finished if task_id not in victims]
+            excess = len(remaining) - self.retention_max_finished
+            if excess > 0:
+                remaining.sort(key=lambda task_id: task_time(tasks[task_id]) or datetime.min)
+                for task_id in remaining[:excess]:
+                    victims[task_id] = None
+        return list(victims)
+
+    def _sync_task_index(self):
+        tasks = self._state["tasks"]
+        if not isinstance(tasks, TaskTable):
+            tasks = self._state["tasks"] = TaskTable(tasks)
+        if tasks is self._indexed_tasks and tasks.revision == self._indexed_revision:
+            return
+        # Tasks were loaded, replayed or written directly into the dict
+        self._indexed_tasks = tasks
+        self._task_keys = {}
+        self._task_index = {}
+        self._aggregates = self.archive.baseline_aggregates() if self.archive is not None else TaskAggregates()
+        for task_id, task_data in self._indexable_tasks():
+            self._index_task(task_id, task_data)
+            self._aggregates.observe(task_id, task_data)
+        self._indexed_revision = tasks.revision
+
+    def _indexable_tasks(self) -> Iterable[Tuple[str, Dict[str, Any]]]:
+        # Backends that defer loading also yield summaries of tasks still in storage
+        return self._state["tasks"].items()
+
+    def _task_records(self, task_ids: Iterable[str]) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        # Resolves indexed ids to tasks; backends that defer loading read missing ones from storage
+        tasks = self._state["tasks"]
+        return ((task_id, tasks[task_id]) for task_id in task_ids if task_id in tasks)
+
+    def _mark_indexed(self):
+        # Called after the store indexed its own writes to the task table
+        self._indexed_revision = self._state["tasks"].revision
+
+    def _index_task(self, task_id: str, task_data: Dict[str, Any]):
+        new_key = (status_of(task_data), task_data.get("system_name"))
+        old_key = self._task_keys.get(task_id)
+        if old_key == new_key:
+            return
+        if old_key is not None:
+            for key in self._index_keys(*old_key):
+                self._task_index[key].pop(task_id, None)
+        self._task_keys[task_id] = new_key
+        # Dicts rather than sets keep query results in submission order
+        for key in self._index_keys(*new_key):
+            self._task_index.setdefault(key, {})[task_id] = None
+
+    def _unindex_task(self, task_id: str):
+        old_key = self._task_keys.pop(task_id, None)
+        if old_key is not None:
+            for key in self._index_keys(*old_key):
+                self._task_index[key].pop(task_id, None)
+
+    @staticmethod
+    def _index_keys(status: Optional[str], agent: Optional[str]):
+        return ((status, agent), (status, None), (None, agent))
+
+    def _query_ids(self, status: Optional[str], agent: Optional[str]) -> Dict[str, Any]:
+        self._refresh()
+        self._sync_task_index()
+        if status is None and agent is None:
+            return self._task_keys
+        return self._task_index.get((getattr(status, "value", status), agent), {})
+
+    def tasks_by_status(self, status: str) -> List[Dict[str, Any]]:
+        return self.tasks_for_agent(None, status)
+
+    def tasks_for_agent(self, agent: Optional[str], status: Optional[str] = None) -> List[Dict[str, Any]]:
+        with self.lock:
+            return [task for _, task in self._task_records(self._query_ids(status, agent))]
+
+    def count_tasks(self, status: Optional[str] = None, agent: Optional[str] = None) -> int:
+        with self.lock:
+            return len(self._query_ids(status, agent))
+
+    def task_agents(self) -> List[str]:
+        """
+        Names of all agents that have at least one task.
+        """
+        with self.lock:
+            self._refresh()
+            self._sync_task_index()
+            return [agent for (status, agent), ids in self._task_index.items()
+                    if status is None and agent is not None and ids]
+
+    def list_tasks(self, status: Optional[str] = None, agent: Optional[str] = None,
+                   start: Optional[datetime] = None, end: Optional[datetime] = None,
+                   cursor: Optional[str] = None, limit: int = 50) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        One page of hot tasks, newest first, filtered through the status/agent
+        indexes. Returns the tasks and the cursor for the next page.
+        """
+        with self.lock:
+            return paginate(self._task_records(self._query_ids(status, agent)), cursor, limit, start, end)
+
+    def task_aggregates(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Per-agent task counters: "total", "statuses" (count per current
+        status), "retries", latency count/sum/histogram and a "by_task_type"
+        breakdown. Archived tasks are included; cost is independent of the
+        number of tasks.
+        """
+        with self.lock:
+            self._refresh()
+            self._sync_task_index()
+            return self._aggregates.by_agent()
+
+    def task_totals(self) -> Dict[str, Any]:
+        """
+        The task_aggregates() counters summed over every task, including
+        tasks without an agent.
+        """
+        with self.lock:
+            self._refresh()
+            self._sync_task_index()
+            return self._aggregates.totals()
 
     def add_agent(self, agent_name: str, agent_config: Dict[str, Any]):
         with self.lock:
+            self._refresh()
             self._state["agents"][agent_name] = agent_config
-            self._save()
+            self._persist_agent(agent_name)
+
+    def add_agents(self, agents: Dict[str, Dict[str, Any]]):
+        """
+        Registers several agents with a single persistence step.
+        """
+        with self.lock:
+            self._refresh()
+            self._state["agents"].update(agents)
+            self._persist_agents(list(agents))
 
     def get_agents(self) -> Dict[str, Any]:
+        self._refresh()
         return self._state["agents"]
 
     def add_backup(self, backup_metadata: Dict[str, Any]):
         with self.lock:
+            self._refresh()
             self._state["backups"].append(backup_metadata)
-            self._save()
+            self._persist_backup(backup_metadata)
 
     def get_backups(self) -> List[Dict[str, Any]]:
+        self._refresh()
         return self._state["backups"]
 
     def get_state(self) -> Dict[str, Any]:
+        self._refresh()
         return self._state
 
+def create_state_store() -> StateStore:
+    """
+    Builds the state store selected by FOG_STATE_BACKEND ("json", "wal", "sqlite"
+    or "snapshot") with durability from FOG_STATE_DURABILITY/FOG_STATE_FLUSH_* and task
+    retention from FOG_RETENTION_* variables. Raises ValueError if
+    FOG_WEB_WORKERS asks for several processes on a single-process backend.
+    """
+    backend = os.environ.get("FOG_STATE_BACKEND", "json").lower()
+    # Several worker processes are opt-in, and only the sqlite backend can be shared
+    workers = int(os.environ.get("FOG_WEB_WORKERS", "1"))
+    if workers > 1 and backend != "sqlite":
+        raise ValueError(f"FOG_WEB_WORKERS={workers} requires FOG_STATE_BACKEND=sqlite; "
+                         f"the {backend} backend is single-process")
+    options = {}
+    if "FOG_STATE_DURABILITY" in os.environ:
+        options["durability"] = os.environ["FOG_STATE_DURABILITY"].lower()
+    if "FOG_STATE_FLUSH_INTERVAL" in os.environ:
+        options["flush_interval"] = float(os.environ["FOG_STATE_FLUSH_INTERVAL"])
+    if "FOG_STATE_FLUSH_BATCH" in os.environ:
+        options["flush_batch_size"] = int(os.environ["FOG_STATE_FLUSH_BATCH"])
+
+    if backend == "sqlite":
+        from fog.core.sqlite_store import SqliteStateStore
+        store = SqliteStateStore(
+            os.environ.get("FOG_STATE_PATH", "storage/state.db"),
+            legacy_path="storage/state.json",
+            **options
+        )
+    elif backend == "wal":
+        from fog.core.wal import WalStateStore
+        store = WalStateStore(
+            os.environ.get("FOG_STATE_PATH", "storage/state_wal"),
+            legacy_path="storage/state.json",
+            **options
+        )
+    elif backend == "snapshot":
+        from fog.core.snapshot import SnapshotStateStore
+        store = SnapshotStateStore(
+            os.environ.get("FOG_STATE_PATH", "storage/state.snap"),
+            legacy_path="storage/state.json",
+            **options
+        )
+    else:
+        store = StateStore(os.environ.get("FOG_STATE_PATH", "storage/state.json"), **options)
+
+    if store.durability != "always":
+        # Scripts that import the store and exit must not lose buffered writes
+        atexit.register(store.close)
+
+    max_age_hours = float(os.environ.get("FOG_RETENTION_MAX_AGE_HOURS", "168"))
+    max_finished = int(os.environ.get("FOG_RETENTION_MAX_FINISHED", "5000"))
+    store.configure_retention(
+        TaskArchive(os.environ.get("FOG_ARCHIVE_PATH", "storage/archive")),
+        max_age=max_age_hours * 3600 if max_age_hours > 0 else None,
+        max_finished=max_finished if max_finished > 0 else None
+    )
+    return store
+
 # Global state instance
-state_store = StateStore()
+state_store = create_state_store()
@@ -0,0 +1,284 @@
+import json
+import os
+import threading
+from typing import Any, Dict, Iterator, List, Optional
+from fog.core.logging import logger
+from fog.core.state import StateStore, ChangeTracker, dumps_compact
+
+SEGMENT_PREFIX = "segment-"
+SEGMENT_SUFFIX = ".log"
+CHECKPOINT_FILE = "checkpoint.json"
+
+# Top-level keys that have their own record types; everything else is
+# control-plane state that agents mutate in place and persist via _save().
+LOGGED_KEYS = ("tasks", "agents", "backups")
+
+class SegmentedLog:
+    """
+    Append-only log of JSON records split into numbered segment files.
+    Appends are buffered; sync() flushes and fsyncs them as one group.
+    """
+    def __init__(self, directory: str, segment_size: int = 4 * 1024 * 1024):
+        self.directory = directory
+        self.segment_size = segment_size
+        self.active_id = 0
+        self._file = None
+        self._size = 0
+        self._unsynced = False
+        self._lock = threading.Lock()
+
+    def segment_path(self, segment_id: int) -> str:
+        return os.path.join(self.directory, f"{SEGMENT_PREFIX}{segment_id:08d}{SEGMENT_SUFFIX}")
+
+    def segments(self) -> List[int]:
+        ids = []
+        if os.path.isdir(self.directory):
+            for name in os.listdir(self.directory):
+                if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX):
+                    try:
+                        ids.append(int(name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)]))
+                    except ValueError:
+                        continue
+        return sorted(ids)
+
+    def read(self, from_segment: int = 0) -> Iterator[Dict[str, Any]]:
+        for segment_id in self.segments():
+            if segment_id < from_segment:
+                continue
+            with open(self.segment_path(segment_id), "r") as f:
+                for line in f:
+                    try:
+                        yield json.loads(line)
+                    except json.JSONDecodeError:
+                        # A torn write can only sit at the tail of a segment
+                        logger.warning("WAL_TORN_RECORD_SKIPPED", {"segment": segment_id})
+                        break
+
+    def open(self, segment_id: int):
+        os.makedirs(self.directory, exist_ok=True)
+        with self._lock:
+            self._open_locked(segment_id)
+
+    def _open_locked(self, segment_id: int):
+        self.active_id = segment_id
+        self._file = open(self.segment_path(segment_id), "a")
+        self._size = self._file.tell()
+
+    def append(self, record: Dict[str, Any]) -> bool:
+        """
+        Appends a record. Returns True once the active segment is full.
+        """
+        line = dumps_compact(record) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._size += len(line)
+            self._unsynced = True
+            return self._size >= self.segment_size
+
+    def sync(self):
+        with self._lock:
+            if not self._unsynced or self._file is None:
+                return
+            self._file.flush()
+            self._unsynced = False
+            # fsync a duplicate descriptor so appends are not blocked on the disk
+            fd = os.dup(self._file.fileno())
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def rotate(self) -> int:
+        """
+        Seals the active segment and starts a new one. Returns the new id.
+        """
+        with self._lock:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+            self._unsynced = False
+            self._open_locked(self.active_id + 1)
+            return self.active_id
+
+    def drop_before(self, segment_id: int):
+        for old_id in self.segments():
+            if old_id < segment_id:
+                os.remove(self.segment_path(old_id))
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+                os.fsync(self._file.fileno())
+                self._file.close()
+                self._file = None
+                self._unsynced = False
+
+class WalStateStore(StateStore):
+    """
+    State store backed by a segmented write-ahead log. Each mutation appends
+    one compact record instead of rewriting the whole document, and a commit
+    is a single fsync of everything appended since the last one. Sealed
+    segments are folded into a checkpoint in the background. Startup loads
+    the last checkpoint and replays the log tail.
+    """
+    def __init__(self, storage_path: str = "storage/state_wal", legacy_path: Optional[str] = None,
+                 segment_size: int = 4 * 1024 * 1024, checkpoint_segments: int = 4,
+                 durability: str = "grouped", flush_interval: float = 0.01, flush_batch_size: int = 100):
+        self.legacy_path = legacy_path
+        self.checkpoint_segments = checkpoint_segments
+        self._log = SegmentedLog(storage_path, segment_size)
+        self._control = ChangeTracker()
+        self._state_ref: Optional[Dict[str, Any]] = None
+        self._checkpointing = threading.Lock()
+        super().__init__(storage_path, durability, flush_interval, flush_batch_size)
+
+    @property
+    def checkpoint_path(self) -> str:
+        return os.path.join(self.storage_path, CHECKPOINT_FILE)
+
+    def _load(self):
+        start_segment = 0
+        checkpoint = self._read_checkpoint()
+        if checkpoint is not None:
+            self._state.update(checkpoint["control"])
+            self._state["tasks"] = checkpoint["tasks"]
+            start_segment = checkpoint["segment"]
+
+        replayed = 0
+        for record in self._log.read(start_segment):
+            self._apply(record)
+            replayed += 1
+
+        segments = self._log.segments()
+        migrate = checkpoint is None and not segments and self.legacy_path and os.path.exists(self.legacy_path)
+        if migrate:
+            with open(self.legacy_path, "r") as f:
+                self._state.update(json.load(f))
+
+        # Never append after a possibly torn tail; always start a fresh segment
+        self._log.open(max(segments[-1] + 1 if segments else 0, start_segment))
+        self._state_ref = self._state
+        self._control.diff(self._state, skip=LOGGED_KEYS)
+
+        if migrate:
+            self.checkpoint()
+            logger.info("WAL_MIGRATED_LEGACY_STATE", {"legacy_path": self.legacy_path})
+        logger.info("WAL_RECOVERED", {"checkpoint_segment": start_segment, "replayed_records": replayed})
+
+    def _read_checkpoint(self) -> Optional[Dict[str, Any]]:
+        if not os.path.exists(self.checkpoint_path):
+            return None
+        with open(self.checkpoint_path, "r") as f:
+            return json.load(f)
+
+    def _apply(self, record: Dict[str, Any]):
+        op = record.get("op")
+        if op == "task":
+            self._state["tasks"][record["id"]] = record["data"]
+        elif op == "tasks":
+            self._state["tasks"].update(record["data"])
+        elif op == "task_del":
+            for task_id in record["ids"]:
+                self._state["tasks"].pop(task_id, None)
+        elif op == "agent":
+            self._state["agents"][record["id"]] = record["data"]
+        elif op == "backup":
+            self._state["backups"].append(record["data"])
+        elif op == "state":
+            self._state.update(record["data"])
+            for key in record.get("removed", []):
+                self._state.pop(key, None)
+        elif op == "reset":
+            self._state.clear()
+            self._state.update(record["data"])
+
+    def _append(self, record: Dict[str, Any]):
+        if self._log.append(record):
+            self._log.rotate()
+            self._maybe_checkpoint()
+        self._mark_dirty()
+
+    def _commit(self):
+        self._log.sync()
+
+    def _save(self):
+        with self.lock:
+            if self._state is not self._state_ref:
+                # The whole document was replaced; log a full image of it
+                self._state_ref = self._state
+                self._control.reset()
+                self._control.diff(self._state, skip=LOGGED_KEYS)
+                self._append({"op": "reset", "data": self._state})
+                return
+
+            changed, removed = self._control.diff(self._state, skip=LOGGED_KEYS)
+            if changed or removed:
+                self._append({"op": "state", "data": changed, "removed": removed})
+
+    def _persist_task(self, task_id: str):
+        self._append({"op": "task", "id": task_id, "data": self._state["tasks"][task_id]})
+
+    def _persist_tasks(self, task_ids: List[str]):
+        tasks = self._state["tasks"]
+        self._append({"op": "tasks", "data": {task_id: tasks[task_id] for task_id in task_ids}})
+
+    def _persist_task_removal(self, task_ids: List[str]):
+        self._append({"op": "task_del", "ids": task_ids})
+
+    def _persist_agent(self, agent_name: str):
+        self._append({"op": "agent", "id": agent_name, "data": self._state["agents"][agent_name]})
+
+    def _persist_agents(self, agent_names: List[str]):
+        for agent_name in agent_names:
+            self._persist_agent(agent_name)
+
+    def _persist_backup(self, backup_metadata: Dict[str, Any]):
+        self._append({"op": "backup", "data": backup_metadata})
+
+    def _maybe_checkpoint(self):
+        sealed = [s for s in self._log.segments() if s < self._log.active_id]
+        if len(sealed) >= self.checkpoint_segments and not self._checkpointing.locked():
+            threading.Thread(target=self._background_checkpoint, name="fog-wal-checkpoint", daemon=True).start()
+
+    def _background_checkpoint(self):
+        try:
+            self.checkpoint()
+        except Exception as e:
+            logger.error("WAL_CHECKPOINT_FAILED", {"error": str(e)})
+
+    def checkpoint(self):
+        """
+        Writes the current state as a checkpoint and drops the segments it covers.
+        """
+        with self._checkpointing:
+            self._write_checkpoint()
+
+    def _write_checkpoint(self):
+        for _ in range(3):
+            with self.lock:
+                segment = self._log.rotate()
+                control = dumps_compact({k: v for k, v in self._state.items() if k != "tasks"})
+                tasks = dict(self._state["tasks"])
+            try:
+                # Task dicts are replaced, not mutated, by update_task, so the
+                # shallow copy can be serialized outside the lock.
+                tasks_json = dumps_compact(tasks)
+                break
+            except RuntimeError:
+                continue
+        else:
+            raise RuntimeError("State kept changing while writing checkpoint")
+
+        tmp_path = self.checkpoint_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            f.write('{"segment":%d,"control":%s,"tasks":%s}' % (segment, control, tasks_json))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.checkpoint_path)
+        self._log.drop_before(segment)
+        logger.info("WAL_CHECKPOINT_WRITTEN", {"segment": segment, "tasks": len(tasks)})
+
+    def close(self):
+        super().close()
+        self._log.close()
@@ -22,6 +22,9 @@ const API = {
 
     // Core System
     getSystemState() { return this.get('/system-state'); },
+    getSystemSummary() { return this.get('/system-state?summary=true'); },
+    getAgents() { return this.get('/agents'); },
+    getTasks(params = {}) { return this.get(`/tasks?${new URLSearchParams(params)}`); },
     getSystemHealth() { return this.get('/system-monitor/health'); },
 
     // Human Control Agent
@@ -87,11 +87,15 @@ class FogDashboard {
     async updateData() {
         try {
             console.log("Fetching system state...");
-            const state = await API.getSystemState();
-            console.log("System state received:", state);
-            this.tasks = state.tasks || {};
-            this.agents = state.agents || {};
-            this.isPaused = state.controls?.is_paused || false;
+            const [summary, agents, page] = await Promise.all([
+                API.getSystemSummary(),
+                API.getAgents(),
+                API.getTasks({ limit: 200 })
+            ]);
+            console.log("System summary received:", summary);
+            this.tasks = Object.fromEntries(page.items.map(task => [task.task_id, task]));
+            this.agents = agents || {};
+            this.isPaused = summary.controls?.is_paused || false;
 
             try {
                 this.approvals = await API.getPendingApprovals();
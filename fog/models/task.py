@@ -23,6 +23,8 @@ class TaskPacket(BaseModel):
     task_type: TaskType
     constraints: List[str] = []
     dependencies: List[str] = []
+    # Results of completed dependencies, keyed by task_id
+    dependency_results: Dict[str, Any] = {}
     business_rules: List[str] = []
     philosophy_tags: List[str] = []
     backup_id: Optional[str] = None
@@ -33,11 +35,30 @@ class TaskPacket(BaseModel):
     result: Optional[Dict[str, Any]] = None
     retries: int = 0
     max_retries: int = 3
+    # Retry bookkeeping: the error that caused the pending retry and when it is due
+    last_error: Optional[str] = None
+    next_retry_at: Optional[datetime] = None
+    # Client-supplied key: a task submitted while another with the same key
+    # is unfinished shares that task's result instead of running again
+    idempotency_key: Optional[str] = None
+    # Set on the duplicate dispatched by hedging, so the engine can tell
+    # which attempt finished first
+    hedge_attempt: bool = False
 
 class AgentConfig(BaseModel):
     name: str
     endpoint: str
     handler_type: str = "http" # e.g., "http", "mock"
+    # Bulkhead settings: concurrent tasks allowed for this agent (None = unlimited)
+    # and its share of dispatch turns relative to other agents
+    max_in_flight: Optional[int] = None
+    weight: int = 1
+    # How a local handler runs: "inline", "thread" or "process" (None = agent default)
+    execution_mode: Optional[str] = None
+    # Hedging: ANALYSIS tasks still running after this latency percentile
+    # (e.g. 0.95) are dispatched again to hedge_agent, or to this agent (None = off)
+    hedge_percentile: Optional[float] = None
+    hedge_agent: Optional[str] = None
 
 class ProjectInput(BaseModel):
     project_path: str
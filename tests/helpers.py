@@ -0,0 +1,23 @@
+import asyncio
+from fog.core.state import state_store
+
+class AsyncWaitMixin:
+    """
+    Polling helpers for IsolatedAsyncioTestCase tests that wait on the
+    engine through the global state store.
+    """
+    async def wait_until(self, predicate, timeout=2.0, message="Condition not reached"):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while loop.time() < deadline:
+            if predicate():
+                return
+            await asyncio.sleep(0.01)
+        self.fail(message)
+
+    async def wait_for_status(self, task_id, status, timeout=2.0):
+        def reached():
+            task_data = state_store.get_task(task_id)
+            return task_data is not None and task_data["status"] == status
+        await self.wait_until(reached, timeout, f"Task {task_id} did not reach {status}")
+        return state_store.get_task(task_id)
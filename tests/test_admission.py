@@ -0,0 +1,82 @@
+import unittest
+from unittest import mock
+from fog.core.admission import AdmissionController, AdmissionRejected, TokenBucket
+from fog.core.engine import OrchestrationEngine
+from fog.core.queue import FairTaskQueue
+from fog.core.state import state_store
+from fog.models.task import TaskPacket, TaskType
+
+def make_task(agent="Agent", priority=0, dependencies=None):
+    return TaskPacket(system_name=agent, module_name="m", task_type=TaskType.ANALYSIS, priority=priority,
+                      dependencies=dependencies or [])
+
+class TestAdmissionController(unittest.TestCase):
+    def test_token_bucket_refills(self):
+        with mock.patch("fog.core.admission.time.monotonic", return_value=100.0) as clock:
+            bucket = TokenBucket(rate=2.0, burst=2)
+            self.assertEqual(bucket.take(), 0)
+            self.assertEqual(bucket.take(), 0)
+            self.assertAlmostEqual(bucket.take(), 0.5)
+            clock.return_value = 100.5
+            self.assertEqual(bucket.take(), 0)
+
+    def test_queue_caps_and_priority_shedding(self):
+        admission = AdmissionController(max_queued=10, max_queued_per_agent=5, shed_at=0.8, shed_priority=1,
+                                        retry_after=2.0)
+        self.assertIsNone(admission.check(make_task(), queued=7, agent_queued=3))
+        # Past 80% of a cap only priority >= 1 is accepted
+        self.assertEqual(admission.check(make_task(), queued=8, agent_queued=0).reason, "shed")
+        self.assertEqual(admission.check(make_task(), queued=0, agent_queued=4).reason, "shed")
+        self.assertIsNone(admission.check(make_task(priority=1), queued=9, agent_queued=4))
+        full = admission.check(make_task(priority=5), queued=10, agent_queued=0)
+        self.assertEqual((full.reason, full.retry_after, full.retry_after_header), ("queue_full", 2.0, "2"))
+        self.assertEqual(admission.check(make_task(priority=5), queued=0, agent_queued=5).reason, "agent_queue_full")
+        self.assertEqual(admission.stats()["rejected"], {"shed": 2, "queue_full": 1, "agent_queue_full": 1})
+
+    def test_client_rate_limit(self):
+        admission = AdmissionController(client_rate=1.0, client_burst=2)
+        self.assertIsNone(admission.check(make_task(), 0, 0, client="a"))
+        self.assertIsNone(admission.check(make_task(), 0, 0, client="a"))
+        limited = admission.check(make_task(), 0, 0, client="a")
+        self.assertEqual(limited.reason, "rate_limited")
+        self.assertGreater(limited.retry_after, 0)
+        # Clients have separate buckets, and a refund returns a token
+        self.assertIsNone(admission.check(make_task(), 0, 0, client="b"))
+        admission.refund("a")
+        self.assertIsNone(admission.check(make_task(), 0, 0, client="a"))
+
+class TestEngineAdmission(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.engine = OrchestrationEngine(queue=FairTaskQueue(aging_interval=None),
+                                          admission=AdmissionController(max_queued_per_agent=2, shed_at=1.0))
+
+    async def test_submit_task_rejected_without_recording(self):
+        for _ in range(2):
+            await self.engine.submit_task(make_task())
+        task = make_task()
+        with self.assertRaises(AdmissionRejected) as rejected:
+            await self.engine.submit_task(task)
+        self.assertEqual(rejected.exception.reason, "agent_queue_full")
+        self.assertIsNone(state_store.get_task(task.task_id))
+        # Other agents still have room
+        await self.engine.submit_task(make_task(agent="Other"))
+        self.assertEqual(self.engine.queue.agent_depth("Other"), 1)
+
+    async def test_bulk_submission_throttles_overflow_and_dependents(self):
+        tasks = [make_task() for _ in range(3)]
+        dependent = make_task(agent="Other", dependencies=[tasks[2].task_id])
+        results = await self.engine.submit_tasks(tasks + [dependent])
+        self.assertEqual([r["status"] for r in results], ["queued", "queued", "throttled", "throttled"])
+        self.assertEqual(results[2]["retry_after"], self.engine.admission.retry_after)
+        self.assertIsNone(state_store.get_task(dependent.task_id))
+
+    async def test_graph_is_admitted_whole_or_not_at_all(self):
+        first, second, third = make_task(), make_task(), make_task()
+        with self.assertRaises(AdmissionRejected):
+            await self.engine.submit_graph([first, second, third], client="c")
+        self.assertIsNone(state_store.get_task(first.task_id))
+        self.assertEqual(self.engine.queue.size(), 0)
+        self.assertEqual(self.engine.admission.admitted, 0)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,123 @@
+import unittest
+import json
+import os
+import shutil
+import tempfile
+from datetime import datetime, timedelta
+from fog.core.archive import TaskArchive
+from fog.core.state import StateStore
+
+def make_task(task_id, agent="AgentA", status="completed", days_ago=0):
+    return {
+        "task_id": task_id,
+        "system_name": agent,
+        "status": status,
+        "timestamp": (datetime.now() - timedelta(days=days_ago)).isoformat()
+    }
+
+class TestTaskArchive(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.archive_dir = os.path.join(self.tmp_dir, "archive")
+        self.store = StateStore(os.path.join(self.tmp_dir, "state.json"))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_count_limit_keeps_hot_set_bounded(self):
+        self.store.configure_retention(TaskArchive(self.archive_dir), max_finished=10)
+        for i in range(100):
+            self.store.update_task(f"t{i}", make_task(f"t{i}"))
+        self.store.update_task("running", make_task("running", status="running"))
+
+        hot = self.store.get_state()["tasks"]
+        self.assertLessEqual(len(hot), 12)
+        self.assertIn("running", hot)
+        self.assertIn("t99", hot)
+        self.assertNotIn("t0", hot)
+
+        # Archived tasks fault back in on demand
+        self.assertEqual(self.store.get_task("t0")["task_id"], "t0")
+        self.assertEqual(self.store.count_tasks(status="completed"), len(hot) - 1)
+
+        # Aggregates still cover archived tasks, including after a restart
+        self.assertEqual(self.store.task_totals()["total"], 101)
+        reopened = StateStore(os.path.join(self.tmp_dir, "state.json"))
+        reopened.configure_retention(TaskArchive(self.archive_dir), max_finished=10)
+        self.assertEqual(reopened.task_aggregates()["AgentA"]["statuses"]["completed"], 100)
+
+    def test_age_limit_and_query(self):
+        archive = TaskArchive(self.archive_dir)
+        self.store.configure_retention(archive, max_age=3600)
+        self.store.update_task("old_a", make_task("old_a", agent="AgentA", days_ago=3))
+        self.store.update_task("old_b", make_task("old_b", agent="AgentB", status="failed", days_ago=2))
+        self.store.update_task("new", make_task("new"))
+        self.store.enforce_retention()
+
+        self.assertEqual(list(self.store.get_state()["tasks"]), ["new"])
+
+        since = datetime.now() - timedelta(days=4)
+        self.assertEqual(len(archive.query(start=since)), 2)
+        self.assertEqual([t["task_id"] for t in archive.query(start=since, agent="AgentB")], ["old_b"])
+        self.assertEqual(archive.query(start=datetime.now() - timedelta(days=1)), [])
+
+        # The index survives a restart
+        reopened = TaskArchive(self.archive_dir)
+        self.assertIn("old_a", reopened)
+        self.assertEqual(len(reopened), 2)
+        self.assertEqual(reopened.get("old_a")["system_name"], "AgentA")
+
+    def test_updating_archived_task_moves_it_back(self):
+        archive = TaskArchive(self.archive_dir)
+        self.store.configure_retention(archive, max_age=3600)
+        self.store.update_task("t1", make_task("t1", days_ago=1))
+        self.store.enforce_retention()
+        self.assertNotIn("t1", self.store.get_state()["tasks"])
+
+        # A late update, as /task-update applies it; the archive's cache is untouched
+        task = self.store.get_task("t1")
+        task["status"] = "failed"
+        self.assertEqual(archive.get("t1")["status"], "completed")
+        self.store.update_task("t1", task)
+
+        self.assertNotIn("t1", archive)
+        totals = self.store.task_totals()
+        self.assertEqual(totals["total"], 1)
+        self.assertEqual(totals["statuses"], {"completed": 0, "failed": 1})
+
+        # The next retention pass archives a single copy, the new one
+        self.store.enforce_retention()
+        self.assertEqual(len(archive), 1)
+        self.assertEqual(self.store.task_totals()["total"], 1)
+        self.assertEqual(archive.get("t1")["status"], "failed")
+        archived = archive.query(start=datetime.now() - timedelta(days=2))
+        self.assertEqual([t["status"] for t in archived], ["failed"])
+        reopened = StateStore(os.path.join(self.tmp_dir, "state.json"))
+        reopened.configure_retention(TaskArchive(self.archive_dir), max_age=3600)
+        self.assertEqual(reopened.task_totals()["statuses"], {"completed": 0, "failed": 1})
+
+    def test_index_stays_on_disk(self):
+        archive = TaskArchive(self.archive_dir, cache_size=2)
+        archive.archive({f"t{i}": make_task(f"t{i}") for i in range(5)})
+        for i in range(5):
+            self.assertEqual(archive.get(f"t{i}")["task_id"], f"t{i}")
+        # Only the faulted-in cache lives in memory, and it is bounded
+        self.assertEqual(len(archive._cache), 2)
+        self.assertEqual(len(archive), 5)
+        self.assertNotIn("missing", archive)
+
+    def test_legacy_index_is_imported(self):
+        archive = TaskArchive(self.archive_dir)
+        archive.archive({"t1": make_task("t1")})
+        partition = archive._partition_of("t1")
+        archive.close()
+        os.remove(os.path.join(self.archive_dir, "index.db"))
+        with open(os.path.join(self.archive_dir, "index.jsonl"), "w") as f:
+            f.write(json.dumps({"id": "t1", "p": partition}) + "\n")
+
+        reopened = TaskArchive(self.archive_dir)
+        self.assertEqual(reopened.get("t1")["task_id"], "t1")
+        self.assertFalse(os.path.exists(os.path.join(self.archive_dir, "index.jsonl")))
+
+if __name__ == "__main__":
+    unittest.main()
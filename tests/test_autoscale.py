@@ -0,0 +1,45 @@
+import unittest
+import asyncio
+from fog.core.autoscale import WorkerAutoscaler
+from fog.core.engine import OrchestrationEngine
+
+class TestWorkerAutoscaler(unittest.TestCase):
+    def test_grows_when_saturated_with_backlog(self):
+        scaler = WorkerAutoscaler(min_workers=1, max_workers=6)
+        self.assertEqual(scaler.decide(2, 2, 5, 0.0, 0.0), (4, "backlog"))
+        # A short queue only counts once its oldest task has waited too long
+        self.assertEqual(scaler.decide(4, 4, 1, 0.2, 0.0), (4, None))
+        self.assertEqual(scaler.decide(4, 4, 1, 2.0, 0.0), (6, "backlog"))
+        self.assertEqual(scaler.decide(6, 6, 50, 5.0, 0.0), (6, None))
+
+    def test_holds_when_workers_idle_or_loop_lags(self):
+        scaler = WorkerAutoscaler(min_workers=1, max_workers=10)
+        # Queued tasks with idle workers are waiting on agent limits
+        self.assertEqual(scaler.decide(4, 2, 20, 5.0, 0.0), (4, None))
+        self.assertEqual(scaler.decide(4, 4, 20, 5.0, 0.5), (4, None))
+
+    def test_shrinks_after_quiet_intervals(self):
+        scaler = WorkerAutoscaler(min_workers=2, max_workers=10, idle_intervals=3)
+        self.assertEqual(scaler.decide(3, 0, 0, 0.0, 0.0), (3, None))
+        self.assertEqual(scaler.decide(3, 0, 0, 0.0, 0.0), (3, None))
+        self.assertEqual(scaler.decide(3, 0, 0, 0.0, 0.0), (2, "idle"))
+        for _ in range(5):
+            self.assertEqual(scaler.decide(2, 0, 0, 0.0, 0.0), (2, None))
+
+class TestEngineAutoscaling(unittest.IsolatedAsyncioTestCase):
+    async def test_engine_retires_idle_workers(self):
+        engine = OrchestrationEngine(autoscaler=WorkerAutoscaler(min_workers=1, max_workers=4, interval=60,
+                                                                  idle_intervals=1))
+        await engine.start(num_workers=10)
+        try:
+            self.assertEqual(engine.worker_stats()["workers"], 4)
+            engine._autoscale(0.0)
+            await asyncio.sleep(0)
+            stats = engine.worker_stats()
+            self.assertEqual(stats["workers"], 3)
+            self.assertEqual(stats["scaling_events"][-1]["reason"], "idle")
+        finally:
+            await engine.stop()
+
+if __name__ == "__main__":
+    unittest.main()
@@ -3,6 +3,7 @@ import asyncio
 import os
 from agents.deployment_automation.automation import DeploymentAutomation
 from agents.deployment_automation.models import DeploymentStatus
+from agents.deployment_automation.registry import deployment_registry
 from fog.core.state import state_store
 
 class TestDeploymentAutomation(unittest.IsolatedAsyncioTestCase):
@@ -44,5 +45,18 @@ class TestDeploymentAutomation(unittest.IsolatedAsyncioTestCase):
         self.assertEqual(rollback_report.status, DeploymentStatus.ROLLED_BACK)
         self.assertEqual(len(rollback_report.actions), 4) # 3 deploy + 1 rollback
 
+    async def test_registry_indexes_status_and_project(self):
+        manifest = self.automation.generate_manifest("test-service", "v1")
+        first = await self.automation.run_deployment(manifest)
+        second = await DeploymentAutomation("other_project").run_deployment(manifest)
+        await self.automation.rollback(first.deployment_id)
+
+        rolled_back = deployment_registry.query(status=DeploymentStatus.ROLLED_BACK.value)
+        self.assertEqual([d["deployment_id"] for d in rolled_back], [first.deployment_id])
+        succeeded = deployment_registry.query(status=DeploymentStatus.SUCCESS.value)
+        self.assertEqual([d["deployment_id"] for d in succeeded], [second.deployment_id])
+        other = deployment_registry.query(project_path=os.path.abspath("other_project"))
+        self.assertEqual([d["deployment_id"] for d in other], [second.deployment_id])
+
 if __name__ == "__main__":
     unittest.main()
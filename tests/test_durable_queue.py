@@ -0,0 +1,117 @@
+import unittest
+import os
+import tempfile
+import time
+from fog.core.engine import OrchestrationEngine
+from fog.core.queue import FairTaskQueue
+from fog.core.queue_journal import QueueJournal, READY, LEASED
+from fog.core.connector import agent_registry, HttpAgentConnector, MockAgentConnector
+from fog.core.completion import completion_registry
+from fog.core.state import state_store
+from fog.models.task import TaskPacket, TaskType, TaskStatus
+from tests.helpers import AsyncWaitMixin
+
+class CountingConnector(MockAgentConnector):
+    def __init__(self, name, endpoint):
+        super().__init__(name, endpoint)
+        self.sent = []
+
+    async def send_task(self, task):
+        self.sent.append(task.task_id)
+        return await super().send_task(task)
+
+class TestDurableQueue(AsyncWaitMixin, unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "queue.db")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def make_queue(self):
+        queue = FairTaskQueue(aging_interval=None)
+        queue.journal = QueueJournal(self.path, visibility_timeout=60)
+        return queue
+
+    async def test_journal_keeps_tasks_until_acked(self):
+        queue = self.make_queue()
+        first = TaskPacket(system_name="A", module_name="m1", task_type=TaskType.ANALYSIS)
+        second = TaskPacket(system_name="A", module_name="m2", task_type=TaskType.ANALYSIS)
+        await queue.enqueue(first)
+        await queue.enqueue(second)
+        await queue.dequeue()
+        queue.close()
+
+        # A new process sees the leased and the queued task, in order
+        queue = self.make_queue()
+        entries = queue.recover()
+        self.assertEqual([data["task_id"] for data, _, _ in entries], [first.task_id, second.task_id])
+        self.assertEqual([state for _, state, _ in entries], [LEASED, READY])
+        self.assertGreater(entries[0][2], time.time())
+        queue.ack(first.task_id)
+        self.assertEqual(queue.journal.counts(), {READY: 1})
+        queue.close()
+
+    async def test_live_owner_keeps_its_tasks(self):
+        owner = QueueJournal(self.path, visibility_timeout=60)
+        task = TaskPacket(system_name="A", module_name="m", task_type=TaskType.ANALYSIS)
+        owner.put(task)
+        owner.lease(task.task_id)
+
+        # Another process must not re-drive a live process's tasks
+        other = QueueJournal(self.path, visibility_timeout=60)
+        self.assertEqual(other.entries(), [])
+        other.close()
+
+        # Once the owner misses its heartbeat, the next process claims the rows
+        time.sleep(0.05)
+        adopter = QueueJournal(self.path, visibility_timeout=0.01)
+        self.assertEqual([data["task_id"] for data, _, _ in adopter.entries()], [task.task_id])
+        late = QueueJournal(self.path, visibility_timeout=60)
+        self.assertEqual(late.entries(), [])
+        for journal in (owner, adopter, late):
+            journal.close()
+
+    async def test_engine_recovers_pending_and_running_tasks(self):
+        agent = CountingConnector("DurableAgent", "http://durable")
+        remote = HttpAgentConnector("DurableRemote", "http://remote")
+        agent_registry.register_agent(agent)
+        agent_registry.register_agent(remote)
+        pending = TaskPacket(system_name="DurableAgent", module_name="pending", task_type=TaskType.ANALYSIS)
+        running = TaskPacket(system_name="DurableRemote", module_name="running", task_type=TaskType.ANALYSIS)
+        lost = TaskPacket(system_name="DurableAgent", module_name="lost", task_type=TaskType.ANALYSIS)
+        done = TaskPacket(system_name="DurableAgent", module_name="done", task_type=TaskType.ANALYSIS)
+
+        # State left behind by a crashed process
+        journal = QueueJournal(self.path)
+        for task in (pending, running, lost, done):
+            journal.put(task)
+        for task in (running, lost, done):
+            journal.lease(task.task_id)
+        journal.close()
+        running.status = TaskStatus.RUNNING
+        lost.status = TaskStatus.RUNNING
+        done.status = TaskStatus.COMPLETED
+        for task in (pending, running, lost, done):
+            state_store.update_task(task.task_id, task.model_dump(mode='json'))
+
+        queue = self.make_queue()
+        engine = OrchestrationEngine(queue=queue)
+        await engine.start(num_workers=1)
+        try:
+            await self.wait_for_status(lost.task_id, TaskStatus.COMPLETED)
+            # Pending tasks and in-process work lost with the crash are re-driven;
+            # the remote agent's running task is awaited, not resent
+            self.assertEqual(agent.sent, [pending.task_id, lost.task_id])
+            self.assertIn(running.task_id, engine._in_flight)
+            self.assertIsNone(engine._in_flight[running.task_id][3])
+
+            completion_registry.resolve(running.task_id, {"status": "completed", "result": {"ok": True}})
+            await self.wait_until(lambda: not queue.journal.counts(), message="Journal not drained")
+            self.assertEqual(state_store.get_task(running.task_id)["result"], {"ok": True})
+        finally:
+            await engine.stop()
+            queue.close()
+
+if __name__ == "__main__":
+    unittest.main()
@@ -2,9 +2,24 @@ import unittest
 import asyncio
 from fog.core.engine import OrchestrationEngine
 from fog.models.task import TaskPacket, TaskType, TaskStatus
-from fog.core.connector import agent_registry, MockAgentConnector
+from fog.core.connector import agent_registry, MockAgentConnector, HttpAgentConnector
+from fog.core.state import state_store
+from fog.core.retry import RetryPolicy
+from tests.helpers import AsyncWaitMixin
 
-class TestOrchestrationEngine(unittest.IsolatedAsyncioTestCase):
+class FlakyConnector(MockAgentConnector):
+    """Fails to accept the first task it is sent."""
+    def __init__(self, name, endpoint):
+        super().__init__(name, endpoint)
+        self.attempts = 0
+
+    async def send_task(self, task):
+        self.attempts += 1
+        if self.attempts == 1:
+            return False
+        return await super().send_task(task)
+
+class TestOrchestrationEngine(AsyncWaitMixin, unittest.IsolatedAsyncioTestCase):
     async def asyncSetUp(self):
         self.engine = OrchestrationEngine()
         self.agent = MockAgentConnector("TestAgent", "http://test")
@@ -41,5 +56,106 @@ class TestOrchestrationEngine(unittest.IsolatedAsyncioTestCase):
         updated_task = state_store.get_task(task.task_id)
         self.assertEqual(updated_task["status"], TaskStatus.COMPLETED)
 
+    async def test_workers_released_after_dispatch(self):
+        agent_registry.register_agent(MockAgentConnector("SlowAgent", "http://slow", delay=0.3))
+        tasks = [TaskPacket(system_name="SlowAgent", module_name="m", task_type=TaskType.ANALYSIS) for _ in range(4)]
+        start = asyncio.get_running_loop().time()
+        for task in tasks:
+            await self.engine.submit_task(task)
+        for task in tasks:
+            await self.wait_for_status(task.task_id, TaskStatus.COMPLETED)
+        # One worker ran all four concurrently instead of one after another
+        self.assertLess(asyncio.get_running_loop().time() - start, 1.0)
+
+    async def test_dispatched_task_times_out(self):
+        await self.engine.stop()
+        self.engine = OrchestrationEngine(task_timeout=0.1)
+        await self.engine.start(num_workers=1)
+        agent_registry.register_agent(HttpAgentConnector("SilentAgent", "http://silent"))
+        task = TaskPacket(system_name="SilentAgent", module_name="m", task_type=TaskType.ANALYSIS, max_retries=1)
+        await self.engine.submit_task(task)
+        task_data = await self.wait_for_status(task.task_id, TaskStatus.FAILED)
+        self.assertEqual(task_data["result"]["error"], "Task timed out")
+
+    async def test_graph_runs_branches_in_parallel(self):
+        agent_registry.register_agent(MockAgentConnector("SlowAgent", "http://slow", delay=0.2))
+        root = TaskPacket(system_name="SlowAgent", module_name="root", task_type=TaskType.ANALYSIS)
+        left = TaskPacket(system_name="SlowAgent", module_name="left", task_type=TaskType.ANALYSIS,
+                          dependencies=[root.task_id])
+        right = TaskPacket(system_name="SlowAgent", module_name="right", task_type=TaskType.ANALYSIS,
+                           dependencies=[root.task_id])
+        join = TaskPacket(system_name="SlowAgent", module_name="join", task_type=TaskType.ANALYSIS,
+                          dependencies=[left.task_id, right.task_id])
+        start = asyncio.get_running_loop().time()
+        await self.engine.submit_graph([join, right, left, root])
+        self.assertEqual(state_store.get_task(join.task_id)["status"], TaskStatus.PENDING)
+
+        task_data = await self.wait_for_status(join.task_id, TaskStatus.COMPLETED)
+        # Three levels of 0.2s; the two branches overlap
+        self.assertLess(asyncio.get_running_loop().time() - start, 0.8)
+        self.assertEqual(set(task_data["dependency_results"]), {left.task_id, right.task_id})
+        self.assertIn("completed by mock agent", task_data["dependency_results"][left.task_id]["message"])
+
+    async def test_failed_dependency_skips_dependents(self):
+        parent = TaskPacket(system_name="MissingAgent", module_name="p", task_type=TaskType.ANALYSIS)
+        child = TaskPacket(system_name="TestAgent", module_name="c", task_type=TaskType.ANALYSIS,
+                           dependencies=[parent.task_id])
+        grandchild = TaskPacket(system_name="TestAgent", module_name="g", task_type=TaskType.ANALYSIS,
+                                dependencies=[child.task_id])
+        await self.engine.submit_graph([parent, child, grandchild])
+        task_data = await self.wait_for_status(grandchild.task_id, TaskStatus.FAILED)
+        self.assertTrue(task_data["result"]["skipped"])
+        self.assertEqual(state_store.get_task(child.task_id)["result"]["error"], f"Dependency {parent.task_id} failed")
+
+    async def test_submit_tasks_in_bulk(self):
+        failed = TaskPacket(system_name="TestAgent", module_name="f", task_type=TaskType.ANALYSIS,
+                            status=TaskStatus.FAILED)
+        state_store.update_task(failed.task_id, failed.model_dump(mode='json'))
+        tasks = [TaskPacket(system_name="TestAgent", module_name=f"m{i}", task_type=TaskType.ANALYSIS) for i in range(50)]
+        dependent = TaskPacket(system_name="TestAgent", module_name="d", task_type=TaskType.ANALYSIS,
+                               dependencies=[tasks[0].task_id])
+        orphan = TaskPacket(system_name="TestAgent", module_name="o", task_type=TaskType.ANALYSIS,
+                            dependencies=[failed.task_id])
+        results = await self.engine.submit_tasks([dependent, orphan] + tasks)
+
+        self.assertEqual([r["task_id"] for r in results], [t.task_id for t in [dependent, orphan] + tasks])
+        self.assertEqual(results[0]["status"], "held")
+        self.assertEqual(results[1], {"task_id": orphan.task_id, "status": "rejected",
+                                      "error": f"Dependency {failed.task_id} failed"})
+        self.assertTrue(all(r["status"] == "queued" for r in results[2:]))
+        for task in tasks + [dependent]:
+            await self.wait_for_status(task.task_id, TaskStatus.COMPLETED)
+
+        with self.assertRaises(ValueError):
+            await self.engine.submit_tasks([tasks[0], tasks[0]])
+
+    async def test_graph_rejects_cycles(self):
+        first = TaskPacket(system_name="TestAgent", module_name="a", task_type=TaskType.ANALYSIS)
+        second = TaskPacket(system_name="TestAgent", module_name="b", task_type=TaskType.ANALYSIS,
+                            dependencies=[first.task_id])
+        first.dependencies = [second.task_id]
+        with self.assertRaises(ValueError):
+            await self.engine.submit_graph([first, second])
+
+    async def test_failed_dispatch_retries_after_backoff(self):
+        await self.engine.stop()
+        self.engine = OrchestrationEngine(retry_policies={"dispatch": RetryPolicy(base_delay=0.2, jitter=0.0)})
+        await self.engine.start(num_workers=1)
+        agent_registry.register_agent(FlakyConnector("FlakyAgent", "http://flaky"))
+        task = TaskPacket(system_name="FlakyAgent", module_name="m", task_type=TaskType.ANALYSIS)
+        await self.engine.submit_task(task)
+
+        await asyncio.sleep(0.1)
+        # Waiting in the delayed set, not in the queue
+        task_data = state_store.get_task(task.task_id)
+        self.assertEqual(task_data["last_error"], "Failed to send task to agent")
+        self.assertIsNotNone(task_data["next_retry_at"])
+        self.assertIn(task.task_id, self.engine.delayed.pending())
+        self.assertEqual(self.engine.queue.size(), 0)
+
+        task_data = await self.wait_for_status(task.task_id, TaskStatus.COMPLETED)
+        self.assertEqual(task_data["retries"], 1)
+        self.assertIsNone(task_data["next_retry_at"])
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,62 @@
+import unittest
+import asyncio
+import os
+import shutil
+import tempfile
+from fog.core.connector import LocalAgentConnector
+from fog.core.handler_pool import HandlerProcessPool, handler_module
+from fog.core.state import state_store
+from fog.models.task import TaskPacket, TaskType, TaskStatus
+
+class TestHandlerExecutionModes(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        with open(os.path.join(self.tmp_dir, "app.py"), "w") as f:
+            f.write("import os\n\ndef main(x):\n    if x:\n        return 1\n    return 2\n")
+
+    async def asyncTearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    async def run_task(self, connector):
+        task = TaskPacket(system_name=connector.name, module_name="quality", task_type=TaskType.ANALYSIS,
+                          payload={"project_path": self.tmp_dir})
+        await connector._run_local_handler(task)
+        return state_store.get_task(task.task_id)
+
+    def test_modes_and_module_resolution(self):
+        self.assertEqual(handler_module("CodeQuality"), "agents.code_quality.handler")
+        self.assertEqual(LocalAgentConnector("CodeQuality", "local://code_quality").execution_mode, "process")
+        self.assertEqual(LocalAgentConnector("FrictionSolver", "local://friction_solver").execution_mode, "inline")
+        with self.assertRaises(ValueError):
+            LocalAgentConnector("CodeQuality", "local://code_quality", "gpu")
+
+    async def test_thread_and_process_match_inline(self):
+        inline = await self.run_task(LocalAgentConnector("CodeQuality", "local://code_quality", "inline"))
+        threaded = await self.run_task(LocalAgentConnector("CodeQuality", "local://code_quality", "thread"))
+        self.assertEqual(inline["status"], TaskStatus.COMPLETED)
+        self.assertEqual(threaded["result"]["summary_stats"], inline["result"]["summary_stats"])
+
+        import fog.core.connector as connector_module
+        pool = HandlerProcessPool(max_workers=1)
+        original, connector_module.handler_pool = connector_module.handler_pool, pool
+        try:
+            connector = LocalAgentConnector("CodeQuality", "local://code_quality", "process")
+            await pool.warm()
+            # The event loop keeps running while the child process works
+            ticks = 0
+            async def tick():
+                nonlocal ticks
+                while True:
+                    ticks += 1
+                    await asyncio.sleep(0.001)
+            ticker = asyncio.create_task(tick())
+            processed = await self.run_task(connector)
+            ticker.cancel()
+            self.assertEqual(processed["result"]["summary_stats"], inline["result"]["summary_stats"])
+            self.assertGreater(ticks, 0)
+        finally:
+            connector_module.handler_pool = original
+            pool.shutdown()
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,46 @@
+import unittest
+from unittest import mock
+from fog.core.handlers import HandlerRegistry
+from fog.core.connector import LocalAgentConnector
+from fog.core.state import state_store
+from fog.models.task import TaskPacket, TaskType, TaskStatus
+import agents.sandbox_simulation.handler as sandbox_handler
+
+class TestHandlerRegistry(unittest.IsolatedAsyncioTestCase):
+    async def test_resolves_once_and_reloads(self):
+        registry = HandlerRegistry()
+        handler = registry.register("SandboxSimulation")
+        self.assertIs(handler, sandbox_handler.handle_task)
+        with mock.patch("fog.core.handlers.importlib.import_module") as import_module:
+            self.assertIs(registry.resolve("SandboxSimulation"), handler)
+            import_module.assert_not_called()
+
+        self.assertIsNone(registry.register("NoSuchAgent"))
+        with self.assertRaises(ImportError):
+            registry.resolve("NoSuchAgent")
+
+        self.assertEqual(registry.reload("SandboxSimulation"), ["SandboxSimulation"])
+        self.assertIsNot(registry.resolve("SandboxSimulation"), handler)
+
+    async def test_warm_builds_shared_objects(self):
+        registry = HandlerRegistry()
+        registry.register("SandboxSimulation")
+        import agents.sandbox_simulation.handler as module
+        module._simulator = None
+        await registry.warm()
+        self.assertIsNotNone(module._simulator)
+
+    async def test_connector_dispatches_registered_handler(self):
+        connector = LocalAgentConnector("SandboxSimulation", "local://sandbox_simulation")
+        task = TaskPacket(system_name="SandboxSimulation", module_name="sim", task_type=TaskType.VERIFICATION,
+                          payload={})
+        with mock.patch("fog.core.handlers.importlib.import_module") as import_module:
+            await connector._run_local_handler(task)
+            import_module.assert_not_called()
+        # The handler ran and rejected the incomplete simulation config
+        task_data = state_store.get_task(task.task_id)
+        self.assertEqual(task_data["status"], TaskStatus.FAILED)
+        self.assertIn("project_path", task_data["result"]["error"])
+
+if __name__ == "__main__":
+    unittest.main()
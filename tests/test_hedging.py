@@ -0,0 +1,105 @@
+import unittest
+import asyncio
+from fog.core.connector import agent_registry, MockAgentConnector
+from fog.core.engine import OrchestrationEngine
+from fog.core.hedging import Hedger, LatencyWindow
+from fog.core.retry import RetryBudget
+from fog.core.state import state_store
+from fog.models.task import TaskPacket, TaskType, TaskStatus
+from tests.helpers import AsyncWaitMixin
+
+def make_task(agent, task_type=TaskType.ANALYSIS):
+    return TaskPacket(system_name=agent, module_name="m", task_type=task_type)
+
+class StuckConnector(MockAgentConnector):
+    """Mock agent whose attempts hang; optionally unable to cancel them."""
+    def __init__(self, name, endpoint, cancellable=True):
+        super().__init__(name, endpoint, delay=30)
+        self.cancellable = cancellable
+
+    def cancel_task(self, task_id):
+        return super().cancel_task(task_id) and self.cancellable
+
+class TestHedger(unittest.TestCase):
+    def test_latency_percentile(self):
+        window = LatencyWindow(size=100)
+        self.assertIsNone(window.percentile(0.95))
+        for rtt in range(1, 101):
+            window.observe(rtt / 100)
+        self.assertEqual(window.percentile(0.95), 0.95)
+        self.assertEqual(window.percentile(0.5), 0.5)
+
+    def test_delay_needs_samples_and_analysis_tasks(self):
+        hedger = Hedger(min_samples=3, max_ratio=0.5)
+        hedger.configure("Agent", 0.95)
+        self.assertIsNone(hedger.delay(make_task("Agent")))
+        for rtt in (0.1, 0.2, 0.3):
+            hedger.observe("Agent", rtt)
+        self.assertEqual(hedger.delay(make_task("Agent")), 0.3)
+        self.assertIsNone(hedger.delay(make_task("Agent", TaskType.MODIFICATION)))
+        self.assertIsNone(hedger.delay(make_task("Other")))
+        # Asking for the delay spends nothing from the budget
+        self.assertEqual(hedger.stats()["Agent"]["eligible"], 0)
+        self.assertFalse(hedger.allow("Agent"))
+
+        for task in (make_task("Agent"), make_task("Agent"), make_task("Agent", TaskType.MODIFICATION)):
+            hedger.note_eligible(task)
+        # Two eligible tasks: a ratio of 0.5 allows one hedge
+        self.assertTrue(hedger.allow("Agent"))
+        self.assertFalse(hedger.allow("Agent"))
+        self.assertEqual(hedger.stats()["Agent"]["hedge_rate"], 0.5)
+        with self.assertRaises(ValueError):
+            hedger.configure("Agent", 95)
+
+class TestEngineHedging(AsyncWaitMixin, unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.hedger = Hedger(min_samples=3, max_ratio=1.0)
+        self.engine = OrchestrationEngine(hedger=self.hedger, retry_budget=RetryBudget(max_retries=0))
+        agent_registry.register_agent(MockAgentConnector("HedgeReplica", "http://replica", delay=0.01))
+        await self.engine.start(num_workers=1)
+
+    async def asyncTearDown(self):
+        await self.engine.stop()
+
+    def configure(self, agent, cancellable=True):
+        connector = StuckConnector(agent, "http://stuck", cancellable)
+        agent_registry.register_agent(connector)
+        self.engine.configure_agent({"name": agent, "hedge_percentile": 0.95, "hedge_agent": "HedgeReplica"})
+        for _ in range(3):
+            self.hedger.observe(agent, 0.05)
+        return connector
+
+    async def test_slow_task_won_by_hedge(self):
+        primary = self.configure("HedgedAgent")
+        task = make_task("HedgedAgent")
+        await self.engine.submit_task(task)
+
+        task_data = await self.wait_for_status(task.task_id, TaskStatus.COMPLETED)
+        self.assertIn("HedgeReplica", task_data["result"]["message"])
+        # The losing attempt was cancelled, and the engine recorded the winner's result
+        await asyncio.sleep(0.05)
+        self.assertFalse(state_store.get_task(task.task_id)["hedge_attempt"])
+        self.assertEqual(primary._running, {})
+        self.assertEqual(primary.limiter.in_flight, 0)
+        stats = self.engine.hedge_stats()["HedgedAgent"]
+        self.assertEqual((stats["hedged"], stats["hedge_wins"], stats["primary_wins"]), (1, 1, 0))
+
+    async def test_late_update_from_uncancellable_loser_is_dropped(self):
+        self.configure("RemoteAgent", cancellable=False)
+        task = make_task("RemoteAgent")
+        await self.engine.submit_task(task)
+        await self.wait_for_status(task.task_id, TaskStatus.COMPLETED)
+        await asyncio.sleep(0.05)
+        self.assertTrue(self.engine.absorb_late_update(task.task_id))
+        self.assertFalse(self.engine.absorb_late_update(task.task_id))
+
+    async def test_unhedged_agents_and_task_types(self):
+        agent_registry.register_agent(MockAgentConnector("PlainAgent", "http://plain"))
+        task = make_task("PlainAgent")
+        await self.engine.submit_task(task)
+        await self.wait_for_status(task.task_id, TaskStatus.COMPLETED)
+        self.assertEqual(self.engine._hedges, {})
+        self.assertNotIn("PlainAgent", self.engine.hedge_stats())
+
+if __name__ == "__main__":
+    unittest.main()
@@ -10,8 +10,10 @@ from fog.core.connector import agent_registry, MockAgentConnector
 from fog.core.queue import task_queue
 from agents.human_control_interface.control import HumanControlInterface
 from agents.human_control_interface.models import ApprovalStatus
+from agents.human_control_interface.registry import approval_registry
+from tests.helpers import AsyncWaitMixin
 
-class TestHumanControl(unittest.IsolatedAsyncioTestCase):
+class TestHumanControl(AsyncWaitMixin, unittest.IsolatedAsyncioTestCase):
     async def asyncSetUp(self):
         # Reset task queue for the new event loop
         task_queue.queue = asyncio.Queue()
@@ -57,6 +59,30 @@ class TestHumanControl(unittest.IsolatedAsyncioTestCase):
         self.hci.toggle_agent(self.agent_name, True)
         self.assertTrue(self.hci.get_agent_toggles()[self.agent_name])
 
+    async def test_approval_index(self):
+        first = TaskPacket(system_name=self.agent_name, module_name="m", task_type=TaskType.DEPLOYMENT)
+        second = TaskPacket(system_name=self.agent_name, module_name="m", task_type=TaskType.DEPLOYMENT)
+        request = self.hci.request_approval(first, requester="tester")
+        self.hci.request_approval(second, requester="tester")
+        self.assertIsNone(self.hci.get_task_approval_status("unknown"))
+        self.assertEqual(self.hci.get_task_approval_status(first.task_id), ApprovalStatus.PENDING)
+
+        self.hci.approve_request(request.request_id, "admin")
+        self.assertEqual(self.hci.get_task_approval_status(first.task_id), ApprovalStatus.APPROVED)
+        self.assertEqual([a.task_id for a in self.hci.get_pending_approvals()], [second.task_id])
+
+    async def test_approval_query_uses_status_and_agent(self):
+        first = TaskPacket(system_name=self.agent_name, module_name="m", task_type=TaskType.DEPLOYMENT)
+        other = TaskPacket(system_name="other_agent", module_name="m", task_type=TaskType.DEPLOYMENT)
+        request = self.hci.request_approval(first, requester="tester")
+        self.hci.request_approval(other, requester="tester")
+        self.hci.reject_request(request.request_id, "admin")
+
+        self.assertEqual([a["task_id"] for a in approval_registry.query(status="rejected")], [first.task_id])
+        self.assertEqual([a["task_id"] for a in approval_registry.query(agent="other_agent")], [other.task_id])
+        self.assertEqual(approval_registry.query(status="pending", agent=self.agent_name), [])
+        self.assertEqual(len(approval_registry.query()), 2)
+
     async def test_high_risk_task_requires_approval(self):
         task = TaskPacket(
             system_name=self.agent_name,
@@ -131,5 +157,34 @@ class TestHumanControl(unittest.IsolatedAsyncioTestCase):
         await self.engine.stop()
         shutil.rmtree("test_project_rejected")
 
+    async def test_parked_task_frees_worker(self):
+        deployment = TaskPacket(system_name=self.agent_name, module_name="m", task_type=TaskType.DEPLOYMENT)
+        analysis = TaskPacket(system_name=self.agent_name, module_name="m", task_type=TaskType.ANALYSIS)
+
+        await self.engine.start(num_workers=1)
+        await self.engine.submit_task(deployment)
+        await self.engine.submit_task(analysis)
+        # The only worker is not held by the pending approval
+        await self.wait_for_status(analysis.task_id, TaskStatus.COMPLETED)
+        self.assertEqual(len(self.engine.parking), 1)
+        self.assertEqual(self.engine.queue.size(), 0)
+
+        request = self.hci.get_pending_approvals()[0]
+        self.hci.approve_request(request.request_id, "admin")
+        await self.wait_for_status(deployment.task_id, TaskStatus.COMPLETED)
+        self.assertEqual(len(self.engine.parking), 0)
+        await self.engine.stop()
+
+    async def test_approval_ttl_rejects_parked_task(self):
+        self.engine = OrchestrationEngine(approval_ttl=0.1)
+        task = TaskPacket(system_name=self.agent_name, module_name="m", task_type=TaskType.DEPLOYMENT)
+
+        await self.engine.start(num_workers=1)
+        await self.engine.submit_task(task)
+        task_data = await self.wait_for_status(task.task_id, TaskStatus.FAILED)
+        self.assertIn("Approval timed out", task_data["result"]["error"])
+        self.assertEqual(self.hci.get_task_approval_status(task.task_id), ApprovalStatus.REJECTED)
+        await self.engine.stop()
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,41 @@
+import unittest
+from fog.core.limiter import AdaptiveLimiter
+
+class TestAdaptiveLimiter(unittest.TestCase):
+    def test_grows_while_latency_is_flat(self):
+        limiter = AdaptiveLimiter(initial_limit=4)
+        for _ in range(50):
+            # Saturated: every slot is in use when a task completes
+            limiter.in_flight = limiter.current
+            limiter.on_success(0.1)
+        self.assertGreater(limiter.current, 8)
+        self.assertAlmostEqual(limiter.min_rtt, 0.1)
+
+    def test_idle_agent_does_not_grow(self):
+        limiter = AdaptiveLimiter(initial_limit=10)
+        for _ in range(50):
+            limiter.on_dispatch()
+            limiter.on_success(0.1)
+        self.assertEqual(limiter.current, 10)
+
+    def test_backs_off_on_latency_and_drops(self):
+        limiter = AdaptiveLimiter(initial_limit=20)
+        limiter.on_dispatch()
+        limiter.on_success(0.1)
+        for _ in range(10):
+            limiter.on_dispatch()
+            limiter.on_success(1.0)
+        self.assertLess(limiter.current, 20)
+
+        before = limiter.limit
+        limiter.on_dispatch()
+        limiter.on_drop("timeout")
+        self.assertAlmostEqual(limiter.limit, max(1, before * 0.5))
+        for _ in range(20):
+            limiter.on_dispatch()
+            limiter.on_drop("timeout")
+        self.assertEqual(limiter.current, 1)
+        self.assertEqual(limiter.in_flight, 0)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,119 @@
+import unittest
+import asyncio
+import os
+import shutil
+from fog.core.engine import OrchestrationEngine
+from fog.core.queue import FairTaskQueue
+from fog.core.connector import agent_registry, LocalAgentConnector, MockAgentConnector
+from fog.core.state import state_store
+from fog.models.task import TaskPacket, TaskType, TaskStatus
+from tests.helpers import AsyncWaitMixin
+
+class BatchingConnector(MockAgentConnector):
+    """Mock agent that accepts batches and records their sizes."""
+    def __init__(self, name, endpoint):
+        super().__init__(name, endpoint)
+        self.batches = []
+        self.single = 0
+
+    def supports_batch(self):
+        return True
+
+    async def send_task(self, task):
+        self.single += 1
+        return await super().send_task(task)
+
+    async def send_batch(self, tasks):
+        self.batches.append(len(tasks))
+        for task in tasks:
+            asyncio.create_task(self._simulate_processing(task))
+        return True
+
+class TestMicroBatching(AsyncWaitMixin, unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.test_dir = "tests/test_batching_tmp"
+        os.makedirs(self.test_dir, exist_ok=True)
+        self.engine = OrchestrationEngine(queue=FairTaskQueue(aging_interval=None), batch_size=4, batch_window=0.05)
+
+    async def asyncTearDown(self):
+        await self.engine.stop()
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    async def test_queued_tasks_dispatched_together(self):
+        agent = BatchingConnector("BatchAgent", "http://batch")
+        agent_registry.register_agent(agent)
+        tasks = [TaskPacket(system_name="BatchAgent", module_name=f"m{i}", task_type=TaskType.ANALYSIS)
+                 for i in range(6)]
+        await self.engine.submit_tasks(tasks)
+        await self.engine.start(num_workers=1)
+
+        for task in tasks:
+            await self.wait_for_status(task.task_id, TaskStatus.COMPLETED)
+        self.assertEqual(agent.batches, [4, 2])
+        self.assertEqual(agent.single, 0)
+
+    async def test_agent_without_batch_handler_gets_single_tasks(self):
+        agent = MockAgentConnector("SingleAgent", "http://single")
+        self.assertFalse(agent.supports_batch())
+        agent_registry.register_agent(agent)
+        tasks = [TaskPacket(system_name="SingleAgent", module_name=f"m{i}", task_type=TaskType.ANALYSIS)
+                 for i in range(3)]
+        await self.engine.submit_tasks(tasks)
+        await self.engine.start(num_workers=1)
+        for task in tasks:
+            await self.wait_for_status(task.task_id, TaskStatus.COMPLETED)
+
+    async def test_batch_for_unregistered_agent_fails(self):
+        tasks = [TaskPacket(system_name="GoneBatchAgent", module_name=f"m{i}", task_type=TaskType.ANALYSIS)
+                 for i in range(2)]
+        await self.engine._process_batch(tasks)
+        for task in tasks:
+            task_data = state_store.get_task(task.task_id)
+            # Failed at once, as a single task would be: no retry, no budget spent
+            self.assertEqual(task_data["status"], TaskStatus.FAILED)
+            self.assertEqual(task_data["retries"], 0)
+            self.assertEqual(task_data["result"]["error"], "Agent GoneBatchAgent not found")
+
+    async def test_local_batch_attempt_is_tracked(self):
+        connector = LocalAgentConnector("SecurityAnalyzer", "local://security_analyzer", "inline")
+        tasks = [TaskPacket(system_name="SecurityAnalyzer", module_name="s", task_type=TaskType.ANALYSIS)
+                 for _ in range(2)]
+
+        async def slow_batch(batch):
+            await asyncio.sleep(30)
+        connector._run_local_batch = slow_batch
+        await connector.send_batch(tasks)
+        attempts = [connector._running[task.task_id] for task in tasks]
+        self.assertEqual(attempts[0], attempts[1])
+
+        # The one attempt runs every task in the batch
+        self.assertTrue(connector.cancel_task(tasks[0].task_id))
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        self.assertEqual(connector._running, {})
+
+    async def test_local_batch_results_fan_out(self):
+        safe_file = os.path.join(self.test_dir, "safe.py")
+        with open(safe_file, "w") as f:
+            f.write("x = 1\n")
+        connector = LocalAgentConnector("SecurityAnalyzer", "local://security_analyzer", "inline")
+        self.assertTrue(connector.supports_batch())
+        tasks = [
+            TaskPacket(system_name="SecurityAnalyzer", module_name="s", task_type=TaskType.ANALYSIS,
+                       payload={"file_path": safe_file}),
+            TaskPacket(system_name="SecurityAnalyzer", module_name="s", task_type=TaskType.ANALYSIS,
+                       payload={}),
+            TaskPacket(system_name="SecurityAnalyzer", module_name="s", task_type=TaskType.ANALYSIS,
+                       payload={"file_path": os.path.join(self.test_dir, "missing.py")}),
+        ]
+        await connector._run_local_batch(tasks)
+
+        results = [state_store.get_task(task.task_id) for task in tasks]
+        self.assertEqual(results[0]["status"], TaskStatus.COMPLETED)
+        self.assertEqual(results[0]["result"]["file_path"], safe_file)
+        self.assertEqual(results[1]["status"], TaskStatus.FAILED)
+        self.assertIn("Missing project_path", results[1]["result"]["error"])
+        self.assertEqual(results[2]["status"], TaskStatus.FAILED)
+
+if __name__ == "__main__":
+    unittest.main()
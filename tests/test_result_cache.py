@@ -0,0 +1,119 @@
+import unittest
+import os
+import shutil
+import tempfile
+from unittest import mock
+from fog.core.result_cache import ResultCache, fingerprint_path
+from fog.core.engine import OrchestrationEngine
+from fog.core.connector import agent_registry, MockAgentConnector
+from fog.core.state import state_store
+from fog.models.task import TaskPacket, TaskType, TaskStatus
+from tests.helpers import AsyncWaitMixin
+
+class CountingConnector(MockAgentConnector):
+    def __init__(self, name, endpoint, delay=0.0):
+        super().__init__(name, endpoint, delay)
+        self.sent = []
+
+    async def send_task(self, task):
+        self.sent.append(task.task_id)
+        return await super().send_task(task)
+
+def make_task(project_path, agent="CacheAgent", **kwargs):
+    return TaskPacket(system_name=agent, module_name="m", task_type=TaskType.ANALYSIS,
+                      payload={"project_path": project_path, "options": {"b": 1, "a": 2}}, **kwargs)
+
+class TestResultCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        with open(os.path.join(self.tmp_dir, "app.py"), "w") as f:
+            f.write("x = 1\n")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_key_follows_payload_and_file_contents(self):
+        cache = ResultCache(agents=["CacheAgent"])
+        key = cache.key_for(make_task(self.tmp_dir))
+        reordered = make_task(self.tmp_dir)
+        reordered.payload = {"options": {"a": 2, "b": 1}, "project_path": self.tmp_dir}
+        self.assertEqual(cache.key_for(reordered), key)
+        self.assertIsNone(cache.key_for(make_task(self.tmp_dir, agent="Other")))
+        self.assertIsNone(cache.key_for(make_task(os.path.join(self.tmp_dir, "missing"))))
+
+        with open(os.path.join(self.tmp_dir, "app.py"), "a") as f:
+            f.write("y = 2\n")
+        self.assertNotEqual(cache.key_for(make_task(self.tmp_dir)), key)
+        self.assertNotEqual(fingerprint_path(self.tmp_dir), fingerprint_path(os.path.join(self.tmp_dir, "app.py")))
+
+        # A batch fingerprints each project once
+        with mock.patch("fog.core.result_cache.fingerprint_path", wraps=fingerprint_path) as fingerprint:
+            keys = cache.keys_for([make_task(self.tmp_dir), make_task(self.tmp_dir)])
+        self.assertEqual(keys, [cache.key_for(make_task(self.tmp_dir))] * 2)
+        fingerprint.assert_called_once()
+
+    def test_lru_eviction_and_ttl(self):
+        cache = ResultCache(max_entries=2, ttl=10)
+        cache.put("a", "t1", {"v": 1})
+        cache.put("b", "t2", {"v": 2})
+        cache.get("a")
+        cache.put("c", "t3", {"v": 3})
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), ({"v": 1}, "t1"))
+        # Error results are never cached
+        cache.put("d", "t4", {"error": "boom"})
+        self.assertIsNone(cache.get("d"))
+        with mock.patch("fog.core.result_cache.time.monotonic", return_value=1e12):
+            self.assertIsNone(cache.get("a"))
+
+class TestEngineResultCache(AsyncWaitMixin, unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.agent = CountingConnector("CacheAgent", "http://cache", delay=0.1)
+        agent_registry.register_agent(self.agent)
+        self.engine = OrchestrationEngine(result_cache=ResultCache(agents=["CacheAgent"]))
+        await self.engine.start(num_workers=2)
+
+    async def asyncTearDown(self):
+        await self.engine.stop()
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    async def test_resubmission_completes_from_cache(self):
+        first = make_task(self.tmp_dir)
+        await self.engine.submit_task(first)
+        await self.wait_for_status(first.task_id, TaskStatus.COMPLETED)
+        # The agent records its result before the engine finishes the task
+        await self.wait_until(lambda: self.engine.result_cache.stats()["entries"], message="Result not cached")
+
+        second = make_task(self.tmp_dir)
+        await self.engine.submit_task(second)
+        task_data = state_store.get_task(second.task_id)
+        self.assertEqual(task_data["status"], TaskStatus.COMPLETED)
+        self.assertTrue(task_data["result"]["cached"])
+        self.assertEqual(task_data["result"]["cached_from"], first.task_id)
+        self.assertEqual(self.agent.sent, [first.task_id])
+
+        results = await self.engine.submit_tasks([make_task(self.tmp_dir)])
+        self.assertEqual(results[0]["status"], "cached")
+
+    async def test_idempotency_key_dedupes_in_flight(self):
+        first = make_task(self.tmp_dir, agent="Uncached", idempotency_key="job-1")
+        second = make_task(self.tmp_dir, agent="Uncached", idempotency_key="job-1")
+        agent = CountingConnector("Uncached", "http://uncached", delay=0.1)
+        agent_registry.register_agent(agent)
+        await self.engine.submit_task(first)
+        results = await self.engine.submit_tasks([second])
+        self.assertEqual(results[0]["status"], "deduplicated")
+
+        task_data = await self.wait_for_status(second.task_id, TaskStatus.COMPLETED)
+        self.assertEqual(task_data["result"]["deduplicated_from"], first.task_id)
+        self.assertEqual(agent.sent, [first.task_id])
+
+        # Once the first finished, the key is free to run again
+        third = make_task(self.tmp_dir, agent="Uncached", idempotency_key="job-1")
+        await self.engine.submit_task(third)
+        await self.wait_for_status(third.task_id, TaskStatus.COMPLETED)
+        self.assertEqual(agent.sent, [first.task_id, third.task_id])
+
+if __name__ == "__main__":
+    unittest.main()
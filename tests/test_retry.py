@@ -0,0 +1,43 @@
+import unittest
+import asyncio
+from unittest import mock
+from fog.core.retry import RetryPolicy, RetryBudget, DelayedTasks, classify_error
+from fog.models.task import TaskPacket, TaskType
+
+class TestRetry(unittest.IsolatedAsyncioTestCase):
+    def test_backoff_grows_and_caps(self):
+        policy = RetryPolicy(base_delay=1.0, multiplier=2.0, max_delay=5.0, jitter=0.0)
+        self.assertEqual([policy.delay(n) for n in range(1, 6)], [1.0, 2.0, 4.0, 5.0, 5.0])
+
+        jittered = RetryPolicy(base_delay=4.0, jitter=0.5)
+        for _ in range(20):
+            self.assertTrue(2.0 <= jittered.delay(1) <= 4.0)
+
+    def test_classify_error(self):
+        self.assertEqual(classify_error("Task timed out"), "timeout")
+        self.assertEqual(classify_error("Failed to send task to agent"), "dispatch")
+        self.assertEqual(classify_error("Agent X is currently disabled"), "agent_disabled")
+        self.assertEqual(classify_error("boom"), "default")
+
+    def test_budget_per_agent_window(self):
+        budget = RetryBudget(max_retries=2, window=10.0)
+        with mock.patch("fog.core.retry.time.monotonic", return_value=100.0):
+            self.assertTrue(budget.allow("A"))
+            self.assertTrue(budget.allow("A"))
+            self.assertFalse(budget.allow("A"))
+            self.assertTrue(budget.allow("B"))
+        with mock.patch("fog.core.retry.time.monotonic", return_value=111.0):
+            self.assertTrue(budget.allow("A"))
+
+    async def test_delayed_tasks_fire_in_due_order(self):
+        fired = []
+        delayed = DelayedTasks(lambda task: fired.append(task.module_name))
+        for name, delay in [("late", 0.15), ("early", 0.05), ("middle", 0.1)]:
+            delayed.schedule(TaskPacket(system_name="A", module_name=name, task_type=TaskType.ANALYSIS), delay)
+        self.assertEqual(len(delayed), 3)
+        await asyncio.sleep(0.3)
+        self.assertEqual(fired, ["early", "middle", "late"])
+        self.assertEqual(len(delayed), 0)
+
+if __name__ == "__main__":
+    unittest.main()
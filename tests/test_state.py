@@ -0,0 +1,149 @@
+import unittest
+import os
+import shutil
+import tempfile
+import time
+from datetime import datetime
+from unittest import mock
+from fog.core.state import StateStore, create_state_store
+from fog.models.task import TaskStatus
+
+class TestStateStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.store = StateStore(os.path.join(self.tmp_dir, "state.json"))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_status_and_agent_indexes(self):
+        self.store.update_task("t1", {"task_id": "t1", "system_name": "AgentA", "status": "pending"})
+        self.store.update_task("t2", {"task_id": "t2", "system_name": "AgentB", "status": "failed"})
+        self.store.update_task("t1", {"task_id": "t1", "system_name": "AgentA", "status": TaskStatus.FAILED})
+
+        self.assertCountEqual([t["task_id"] for t in self.store.tasks_by_status(TaskStatus.FAILED)], ["t1", "t2"])
+        self.assertEqual(self.store.count_tasks(status="pending"), 0)
+        self.assertEqual(self.store.count_tasks(agent="AgentA"), 1)
+        self.assertEqual(len(self.store.tasks_for_agent("AgentB", "failed")), 1)
+
+    def test_index_follows_direct_writes(self):
+        self.store.get_state()["tasks"] = {
+            "x": {"task_id": "x", "system_name": "AgentA", "status": "completed"}
+        }
+        self.assertEqual(self.store.count_tasks(status="completed"), 1)
+        self.assertEqual(self.store.task_agents(), ["AgentA"])
+
+    def test_index_follows_in_place_status_changes(self):
+        self.store.update_task("t1", {"task_id": "t1", "system_name": "AgentA", "status": "running"})
+        self.assertEqual(self.store.count_tasks(status="running"), 1)
+
+        # Same number of tasks, new status: the revision counter catches it
+        self.store.get_state()["tasks"]["t1"] = {"task_id": "t1", "system_name": "AgentA", "status": "failed"}
+        self.assertEqual(self.store.count_tasks(status="running"), 0)
+        self.assertEqual(self.store.count_tasks(status="failed", agent="AgentA"), 1)
+        self.assertEqual(self.store.task_totals()["statuses"]["failed"], 1)
+
+        # Edited stored dicts are re-indexed once written back
+        task = self.store.get_task("t1")
+        task["status"] = "completed"
+        self.store.update_task("t1", task)
+        self.assertEqual(self.store.count_tasks(status="failed"), 0)
+        self.assertEqual(self.store.count_tasks(status="completed"), 1)
+        self.assertEqual(self.store.task_totals()["statuses"]["completed"], 1)
+
+    def test_task_aggregates_follow_transitions(self):
+        task = {"task_id": "t1", "system_name": "AgentA", "task_type": "analysis", "status": "pending", "retries": 0}
+        self.store.update_task("t1", dict(task))
+        self.store.update_task("t1", dict(task, status=TaskStatus.RUNNING))
+        self.store.update_task("t1", dict(task, status="completed", retries=2))
+        self.store.update_task("t2", dict(task, task_id="t2", status="failed", retries=1))
+
+        agent = self.store.task_aggregates()["AgentA"]
+        self.assertEqual(agent["total"], 2)
+        self.assertEqual(agent["statuses"], {"pending": 0, "running": 0, "completed": 1, "failed": 1})
+        self.assertEqual(agent["retries"], 3)
+        self.assertEqual(agent["latency_count"], 1)
+        self.assertEqual(agent["by_task_type"]["analysis"]["total"], 2)
+        self.assertEqual(self.store.task_totals()["total"], 2)
+
+        # Direct writes rebuild the counters from the tasks dict
+        self.store.get_state()["tasks"] = {"x": dict(task, task_id="x", status="completed")}
+        self.assertEqual(self.store.task_totals()["statuses"].get("completed"), 1)
+        self.assertEqual(self.store.task_totals()["total"], 1)
+
+def paged_tasks(store, **filters):
+    """Walks every page of list_tasks and returns the task ids in order."""
+    ids, cursor = [], None
+    while True:
+        items, cursor = store.list_tasks(cursor=cursor, limit=3, **filters)
+        ids.extend(t["task_id"] for t in items)
+        if cursor is None:
+            return ids
+
+class TestStateStoreListing(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.store = StateStore(os.path.join(self.tmp_dir, "state.json"))
+        for i in range(10):
+            self.store.update_task(f"t{i}", {
+                "task_id": f"t{i}", "system_name": "AgentA" if i % 2 else "AgentB",
+                "status": "completed" if i < 7 else "pending", "timestamp": f"2024-01-01T00:00:{i:02d}"
+            })
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_pages_are_newest_first_and_complete(self):
+        self.assertEqual(paged_tasks(self.store), [f"t{i}" for i in reversed(range(10))])
+        self.assertEqual(paged_tasks(self.store, status="completed", agent="AgentA"), ["t5", "t3", "t1"])
+
+    def test_time_range_and_bad_cursor(self):
+        items, cursor = self.store.list_tasks(start=datetime(2024, 1, 1, 0, 0, 2), end=datetime(2024, 1, 1, 0, 0, 4))
+        self.assertEqual([t["task_id"] for t in items], ["t3", "t2"])
+        self.assertIsNone(cursor)
+        with self.assertRaises(ValueError):
+            self.store.list_tasks(cursor="not-a-cursor")
+
+class TestStateStoreDurability(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, "state.json")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_interval_mode_coalesces_until_flush(self):
+        store = StateStore(self.path, durability="interval", flush_interval=60)
+        for i in range(50):
+            store.update_task(f"t{i}", {"task_id": f"t{i}", "status": "pending"})
+        self.assertFalse(os.path.exists(self.path))
+
+        store.flush()
+        self.assertEqual(len(StateStore(self.path).get_state()["tasks"]), 50)
+        store.close()
+
+    def test_grouped_mode_flushes_on_batch_size(self):
+        store = StateStore(self.path, durability="grouped", flush_interval=60, flush_batch_size=10)
+        for i in range(10):
+            store.update_task(f"t{i}", {"task_id": f"t{i}", "status": "pending"})
+        for _ in range(100):
+            if os.path.exists(self.path):
+                break
+            time.sleep(0.01)
+        self.assertEqual(len(StateStore(self.path).get_state()["tasks"]), 10)
+        store.close()
+
+    def test_close_flushes_pending_writes(self):
+        store = StateStore(self.path, durability="grouped", flush_interval=60)
+        store.add_agent("AgentA", {"name": "AgentA"})
+        store.close()
+        self.assertIn("AgentA", StateStore(self.path).get_agents())
+
+    def test_several_workers_need_sqlite(self):
+        env = {"FOG_WEB_WORKERS": "4", "FOG_STATE_BACKEND": "json", "FOG_STATE_PATH": self.path}
+        with mock.patch.dict(os.environ, env):
+            with self.assertRaises(ValueError):
+                create_state_store()
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,135 @@
+import unittest
+import os
+import json
+import shutil
+import tempfile
+from fog.core.snapshot import SnapshotReader, SnapshotStateStore, convert_json_snapshot, write_snapshot
+
+class TestSnapshotStateStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.snap_path = os.path.join(self.tmp_dir, "state.snap")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def write_history(self, count):
+        store = SnapshotStateStore(self.snap_path)
+        store.add_agents({"AgentA": {"name": "AgentA"}, "AgentB": {"name": "AgentB"}})
+        for i in range(count):
+            store.update_task(f"t{i}", {"task_id": f"t{i}", "system_name": "AgentA",
+                                        "status": "completed" if i % 2 else "pending"})
+        store.get_state()["controls"] = {"is_paused": True}
+        store._save()
+        store.close()
+
+    def test_round_trip(self):
+        self.write_history(20)
+        reopened = SnapshotStateStore(self.snap_path)
+        self.assertEqual(set(reopened.get_agents()), {"AgentA", "AgentB"})
+        self.assertTrue(reopened.get_state()["controls"]["is_paused"])
+        self.assertEqual(reopened.count_tasks("completed"), 10)
+        self.assertEqual(reopened.get_task("t3")["status"], "completed")
+
+    def test_boot_defers_task_history(self):
+        self.write_history(50)
+        store = SnapshotStateStore(self.snap_path, background_load=False)
+        # Control plane and agents are available before any task is loaded
+        self.assertIn("AgentA", store.get_agents())
+        self.assertEqual(store.get_state()["tasks"], {})
+        # Single tasks are read by offset from the snapshot
+        self.assertEqual(store.get_task("t7")["status"], "completed")
+        self.assertEqual(store.get_state()["tasks"], {})
+
+        # Indexes and aggregates come from the snapshot's index summaries
+        self.assertEqual(store.count_tasks(), 50)
+        self.assertEqual(store.count_tasks("completed", "AgentA"), 25)
+        self.assertEqual(store.task_totals()["statuses"], {"pending": 25, "completed": 25})
+        self.assertEqual(len(store.tasks_by_status("pending")), 25)
+        self.assertEqual(store.get_state()["tasks"], {})
+
+        # A task updated before the history arrives keeps its new version;
+        # the commit goes to the delta instead of rewriting the snapshot
+        snapshot_mtime = os.stat(self.snap_path).st_mtime_ns
+        store.update_task("t7", {"task_id": "t7", "system_name": "AgentA", "status": "failed"})
+        self.assertEqual(store.count_tasks(), 50)
+        self.assertEqual(store.count_tasks("completed"), 24)
+        self.assertEqual(store.get_task("t7")["status"], "failed")
+        self.assertEqual(list(store.get_state()["tasks"]), ["t7"])
+        self.assertEqual(os.stat(self.snap_path).st_mtime_ns, snapshot_mtime)
+        self.assertTrue(os.path.exists(store.delta_path))
+        store.close()
+
+        reopened = SnapshotStateStore(self.snap_path, background_load=False)
+        self.assertEqual(reopened.get_task("t7")["status"], "failed")
+        self.assertEqual(reopened.count_tasks("failed"), 1)
+        self.assertEqual(reopened.count_tasks(), 50)
+
+    def test_commit_after_loading_folds_delta(self):
+        self.write_history(10)
+        store = SnapshotStateStore(self.snap_path, background_load=False)
+        store.update_task("t1", {"task_id": "t1", "system_name": "AgentA", "status": "failed"})
+        store._ensure_tasks_loaded()
+        store.update_task("t2", {"task_id": "t2", "system_name": "AgentB", "status": "running"})
+        self.assertFalse(os.path.exists(store.delta_path))
+        store.close()
+
+        reopened = SnapshotStateStore(self.snap_path, background_load=False)
+        self.assertEqual(reopened.count_tasks("failed"), 1)
+        self.assertEqual(reopened.count_tasks(agent="AgentB"), 1)
+        self.assertEqual(reopened.get_task("t2")["status"], "running")
+
+    def test_stale_delta_is_ignored(self):
+        self.write_history(4)
+        store = SnapshotStateStore(self.snap_path, background_load=False)
+        store.update_task("t0", {"task_id": "t0", "system_name": "AgentA", "status": "failed"})
+        with open(store.delta_path) as f:
+            delta = f.read()
+        store._ensure_tasks_loaded()
+        store.update_task("t1", {"task_id": "t1", "system_name": "AgentA", "status": "failed"})
+        store.update_task("t0", {"task_id": "t0", "system_name": "AgentA", "status": "completed"})
+        store.close()
+
+        # A delta left behind by a crash after the rewrite belongs to the old generation;
+        # a torn trailing line is dropped
+        with open(store.delta_path, "w") as f:
+            f.write(delta + '{"generation":')
+        reopened = SnapshotStateStore(self.snap_path, background_load=False)
+        self.assertEqual(reopened.get_task("t0")["status"], "completed")
+        self.assertEqual(reopened.count_tasks("failed"), 1)
+
+    def test_index_without_summaries(self):
+        # Snapshots written before the index carried summaries
+        write_snapshot(self.snap_path, {"agents": {}},
+                       [("t1", b'{"task_id":"t1","system_name":"AgentA","status":"completed"}', None)])
+        store = SnapshotStateStore(self.snap_path, background_load=False)
+        self.assertEqual(store.count_tasks("completed", "AgentA"), 1)
+        self.assertEqual(store.get_state()["tasks"], {})
+
+    def test_background_load(self):
+        self.write_history(30)
+        store = SnapshotStateStore(self.snap_path, load_batch_size=7)
+        self.assertTrue(store._tasks_loaded.wait(5))
+        self.assertEqual(len(store.get_state()["tasks"]), 30)
+        self.assertEqual(list(store.get_state()["tasks"])[:3], ["t0", "t1", "t2"])
+
+    def test_convert_from_json(self):
+        json_path = os.path.join(self.tmp_dir, "state.json")
+        with open(json_path, "w") as f:
+            json.dump({"tasks": {"t1": {"task_id": "t1", "status": "pending"}},
+                       "agents": {"AgentA": {"name": "AgentA"}}, "backups": [], "approvals": {}}, f, indent=4)
+        self.assertEqual(convert_json_snapshot(json_path, self.snap_path), 1)
+
+        reader = SnapshotReader(self.snap_path)
+        self.assertEqual(reader.control["agents"]["AgentA"]["name"], "AgentA")
+        self.assertEqual(reader.read_task("t1")["status"], "pending")
+        self.assertIsNone(reader.read_task("missing"))
+        reader.close()
+
+        os.remove(self.snap_path)
+        store = SnapshotStateStore(self.snap_path, legacy_path=json_path)
+        self.assertEqual(store.get_task("t1")["status"], "pending")
+        self.assertTrue(os.path.exists(self.snap_path))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,142 @@
+import unittest
+import os
+import json
+import shutil
+import tempfile
+import multiprocessing
+from fog.core.archive import TaskArchive
+from fog.core.sqlite_store import SqliteStateStore
+
+def write_tasks(db_path, prefix, count):
+    store = SqliteStateStore(db_path)
+    for i in range(count):
+        store.update_task(f"{prefix}{i}", {"task_id": f"{prefix}{i}", "system_name": prefix, "status": "pending"})
+    store.close()
+
+class TestSqliteStateStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.tmp_dir, "state.db")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_round_trip(self):
+        store = SqliteStateStore(self.db_path)
+        store.update_task("t1", {"task_id": "t1", "system_name": "AgentA", "status": "completed"})
+        store.add_agent("AgentA", {"name": "AgentA"})
+        store.add_backup({"backup_id": "b1", "timestamp": "2024-01-01T00:00:00"})
+        state = store.get_state()
+        state["approvals"] = {"r1": {"request_id": "r1", "task_id": "t1", "status": "pending"}}
+        state["controls"] = {"is_paused": True}
+        store._save()
+        store.close()
+
+        reopened = SqliteStateStore(self.db_path)
+        state = reopened.get_state()
+        self.assertEqual(reopened.get_task("t1")["status"], "completed")
+        self.assertIn("AgentA", reopened.get_agents())
+        self.assertEqual(reopened.get_backups()[0]["backup_id"], "b1")
+        self.assertEqual(state["approvals"]["r1"]["status"], "pending")
+        self.assertTrue(state["controls"]["is_paused"])
+        reopened.close()
+
+    def test_indexed_queries(self):
+        store = SqliteStateStore(self.db_path)
+        store.update_task("t1", {"task_id": "t1", "system_name": "AgentA", "status": "failed"})
+        store.update_task("t2", {"task_id": "t2", "system_name": "AgentA", "status": "completed"})
+        store.update_task("t3", {"task_id": "t3", "system_name": "AgentB", "status": "failed"})
+        store.update_task("t2", {"task_id": "t2", "system_name": "AgentA", "status": "failed"})
+
+        self.assertEqual({t["task_id"] for t in store.tasks_by_status("failed")}, {"t1", "t2", "t3"})
+        self.assertEqual(len(store.tasks_for_agent("AgentA")), 2)
+        self.assertEqual(store.count_tasks(status="completed"), 0)
+        self.assertEqual(store.count_tasks(status="failed", agent="AgentB"), 1)
+        self.assertCountEqual(store.task_agents(), ["AgentA", "AgentB"])
+        store.close()
+
+    def test_list_tasks_pages_in_sql(self):
+        store = SqliteStateStore(self.db_path)
+        for i in range(7):
+            store.update_task(f"t{i}", {"task_id": f"t{i}", "system_name": "AgentA", "status": "failed",
+                                        "timestamp": f"2024-01-01T00:00:0{i}"})
+        ids, cursor = [], None
+        while True:
+            items, cursor = store.list_tasks(cursor=cursor, limit=3)
+            ids.extend(t["task_id"] for t in items)
+            if cursor is None:
+                break
+        self.assertEqual(ids, [f"t{i}" for i in reversed(range(7))])
+        self.assertEqual(store.list_tasks(agent="AgentB"), ([], None))
+        store.close()
+
+    def test_migrates_legacy_json(self):
+        legacy_path = os.path.join(self.tmp_dir, "state.json")
+        with open(legacy_path, "w") as f:
+            json.dump({"tasks": {"old": {"task_id": "old", "system_name": "A", "status": "failed"}},
+                       "agents": {}, "backups": [], "runs": []}, f)
+
+        store = SqliteStateStore(self.db_path, legacy_path=legacy_path)
+        self.assertEqual(store.count_tasks(status="failed"), 1)
+        store.close()
+
+        reopened = SqliteStateStore(self.db_path, legacy_path=legacy_path)
+        self.assertEqual(reopened.get_task("old")["status"], "failed")
+        reopened.close()
+
+class TestSqliteSharedStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.tmp_dir, "state.db")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_changes_propagate_between_stores(self):
+        writer = SqliteStateStore(self.db_path)
+        reader = SqliteStateStore(self.db_path)
+        self.assertIsNone(reader.get_task("t1"))
+
+        writer.update_task("t1", {"task_id": "t1", "system_name": "AgentA", "status": "running"})
+        writer.add_agent("AgentA", {"name": "AgentA"})
+        state = writer.get_state()
+        state["controls"] = {"is_paused": True}
+        state["approvals"] = {"r1": {"request_id": "r1", "task_id": "t1", "status": "pending"}}
+        writer._save()
+
+        self.assertEqual(reader.get_task("t1")["status"], "running")
+        self.assertEqual(reader.count_tasks(status="running", agent="AgentA"), 1)
+        self.assertIn("AgentA", reader.get_agents())
+        self.assertTrue(reader.get_state()["controls"]["is_paused"])
+        self.assertEqual(reader.get_state()["approvals"]["r1"]["status"], "pending")
+
+        # Approving in the reader is seen by the writer
+        approvals = dict(reader.get_state()["approvals"])
+        approvals["r1"] = dict(approvals["r1"], status="approved")
+        reader.get_state()["approvals"] = approvals
+        reader._save()
+        self.assertEqual(writer.get_state()["approvals"]["r1"]["status"], "approved")
+
+        # Archival in one store removes the task from the other
+        writer.configure_retention(TaskArchive(os.path.join(self.tmp_dir, "archive")), max_finished=0)
+        writer.update_task("t1", {"task_id": "t1", "system_name": "AgentA", "status": "completed"})
+        writer.enforce_retention()
+        self.assertNotIn("t1", reader.get_state()["tasks"])
+        writer.close()
+        reader.close()
+
+    def test_concurrent_writer_processes(self):
+        SqliteStateStore(self.db_path).close()
+        workers = [multiprocessing.Process(target=write_tasks, args=(self.db_path, prefix, 50)) for prefix in ("a", "b")]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        store = SqliteStateStore(self.db_path)
+        self.assertEqual(len(store.get_state()["tasks"]), 100)
+        self.assertEqual(store.task_totals()["statuses"]["pending"], 100)
+        store.close()
+
+if __name__ == "__main__":
+    unittest.main()
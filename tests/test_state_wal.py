@@ -0,0 +1,96 @@
+import unittest
+import os
+import json
+import shutil
+import tempfile
+from fog.core.wal import WalStateStore
+
+class TestWalStateStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.wal_dir = os.path.join(self.tmp_dir, "state_wal")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def _open(self, **kwargs):
+        return WalStateStore(self.wal_dir, **kwargs)
+
+    def test_recovers_from_log(self):
+        store = self._open()
+        store.update_task("t1", {"task_id": "t1", "status": "pending"})
+        store.update_task("t1", {"task_id": "t1", "status": "completed"})
+        store.add_agent("AgentA", {"name": "AgentA", "endpoint": "local://a"})
+        store.add_backup({"backup_id": "b1"})
+        store.get_state()["controls"] = {"is_paused": True}
+        store._save()
+        store.close()
+
+        reopened = self._open()
+        self.assertEqual(reopened.get_task("t1")["status"], "completed")
+        self.assertIn("AgentA", reopened.get_agents())
+        self.assertEqual(reopened.get_backups(), [{"backup_id": "b1"}])
+        self.assertTrue(reopened.get_state()["controls"]["is_paused"])
+        reopened.close()
+
+    def test_recovers_batched_tasks(self):
+        store = self._open()
+        store.update_tasks({f"t{i}": {"task_id": f"t{i}", "status": "pending"} for i in range(3)})
+        store.close()
+
+        reopened = self._open()
+        self.assertEqual(reopened.count_tasks(status="pending"), 3)
+        reopened.close()
+
+    def test_save_only_logs_changed_control_keys(self):
+        store = self._open(durability="always")
+        store.get_state()["controls"] = {"is_paused": False}
+        store._save()
+        store._save()
+        store.close()
+
+        with open(store._log.segment_path(store._log.active_id)) as f:
+            records = [json.loads(line) for line in f]
+        self.assertEqual(len(records), 1)
+        self.assertEqual(records[0]["op"], "state")
+
+    def test_checkpoint_compacts_segments(self):
+        store = self._open(segment_size=256, checkpoint_segments=2)
+        for i in range(50):
+            store.update_task(f"t{i}", {"task_id": f"t{i}", "status": "completed", "payload": {"i": i}})
+        store.checkpoint()
+        store.update_task("tail", {"task_id": "tail", "status": "pending"})
+        store.close()
+
+        self.assertTrue(os.path.exists(store.checkpoint_path))
+        self.assertEqual(len(store._log.segments()), 1)
+
+        reopened = self._open()
+        self.assertEqual(len(reopened.get_state()["tasks"]), 51)
+        self.assertEqual(reopened.get_task("t49")["payload"], {"i": 49})
+        reopened.close()
+
+    def test_torn_tail_is_ignored(self):
+        store = self._open()
+        store.update_task("t1", {"task_id": "t1", "status": "completed"})
+        store.close()
+        with open(store._log.segment_path(store._log.active_id), "a") as f:
+            f.write('{"op":"task","id":"t2","da')
+
+        reopened = self._open()
+        self.assertIsNotNone(reopened.get_task("t1"))
+        self.assertIsNone(reopened.get_task("t2"))
+        reopened.close()
+
+    def test_migrates_legacy_json(self):
+        legacy_path = os.path.join(self.tmp_dir, "state.json")
+        with open(legacy_path, "w") as f:
+            json.dump({"tasks": {"old": {"task_id": "old", "status": "failed"}}, "agents": {}, "backups": [], "runs": []}, f)
+
+        store = self._open(legacy_path=legacy_path)
+        self.assertEqual(store.get_task("old")["status"], "failed")
+        self.assertTrue(os.path.exists(store.checkpoint_path))
+        store.close()
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,28 +1,41 @@
 import unittest
+import shutil
+import tempfile
+import os
 from agents.system_monitor.monitor import SystemMonitor
-
-class MockStateStore:
-    def get_state(self):
-        return {
-            "tasks": {
-                "1": {"system_name": "AgentA", "status": "completed", "retries": 0},
-                "2": {"system_name": "AgentA", "status": "failed", "retries": 3},
-                "3": {"system_name": "AgentA", "status": "failed", "retries": 3},
-                "4": {"system_name": "AgentA", "status": "failed", "retries": 3},
-                "5": {"system_name": "AgentA", "status": "failed", "retries": 3},
-                "6": {"system_name": "AgentB", "status": "completed", "retries": 1}
-            },
-            "agents": {
-                "AgentA": {},
-                "AgentB": {}
-            }
-        }
+from fog.core.state import StateStore
 
 class TestSystemMonitor(unittest.TestCase):
     def setUp(self):
-        self.state_store = MockStateStore()
+        self.tmp_dir = tempfile.mkdtemp()
+        self.state_store = StateStore(os.path.join(self.tmp_dir, "state.json"))
+        tasks = {
+            "1": {"system_name": "AgentA", "status": "completed", "retries": 0},
+            "2": {"system_name": "AgentA", "status": "failed", "retries": 3},
+            "3": {"system_name": "AgentA", "status": "failed", "retries": 3},
+            "4": {"system_name": "AgentA", "status": "failed", "retries": 3},
+            "5": {"system_name": "AgentA", "status": "failed", "retries": 3},
+            "6": {"system_name": "AgentB", "status": "completed", "retries": 1}
+        }
+        for task_id, task in tasks.items():
+            self.state_store.update_task(task_id, task)
+        self.state_store.add_agent("AgentA", {})
+        self.state_store.add_agent("AgentB", {})
         self.monitor = SystemMonitor(self.state_store)
 
+    def test_reports_adaptive_concurrency(self):
+        from fog.core.connector import agent_registry, MockAgentConnector
+        connector = MockAgentConnector("AgentA", "http://a")
+        connector.limiter.on_dispatch()
+        connector.limiter.on_success(0.25)
+        agent_registry.register_agent(connector)
+        health = {agent.name: agent for agent in self.monitor.get_health_report().agents}
+        self.assertEqual(health["AgentA"].concurrency_limit, connector.limiter.current)
+        self.assertEqual(health["AgentA"].rtt_seconds, 0.25)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
     def test_get_health_report(self):
         report = self.monitor.get_health_report()
 
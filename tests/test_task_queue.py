@@ -0,0 +1,96 @@
+import unittest
+import asyncio
+from unittest import mock
+from fog.core.queue import TaskQueue, PriorityTaskQueue, FairTaskQueue
+from fog.models.task import TaskPacket, TaskType
+
+def make_task(name, priority=0, agent="Agent"):
+    return TaskPacket(system_name=agent, module_name=name, task_type=TaskType.ANALYSIS, priority=priority)
+
+class TestTaskQueue(unittest.IsolatedAsyncioTestCase):
+    async def drain(self, queue):
+        names = []
+        while queue.size():
+            names.append((await queue.dequeue()).module_name)
+            queue.task_done()
+        return names
+
+    async def test_fifo_ignores_priority(self):
+        queue = TaskQueue()
+        for name, priority in [("a", 0), ("b", 5), ("c", 1)]:
+            await queue.enqueue(make_task(name, priority))
+        self.assertEqual(queue.depths(), {5: 1, 1: 1, 0: 1})
+        self.assertEqual(await self.drain(queue), ["a", "b", "c"])
+        self.assertEqual(queue.depths(), {})
+
+    async def test_priority_order_is_stable(self):
+        queue = PriorityTaskQueue(aging_interval=None)
+        for name, priority in [("a1", 0), ("b1", 5), ("a2", 0), ("c1", 1), ("b2", 5)]:
+            await queue.enqueue(make_task(name, priority))
+        self.assertEqual(queue.depths(), {5: 2, 1: 1, 0: 2})
+        self.assertEqual(await self.drain(queue), ["b1", "b2", "c1", "a1", "a2"])
+
+    async def test_aging_prevents_starvation(self):
+        queue = PriorityTaskQueue(aging_interval=10.0)
+        with mock.patch("fog.core.queue.time.monotonic", return_value=1000.0):
+            await queue.enqueue(make_task("old", 0))
+        # Waited 25s, worth 2.5 levels: ahead of priority 2, behind priority 3
+        with mock.patch("fog.core.queue.time.monotonic", return_value=1025.0):
+            await queue.enqueue(make_task("urgent", 3))
+            await queue.enqueue(make_task("high", 2))
+        self.assertEqual(await self.drain(queue), ["urgent", "old", "high"])
+
+    async def test_fair_queue_weights_agents(self):
+        queue = FairTaskQueue(aging_interval=None)
+        queue.configure_agent("Slow", weight=1)
+        queue.configure_agent("Fast", weight=2)
+        for i in range(4):
+            await queue.enqueue(make_task(f"s{i}", agent="Slow"))
+            await queue.enqueue(make_task(f"f{i}", agent="Fast"))
+        order = []
+        for _ in range(6):
+            task = await queue.dequeue()
+            order.append(task.module_name)
+            queue.release(task)
+        self.assertEqual(order, ["f0", "s0", "f1", "f2", "s1", "f3"])
+
+    async def test_fair_queue_enforces_max_in_flight(self):
+        queue = FairTaskQueue(aging_interval=None)
+        queue.configure_agent("Slow", max_in_flight=1)
+        for name in ["s0", "s1"]:
+            await queue.enqueue(make_task(name, agent="Slow"))
+        await queue.enqueue(make_task("f0", agent="Fast"))
+
+        first = await queue.dequeue()
+        second = await queue.dequeue()
+        self.assertEqual([first.module_name, second.module_name], ["s0", "f0"])
+        # Slow is at its limit, so the next dequeue waits for a release
+        waiting = asyncio.create_task(queue.dequeue())
+        await asyncio.sleep(0.01)
+        self.assertFalse(waiting.done())
+        queue.release(first)
+        self.assertEqual((await asyncio.wait_for(waiting, 1)).module_name, "s1")
+
+        stats = queue.agent_stats()
+        self.assertEqual(stats["Slow"]["in_flight"], 1)
+        self.assertEqual(stats["Slow"]["max_in_flight"], 1)
+        self.assertEqual(stats["Fast"]["queued"], 0)
+        self.assertGreater(stats["Slow"]["max_wait"], 0)
+
+    async def test_fair_queue_takes_batch_for_agent(self):
+        queue = FairTaskQueue(aging_interval=None)
+        queue.configure_agent("Batch", max_in_flight=3)
+        for name in ["b0", "skip", "b1", "b2"]:
+            await queue.enqueue(make_task(name, agent="Batch"))
+        await queue.enqueue(make_task("o0", agent="Other"))
+
+        first = await queue.dequeue()
+        taken = queue.take("Batch", 10, lambda task: task.module_name != "skip")
+        # Limited by the agent's remaining slots; skipped and other agents' tasks stay queued
+        self.assertEqual([first.module_name] + [task.module_name for task in taken], ["b0", "b1", "b2"])
+        self.assertEqual(queue.agent_stats()["Batch"]["in_flight"], 3)
+        self.assertEqual(queue.take("Batch", 10), [])
+        self.assertEqual(TaskQueue().take("Batch", 10), [])
+
+if __name__ == "__main__":
+    unittest.main()